@@ -38,7 +38,6 @@ setup(
     long_description_content_type='text/markdown',
     include_package_data=True,
     install_requires=[
-        'dask',
         'keras',
         'matplotlib',
         'numba',
@@ -13,3 +13,8 @@
 # limitations under the License.
 
 from .decision_boundary_mapper import *
+from . import decision_boundary_mapper as _decision_boundary_mapper
+
+def __getattr__(name: str):
+    # forwarding the lazily imported names (e.g. GUI, examples) of the package
+    return getattr(_decision_boundary_mapper, name)
@@ -15,17 +15,19 @@
 import os
 import numpy as np
 from queue import PriorityQueue
+from concurrent.futures import ThreadPoolExecutor
 from scipy import interpolate
-import dask.array as da
-from sklearn.neighbors import KDTree
 from numba_progress import ProgressBar
 import tensorflow as tf
 from tqdm import tqdm
 from enum import Enum
 
-from .tools import binary_split, generate_windows, get_confidence_based_split, get_inv_proj_error, get_nd_indices_parallel, euclidean, get_pixel_priority, get_proj_error_parallel, get_projection_errors_using_inverse_projection, get_tasks_with_same_priority, get_window_borders
+from .tools import warmup_kernels, binary_split, generate_windows, get_confidence_based_split, get_inv_proj_error, get_pixel_priority, get_proj_errors, get_projection_errors_using_inverse_projection, get_tasks_with_same_priority, get_window_borders
 from .AbstractNN import AbstractNN
-from ..utils import track_time_wrapper, INVERSE_PROJECTION_ERRORS_FILE, PROJECTION_ERRORS_INTERPOLATED_FILE, PROJECTION_ERRORS_INVERSE_PROJECTION_FILE
+from .NeighborsIndex import NeighborsIndex
+from .ChangedLabelsEarlyStopping import ChangedLabelsEarlyStopping
+from .SurrogateClassifier import SurrogateClassifier, SURROGATE_TRAINING_SAMPLES, SURROGATE_MARGIN_THRESHOLD
+from ..utils import track_time_wrapper, get_array_fingerprint, INVERSE_PROJECTION_ERRORS_FILE, PROJECTION_ERRORS_INTERPOLATED_FILE, PROJECTION_ERRORS_INVERSE_PROJECTION_FILE
 from ..Logger import Logger, LoggerInterface
 
 DBM_DEFAULT_CHUNK_SIZE = 10000
@@ -35,6 +37,10 @@ DBM_IMAGE_NAME = "boundary_map"
 DBM_CONFIDENCE_IMAGE_NAME = "boundary_map_confidence"
 
 PROJECTION_ERRORS_NEIGHBORS_NUMBER = 10
+RBF_INTERPOLATION_NEIGHBORS_NUMBER = 50
+WARMUP_BATCH_SIZE = 64
+CHANGED_SAMPLES_WEIGHT = 10.0
+CLASSIFIER_PREDICTIONS_CACHE_SIZE = 4
 
 DEFAULT_TRAINING_EPOCHS = 200
 DEFAULT_BATCH_SIZE = 128
@@ -62,6 +68,9 @@ class AbstractDBM:
         get_dbm          \n  
         generate_inverse_projection_errors \n
         generate_projection_errors         \n
+        warmup           \n
+        fit_surrogate    \n
+        predict_classifier \n
 
     Methods to be implemented by the class that implements this class:
         _predict2dspace_ (X)
@@ -93,32 +102,151 @@ class AbstractDBM:
         self.resolution: int
         # a dictionary that maps the resolution to the best block resolution for the confidence interpolation strategy in fast decoding
         self.resolution_to_blocks_resolution_map = {} 
+        # the distilled 2D -> C surrogate used by the fast strategies, None if not fitted
+        self.surrogate: SurrogateClassifier | None = None
+        # the surrogate is used only while this is True, it is set by every generate_boundary_map call
+        self.use_surrogate = False
+        self.surrogate_points, self.surrogate_exact_points = 0, 0
+        # the classifier predictions of whole data sets, keyed by the data fingerprint and valid for one classifier version
+        self.classifier_version = 0
+        self.classifier_predictions_cache = {}
         
-    def refit_classifier(self, Xnd: np.ndarray, Y: np.ndarray, save_folder: str, epochs: int = 20, batch_size: int = 32):
+    def refit_classifier(self, Xnd: np.ndarray, Y: np.ndarray, save_folder: str, epochs: int = 20, batch_size: int = 32,
+                         warm_start: bool = False, changed_indices: np.ndarray | None = None,
+                         changed_samples_weight: float = CHANGED_SAMPLES_WEIGHT,
+                         callbacks: list | None = None):
         """ 
         Refits the classifier on the given data set.
+        By default the classifier weights are reinitialized and the classifier is trained from scratch.
+        With warm_start the current weights are kept and fine-tuned, the changed samples are up-weighted
+        and the training stops as soon as the accuracy on the changed labels converges.
 
         Args:             
             Xnd (np.ndarray): The data set
             Y (np.ndarray): The new labels
             save_folder (str): Saving folder of the classifier
-            epochs (int, optional): Number of epochs. Defaults to 20.
+            epochs (int, optional): Number of epochs, the maximum number of epochs when warm starting. Defaults to 20.
             batch_size (int): Number of training samples to be taken in a single batch. Defaults to 32.
+            warm_start (bool, optional): If True the current classifier is fine-tuned instead of retrained from scratch. Defaults to False.
+            changed_indices (np.ndarray | None, optional): The indices of the samples whose labels changed, used when warm starting. Defaults to None.
+            changed_samples_weight (float, optional): The training weight of the changed samples when warm starting. Defaults to CHANGED_SAMPLES_WEIGHT.
+            callbacks (list | None, optional): Additional training callbacks (e.g. TrainingCancellation). Defaults to None.
         """
-        
-        # copy the configuration of the current classifier
-        optimizer = self.classifier.optimizer.get_config()["name"] if self.classifier and self.classifier.optimizer else "adam"
-        loss = self.classifier.loss if self.classifier and self.classifier.loss else "sparse_categorical_crossentropy"
-        # create a clone of the current classifier but with no weights, so that the weights are reinitialized
-        self.classifier = tf.keras.models.clone_model(self.classifier)
-        self.classifier.compile(optimizer=optimizer, loss=loss, metrics=["accuracy"])
-        self.classifier.build(input_shape=Xnd.shape)
-        
-        self.console.log(f"Fitting classifier for {epochs} epochs and batch size {batch_size}, please wait...")
-        self.classifier.fit(Xnd, Y, epochs=epochs, batch_size=batch_size, verbose=0, shuffle=True) #type: ignore
+        if warm_start:
+            self.__fine_tune_classifier__(Xnd, Y, epochs, batch_size, changed_indices, changed_samples_weight, callbacks)
+        else:
+            # copy the configuration of the current classifier
+            optimizer = self.classifier.optimizer.get_config()["name"] if self.classifier and self.classifier.optimizer else "adam"
+            loss = self.classifier.loss if self.classifier and self.classifier.loss else "sparse_categorical_crossentropy"
+            # create a clone of the current classifier but with no weights, so that the weights are reinitialized
+            self.classifier = tf.keras.models.clone_model(self.classifier)
+            self.classifier.compile(optimizer=optimizer, loss=loss, metrics=["accuracy"])
+            self.classifier.build(input_shape=Xnd.shape)
+            
+            self.console.log(f"Fitting classifier for {epochs} epochs and batch size {batch_size}, please wait...")
+            self.classifier.fit(Xnd, Y, epochs=epochs, batch_size=batch_size, verbose=0, shuffle=True, callbacks=callbacks) #type: ignore
         self.console.log("Finished fitting classifier")
+        self.__invalidate_classifier_predictions__()
         self.save_classifier(save_folder=save_folder)
 
+    def __fine_tune_classifier__(self, Xnd: np.ndarray, Y: np.ndarray, epochs: int, batch_size: int,
+                                 changed_indices: np.ndarray | None, changed_samples_weight: float,
+                                 callbacks: list | None = None):
+        """ 
+        Fine-tunes the current classifier weights on the given data set, up-weighting the changed samples.
+
+        Args:             
+            Xnd (np.ndarray): The data set
+            Y (np.ndarray): The new labels
+            epochs (int): The maximum number of epochs
+            batch_size (int): Number of training samples to be taken in a single batch
+            changed_indices (np.ndarray | None): The indices of the samples whose labels changed, if None they are all considered changed
+            changed_samples_weight (float): The training weight of the changed samples
+            callbacks (list | None, optional): Additional training callbacks. Defaults to None.
+        """
+        if self.classifier.optimizer is None:
+            self.classifier.compile(optimizer="adam", loss="sparse_categorical_crossentropy", metrics=["accuracy"])
+
+        if changed_indices is None or len(changed_indices) == 0:
+            changed_indices = np.arange(len(Xnd))
+        sample_weight = np.ones(len(Xnd), dtype=np.float32)
+        sample_weight[changed_indices] = changed_samples_weight
+
+        stopping_callback = ChangedLabelsEarlyStopping(Xnd[changed_indices], Y[changed_indices], logger=self.console)
+        self.console.log(f"Fine-tuning the classifier for at most {epochs} epochs on {len(changed_indices)} changed labels, please wait...")
+        self.classifier.fit(Xnd, Y, sample_weight=sample_weight, epochs=epochs, batch_size=batch_size, verbose=0, shuffle=True,  #type: ignore
+                            callbacks=[stopping_callback] + (callbacks or []))
+
+    def warmup(self, batch_size: int = WARMUP_BATCH_SIZE):
+        """ 
+        Prepares the DBM for a fast first map generation. 
+        Compiles the numba kernels (cached on the disk, so any later process loads them instead of compiling them)
+        and traces the decoding and classification functions for the common input data types.
+
+        Args:
+            batch_size (int, optional): The number of 2D points used for tracing. Defaults to WARMUP_BATCH_SIZE.
+        """
+        self.console.log("Compiling the numba kernels...")
+        warmup_kernels()
+        rng = np.random.default_rng(0)
+        X = rng.random((batch_size, 8))
+        NeighborsIndex(X, X[:, :2]).get_projection_errors(X[:, :2], X.astype(np.float32), k=2)
+
+        if getattr(self, "neural_network", None) is None:
+            self.console.warn("The inverse projection is not fitted yet, the decoding and classification functions will be traced on their first use")
+            return
+
+        self.console.log("Tracing the decoding and classification functions...")
+        for dtype in (np.float32, np.float64):
+            self._predict2dspace_(rng.random((batch_size, 2)).astype(dtype))
+        self.console.log("Warm-up finished")
+
+    def fit_surrogate(self, n_samples: int = SURROGATE_TRAINING_SAMPLES, margin_threshold: float = SURROGATE_MARGIN_THRESHOLD):
+        """ 
+        Distills the composite classifier(inverse_projection(p)) into a tiny 2D -> C surrogate network.
+        Once fitted, the fast decoding strategies use the surrogate and evaluate exactly only the points where its margin is low (i.e. near the boundaries).
+
+        Args:
+            n_samples (int, optional): The number of 2D points evaluated exactly for training the surrogate, half on a regular grid and half uniformly at random. Defaults to SURROGATE_TRAINING_SAMPLES.
+            margin_threshold (float, optional): The points where the surrogate margin is below this threshold are evaluated exactly. Defaults to SURROGATE_MARGIN_THRESHOLD.
+        """
+        grid_resolution = int(np.sqrt(n_samples / 2))
+        grid = np.array([(i / grid_resolution, j / grid_resolution) for i in range(grid_resolution) for j in range(grid_resolution)])
+        random_points = np.random.default_rng(0).random((n_samples - len(grid), 2))
+        space2d = np.concatenate((grid, random_points), axis=0)
+
+        self.console.log(f"Computing the exact predictions of {len(space2d)} 2D points for the surrogate...")
+        predictions = np.concatenate([self._predict2dspace_(chunk)[2]
+                                      for chunk in np.array_split(space2d, len(space2d) // DBM_DEFAULT_CHUNK_SIZE + 1)], axis=0)
+
+        self.surrogate = SurrogateClassifier(margin_threshold=margin_threshold, logger=self.console)
+        self.surrogate.fit(space2d, predictions)
+
+    def _predict2dspace_fast_(self, X2d: np.ndarray | list[tuple[float, float]]) -> tuple:
+        """ 
+        Predicts the labels for the given 2D data set using the surrogate if it is fitted and enabled (use_surrogate), the points where the surrogate is uncertain are predicted exactly.
+        Otherwise this is the same as _predict2dspace_.
+
+        Args:
+            X2d (np.ndarray): The 2D data set
+
+        Returns:
+            predicted_labels (np.array): The predicted labels for the given 2D data set
+            predicted_confidences (np.array): The predicted probabilities for the given 2D data set, for each data point the confidence is returned (i.e. the maximum probability)
+            predictions (np.array): The predicted probabilities for the given 2D data set, for each data point a list of probabilities is returned
+        """
+        if not self.use_surrogate or self.surrogate is None:
+            return self._predict2dspace_(X2d)
+
+        X2d = np.asarray(X2d)
+        predictions, is_uncertain = self.surrogate.predict(X2d)
+        self.surrogate_points += len(X2d)
+        self.surrogate_exact_points += int(np.sum(is_uncertain))
+        if np.any(is_uncertain):
+            _, _, exact_predictions = self._predict2dspace_(X2d[is_uncertain])
+            predictions[is_uncertain] = exact_predictions
+        return np.argmax(predictions, axis=1), np.max(predictions, axis=1), predictions
+
     def save_classifier(self, save_folder: str):
         """ 
         Saves a copy of the classifier.
@@ -138,6 +266,77 @@ class AbstractDBM:
             load_folder (str): The folder where the classifier is saved
         """
         self.classifier = tf.keras.models.load_model(load_folder)
+        self.__invalidate_classifier_predictions__()
+
+    def get_classifier_weights(self) -> list[np.ndarray]:
+        """ 
+        Returns a copy of the classifier weights, a lighter alternative to save_classifier for keeping a version of the classifier in memory.
+        """
+        return self.classifier.get_weights()
+
+    def set_classifier_weights(self, weights: list[np.ndarray]):
+        """ 
+        Restores the classifier weights returned by get_classifier_weights.
+
+        Args:
+            weights (list[np.ndarray]): The weights of a classifier with the same architecture
+        """
+        self.classifier.set_weights(weights)
+        self.__invalidate_classifier_predictions__()
+
+    def predict_classifier(self, Xnd: np.ndarray) -> np.ndarray:
+        """ 
+        Returns the classifier probabilities of a data set (e.g. the train or test set).
+        The predictions are cached per classifier version and looked up by the identity of the data set array, 
+        so asking again for the same array costs nothing until the classifier is refitted or loaded.
+        A new array is fingerprinted once, so that a copy of an already predicted data set reuses its predictions.
+        The data set arrays are expected not to be modified in place.
+
+        Args:
+            Xnd (np.ndarray): The data set
+
+        Returns:
+            predictions (np.ndarray): The predicted probabilities, for each data point a list of probabilities is returned
+        """
+        # the cache entries keep a reference to their data set, so the id of a cached array cannot be reused
+        key = (id(self.classifier), self.classifier_version, id(Xnd))
+        if key not in self.classifier_predictions_cache:
+            fingerprint = get_array_fingerprint(Xnd)
+            predictions = next((entry_predictions for _, entry_fingerprint, entry_predictions in self.classifier_predictions_cache.values()
+                                if entry_fingerprint == fingerprint), None)
+            if predictions is None:
+                predictions = self.classifier.predict(Xnd, verbose=0)  # type: ignore
+            if len(self.classifier_predictions_cache) >= CLASSIFIER_PREDICTIONS_CACHE_SIZE:
+                # dropping the oldest entry
+                self.classifier_predictions_cache.pop(next(iter(self.classifier_predictions_cache)))
+            self.classifier_predictions_cache[key] = (Xnd, fingerprint, predictions)
+        return self.classifier_predictions_cache[key][2]
+
+    def compute_classifier_loss(self, Y: np.ndarray, probabilities: np.ndarray) -> float:
+        """ 
+        Computes the loss of the classifier the same way as classifier.evaluate does: 
+        the mean of the loss the classifier was compiled with, plus the regularization losses of its layers.
+
+        Args:
+            Y (np.ndarray): The true labels
+            probabilities (np.ndarray): The classifier probabilities of the data set (e.g. returned by predict_classifier)
+
+        Returns:
+            loss (float): The loss of the classifier
+        """
+        loss_function = tf.keras.losses.get(self.classifier.loss if self.classifier.loss else "sparse_categorical_crossentropy")
+        loss = tf.reduce_mean(loss_function(Y, probabilities))
+        if self.classifier.losses:
+            loss += tf.add_n(self.classifier.losses)
+        return float(loss)
+
+    def __invalidate_classifier_predictions__(self):
+        """ 
+        Invalidates everything computed using the previous classifier: the cached predictions and the surrogate.
+        """
+        self.classifier_version += 1
+        self.classifier_predictions_cache = {}
+        self.surrogate = None
        
     def _predict2dspace_(self, X2d: np.ndarray | list[tuple[float, float]]) -> tuple:
         """ 
@@ -169,6 +368,7 @@ class AbstractDBM:
         """
         save_img_path = os.path.join(load_folder, DBM_IMAGE_NAME) # type: ignore
         save_img_confidence_path = os.path.join(load_folder, DBM_CONFIDENCE_IMAGE_NAME)
+        self.surrogate_points, self.surrogate_exact_points = 0, 0
 
         match fast_decoding_strategy:
             case FAST_DBM_STRATEGIES.NONE:
@@ -186,6 +386,10 @@ class AbstractDBM:
                 save_img_confidence_path += f"_fast_{FAST_DBM_STRATEGIES.CONFIDENCE_INTERPOLATION.value}"
                 img, img_confidence, _ = self._get_img_dbm_fast_confidence_interpolation_strategy(resolution, initial_resolution=initial_resolution)
 
+        if self.use_surrogate and self.surrogate is not None and self.surrogate_points > 0:
+            self.console.log(f"The surrogate predicted {self.surrogate_points} points, {self.surrogate_exact_points} "
+                             f"({self.surrogate_exact_points / self.surrogate_points * 100:.2f}%) of them were evaluated exactly")
+
         with open(f"{save_img_path}.npy", 'wb') as f:
             np.save(f, img)  # type: ignore
         with open(f"{save_img_confidence_path}.npy", 'wb') as f:
@@ -300,7 +504,7 @@ class AbstractDBM:
                 break
 
             # decode the space
-            predicted_labels, predicted_confidence, _ = self._predict2dspace_(space)
+            predicted_labels, predicted_confidence, _ = self._predict2dspace_fast_(space)
             computational_budget -= len(space)
 
             single_points_labels = predicted_labels[:len(single_points_space)]
@@ -375,7 +579,7 @@ class AbstractDBM:
         # generate the initial points
         indexes, sizes, border_indexes = generate_windows(window_size, initial_resolution=initial_resolution, resolution=resolution)
         space2d = np.array(indexes) / resolution  
-        predicted_labels, predicted_confidence, predicted_confidences = self._predict2dspace_(space2d)
+        predicted_labels, predicted_confidence, predicted_confidences = self._predict2dspace_fast_(space2d)
         pseudo_conf_img = np.zeros((resolution, resolution, len(predicted_confidences[0])))
 
         computational_budget -= len(indexes)
@@ -431,7 +635,7 @@ class AbstractDBM:
                 break
 
             # decode the space
-            predicted_labels, predicted_confidence, predicted_confidences = self._predict2dspace_(space)
+            predicted_labels, predicted_confidence, predicted_confidences = self._predict2dspace_fast_(space)
             computational_budget -= len(space)
             
             single_points_labels = predicted_labels[:len(single_points_space)]
@@ -538,7 +742,7 @@ class AbstractDBM:
             self.console.warn("Computational budget exceeded!")
 
         # decode the space
-        predicted_labels, predicted_confidence, _ = self._predict2dspace_(space)  
+        predicted_labels, predicted_confidence, _ = self._predict2dspace_fast_(space)  
         computational_budget -= len(space)
 
         
@@ -644,7 +848,7 @@ class AbstractDBM:
         if len(pseudo_decision_boundary_indexes) == 0:
             return img, confidence_img, None   
         space2d = np.array(pseudo_decision_boundary_indexes) / resolution
-        predicted_labels, predicted_confidence, _ = self._predict2dspace_(space2d)
+        predicted_labels, predicted_confidence, _ = self._predict2dspace_fast_(space2d)
         # fill the actual predicted labels and confidences
         for (i, j), label, conf in zip(pseudo_decision_boundary_indexes, predicted_labels, predicted_confidence):
             img[i, j] = int(label)
@@ -664,11 +868,11 @@ class AbstractDBM:
         
         if interpolation_method != "nearest":
             space2d_border = np.array(border_indexes) / resolution
-            _, _, confidences = self._predict2dspace_(space2d_border)
+            _, _, confidences = self._predict2dspace_fast_(space2d_border)
             confidence_map = [(i, j, confs) for (i, j), confs in zip(border_indexes, confidences)]
             
         space2d = np.array(indexes) / resolution  
-        _, _, predicted_confidences = self._predict2dspace_(space2d)
+        _, _, predicted_confidences = self._predict2dspace_fast_(space2d)
         
         for (i,j), confs in zip(indexes, predicted_confidences):
             confidence_map.append((i, j, confs)) # type: ignore
@@ -700,7 +904,7 @@ class AbstractDBM:
 
         # ------------------------------------------------------------   
         space2d = np.array(indexes) / resolution  
-        predicted_labels, predicted_confidence, _ = self._predict2dspace_(space2d)
+        predicted_labels, predicted_confidence, _ = self._predict2dspace_fast_(space2d)
       
         computational_budget -= len(indexes)
 
@@ -714,7 +918,7 @@ class AbstractDBM:
 
     def _generate_confidence_border_(self, resolution: int, border_indexes):
         space2d_border = np.array(border_indexes) / resolution
-        _, confidences_border, _ = self._predict2dspace_(space2d_border)
+        _, confidences_border, _ = self._predict2dspace_fast_(space2d_border)
         confidence_map = [(i, j, conf) for (i, j), conf in zip(border_indexes, confidences_border)]
         return confidence_map
 
@@ -812,40 +1016,40 @@ class AbstractDBM:
         return interpolate.griddata((X, Y), Z, (xi[None, :], yi[:, None]), method=method)
 
     @track_time_wrapper(logger=time_tracker_console)
-    def _generate_interpolation_rbf_(self, sparse_map, resolution:int, method:str='linear'):
+    def _generate_interpolation_rbf_(self, sparse_map, resolution:int, method:str='linear', neighbors: int = RBF_INTERPOLATION_NEIGHBORS_NUMBER):
         """A private method that uses interpolation to generate the values for the 2D space image
            The sparse map is a list of tuples (x, y, data) where x, y and data are in the range [0, 1]
+           Each pixel is interpolated by a local RBF fitted on its nearest data points only, so the cost grows linearly with the number of data points.
 
         Args:
             sparse_map (np.ndarray): a list of tuples (x, y, data) where x and y are the coordinates of the pixel and data is the data value
             resolution (int): the resolution of the image we want to generate (the image will be a square image)
-            method (str, optional): Defaults to 'linear'.
+            method (str, optional): The RBF kernel. Defaults to 'linear'.
+            neighbors (int, optional): The number of nearest data points used to interpolate each pixel. Defaults to RBF_INTERPOLATION_NEIGHBORS_NUMBER.
         """
         self.console.log(
             "Computing the interpolated image using RBF interpolation...")
-        X, Y, Z = [], [], []
-        for (x, y, z) in sparse_map:
-            X.append(x)
-            Y.append(y)
-            Z.append(z)
+        sparse_map = np.array(sparse_map, dtype=np.float64)
+        points, values = sparse_map[:, :2], sparse_map[:, 2]
 
-        rbf = interpolate.Rbf(X, Y, Z, function=method)
+        rbf = interpolate.RBFInterpolator(points, values, neighbors=min(neighbors, len(points)), kernel=method)
         ti = np.linspace(0, 1, resolution)
-        xx, yy = np.meshgrid(ti, ti)
-        
+
         """
-            using dask to parallelize the computation of the rbf function
-            the rbf function is applied to each pixel of the image
-            the image is divided into chunks and each chunk is processed in parallel
+            the image rows are split into as many blocks as there are cores
+            each block of rows is interpolated in a separate thread
             the result is then merged together
-            the number of chunks is equal to the number of cores
         """
-        cores = 4
+        cores = os.cpu_count() or 1
+        rows_blocks = np.array_split(np.arange(resolution), min(cores, resolution))
+
+        def interpolate_rows(rows):
+            xx, yy = np.meshgrid(ti, ti[rows])
+            return rbf(np.stack((xx.ravel(), yy.ravel()), axis=-1)).reshape(xx.shape)
+
+        with ThreadPoolExecutor(max_workers=len(rows_blocks)) as executor:
+            zz = np.concatenate(list(executor.map(interpolate_rows, rows_blocks)), axis=0)
 
-        ix = da.from_array(xx, chunks=(1, cores))  # type: ignore
-        iy = da.from_array(yy, chunks=(1, cores))  # type: ignore
-        iz = da.map_blocks(rbf, ix, iy)            # type: ignore
-        zz = iz.compute()
         self.console.log("Finished computing the interpolated image using RBF interpolation")
         return zz
 
@@ -854,7 +1058,8 @@ class AbstractDBM:
                                    X2d: np.ndarray | None = None,
                                    resolution: int | None = None,
                                    use_interpolation: bool = True,
-                                   save_folder: str | None = None):
+                                   save_folder: str | None = None,
+                                   use_neighbors_index: bool = False):
         """ 
         Calculates the projection errors of the given data.
 
@@ -865,6 +1070,12 @@ class AbstractDBM:
             spaceNd (np.array): The nD space of the data.
             use_interpolation (bool): Whether to use interpolation to generate the projection errors or use the inverse projection. Defaults to interpolation usage
             save_folder (str): The folder path where to store the projection errors results. Defaults to None.
+            use_neighbors_index (bool): When the inverse projection is used, whether to query prebuilt neighbors indexes (KD-tree for 2D, PCA-prefiltered KD-tree for nD) 
+                                        instead of sorting the whole data set for every pixel. It is much faster, the nD neighbors are exact (the pixels whose candidates 
+                                        do not contain them are computed on the whole data set) but the large nD ranks are estimated from a sample of DEFAULT_RANK_SAMPLE_SIZE points. 
+                                        Compared to the exact errors (before the normalization), with k=10 the per pixel difference measured at most 0.006 (mean 0.00004) on 
+                                        10000 points of rank 5 in 50 and 784 dimensions, and at most 0.008 (mean 0.002) on 3000 isotropic points in 50 dimensions when 
+                                        all the dimensions are kept. Defaults to False (i.e. exact errors).
         Returns:
             errors (np.array): The projection errors matrix of the given data. 
 
@@ -910,7 +1121,7 @@ class AbstractDBM:
         if use_interpolation:
             errors = self._generate_projection_errors_using_interpolation_(Xnd, X2d, resolution)
         else:
-            errors = self._generate_projection_errors_using_inverse_projection_(Xnd, X2d, resolution)
+            errors = self._generate_projection_errors_using_inverse_projection_(Xnd, X2d, resolution, use_neighbors_index=use_neighbors_index)
 
         self.console.log("Finished computing the projection errors!")
         if save_folder is not None:
@@ -924,27 +1135,13 @@ class AbstractDBM:
 
     @track_time_wrapper(logger=time_tracker_console)
     def _generate_projection_errors_using_interpolation_(self, Xnd, X2d, resolution):
-        errors = np.zeros((resolution, resolution))
         K = PROJECTION_ERRORS_NEIGHBORS_NUMBER  # Number of nearest neighbors to consider when computing the errors
-        metric = "euclidean"
-
-        self.console.log("Computing the 2D tree")
-        tree = KDTree(X2d, metric=metric)
-        self.console.log("Finished computing the 2D tree")
-        self.console.log("Computing the 2D tree indices")
-        indices_embedded = tree.query(X2d, k=len(X2d), return_distance=False)
-        # Drop the actual point itself
-        indices_embedded = indices_embedded[:, 1:]
-        self.console.log("Finished computing the 2D tree indices")
-
-        self.console.log("Calculating the nD distance indices")
-        indices_source = get_nd_indices_parallel(Xnd, metric=euclidean)
-        self.console.log("Finished computing the nD distance indices")
-
-        sparse_map = []
-        for k in range(len(X2d)):
-            x, y = X2d[k]
-            sparse_map.append((x, y, get_proj_error_parallel(indices_source[k], indices_embedded[k], k=K)))
+
+        self.console.log("Calculating the projection errors of the data points")
+        points_errors = get_proj_errors(Xnd, X2d, k=K)
+        self.console.log("Finished computing the projection errors of the data points")
+
+        sparse_map = [(x, y, error) for (x, y), error in zip(X2d, points_errors)]
 
         errors = self._generate_interpolation_rbf_(sparse_map, resolution, method='linear').T
 
@@ -957,7 +1154,8 @@ class AbstractDBM:
     def _generate_projection_errors_using_inverse_projection_(self,
                                                               Xnd: np.ndarray,
                                                               X2d: np.ndarray,
-                                                              resolution: int = 256):
+                                                              resolution: int = 256,
+                                                              use_neighbors_index: bool = False):
 
         K = PROJECTION_ERRORS_NEIGHBORS_NUMBER  # Number of nearest neighbors to consider when computing the errors
         space2d = np.array([(i / resolution, j / resolution) for i in range(resolution) for j in range(resolution)])  # generate the 2D flatten space
@@ -969,6 +1167,12 @@ class AbstractDBM:
         self.console.log(f"Splitting the 2D space into {chunks_number} chunks")
         space2d_chunks = np.array_split(space2d, chunks_number)
 
+        neighbors_index = None
+        if use_neighbors_index:
+            self.console.warn("The projection errors are approximated using the neighbors indexes, the large nD ranks are estimated from a sample of the data")
+            self.console.log("Building the neighbors indexes of the data")
+            neighbors_index = NeighborsIndex(Xnd, X2d)
+
         chunk_index = 0
         for space2d_chunk in space2d_chunks:
             chunk_index += 1
@@ -976,8 +1180,11 @@ class AbstractDBM:
             spaceNd_chunk = self.neural_network.decode(space2d_chunk)  # decode the 2D space to nD space
             spaceNd_chunk = spaceNd_chunk.reshape((spaceNd_chunk.shape[0], -1))  # flatten the space
 
-            with ProgressBar(total=len(space2d_chunk)) as progress:
-                errors_chunk = get_projection_errors_using_inverse_projection(Xnd=Xnd, X2d=X2d, spaceNd=spaceNd_chunk, space2d=space2d_chunk, k=K, progress=progress)
+            if neighbors_index is not None:
+                errors_chunk = neighbors_index.get_projection_errors(space2d_chunk, spaceNd_chunk, k=K)
+            else:
+                with ProgressBar(total=len(space2d_chunk)) as progress:
+                    errors_chunk = get_projection_errors_using_inverse_projection(Xnd=Xnd, X2d=X2d, spaceNd=spaceNd_chunk, space2d=space2d_chunk, k=K, progress=progress)
 
             errors = np.concatenate((errors, errors_chunk))
 
@@ -13,17 +13,78 @@
 # limitations under the License.
 
 from math import sqrt
+from enum import Enum
 import tensorflow as tf
 import os
 import numpy as np
 import json
 import matplotlib.pyplot as plt
 
-from ..Logger import Logger, LoggerInterface
+from ..Logger import Logger, LoggerInterface, LoggerModel
 
 TRAINING_HISTORY_FILE_NAME = "history.json"
+ARCHITECTURE_FILE_SUFFIX = "_architecture.json"
+WEIGHTS_FILE_SUFFIX = "_weights.npz"
+HIDDEN_LAYERS_FILE_SUFFIX = "_hidden_layers.json"
+VALIDATION_SPLIT = 0.2
+DEFAULT_FINE_TUNING_EPOCHS = 10
+DEFAULT_FINE_TUNING_LEARNING_RATE = 1e-4
+DEFAULT_REPLAY_RATIO = 1.0
+FINE_TUNING_PATIENCE = 3
+MIN_LAYER_WIDTH = 8
 SEED = 42
 
+class NN_SIZE_PRESETS(Enum):
+    TINY = "tiny"
+    SMALL = "small"
+    DEFAULT = "default"
+    LARGE = "large"
+
+    @classmethod
+    def list(cls):
+        return list(map(lambda c: c.value, cls))
+
+# the hidden layers widths of the decoders (2D -> nD), the encoders use them in the reversed order
+NN_SIZE_PRESETS_LAYERS = {
+    NN_SIZE_PRESETS.TINY: (16, 32, 64),
+    NN_SIZE_PRESETS.SMALL: (32, 64, 128),
+    NN_SIZE_PRESETS.DEFAULT: (32, 64, 128, 512),
+    NN_SIZE_PRESETS.LARGE: (64, 128, 256, 1024),
+}
+
+def get_hidden_layers(preset: NN_SIZE_PRESETS = NN_SIZE_PRESETS.DEFAULT, width: int | None = None, depth: int | None = None) -> tuple:
+    """ 
+    Returns the hidden layers widths of a decoder.
+    
+    Args:
+        preset (NN_SIZE_PRESETS, optional): The size preset. Defaults to NN_SIZE_PRESETS.DEFAULT.
+        width (int | None, optional): The width of the widest (i.e. last) hidden layer, overrides the preset. Defaults to None.
+        depth (int | None, optional): The number of hidden layers, overrides the preset. Each layer is half as wide as the next one. Defaults to None.
+    """
+    layers = NN_SIZE_PRESETS_LAYERS[preset]
+    if width is None and depth is None:
+        return layers
+    width = width if width is not None else layers[-1]
+    depth = depth if depth is not None else len(layers)
+    return tuple(max(width // 2**(depth - 1 - i), MIN_LAYER_WIDTH) for i in range(depth))
+
+def build_dense_layers(widths: tuple) -> list:
+    """ 
+    Builds a stack of relu Dense layers, the first one is regularized, the others start with a small positive bias.
+
+    Args:
+        widths (tuple): The widths of the layers.
+    """
+    layers = []
+    for i, width in enumerate(widths):
+        if i == 0:
+            layers.append(tf.keras.layers.Dense(width, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
+                                                kernel_regularizer=tf.keras.regularizers.l2(0.0002)))
+        else:
+            layers.append(tf.keras.layers.Dense(width, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
+                                                bias_initializer=tf.keras.initializers.Constant(0.01)))  # type: ignore
+    return layers
+
 class AbstractNN:
     """ 
     Defines an abstract class for the neural networks used by the Decision Boundary Mapper.
@@ -40,7 +101,8 @@ class AbstractNN:
     def __init__(self,
                  folder_path: str,
                  nn_name: str,
-                 logger: LoggerInterface | None = None):
+                 logger: LoggerInterface | None = None,
+                 hidden_layers: tuple | None = None):
         """ 
         Initializes an NN object.
 
@@ -48,6 +110,7 @@ class AbstractNN:
             folder_path (str): the folder path where the model will be saved/loaded.
             nn_name (str): Name of the neural network that uses the classifier.
             logger (LoggerInterface, optional): Defaults to console logging.
+            hidden_layers (tuple | None, optional): The hidden layers widths (see get_hidden_layers), a saved model with other widths is not loaded. Defaults to None.
 
         Raises:
             Exception: If the classifier is not provided.
@@ -59,20 +122,39 @@ class AbstractNN:
 
         self.save_folder_path = folder_path
         self.nn_name = nn_name
+        self.hidden_layers = tuple(hidden_layers) if hidden_layers is not None else None
         self.neural_network = None
 
         try:
             self.load()
         except Exception as e:
-            self.console.warn("Model not found, {}".format(e))
+            self.console.warn("Model not loaded, {}".format(e))
             self.console.warn("The model will be built and trained from scratch.")
 
     def load(self):
         """
-            Loads an auto encoder from the specified folder path. With the .h5 extension.
+            Loads the model from the specified folder path. 
+            The weights checkpoint (architecture JSON + weights .npz) is preferred, since it loads much faster than the saved model.
             Args:
                 folder_path (str): The path to the folder where the model is saved.
+
+            Raises:
+                Exception: If the saved model has other hidden layers widths than the requested ones.
         """
+        self.__check_hidden_layers__()
+
+        architecture_path, weights_path = self.__get_checkpoint_paths__()
+        if os.path.exists(architecture_path) and os.path.exists(weights_path):
+            try:
+                with open(architecture_path, "r") as f:
+                    self.neural_network = tf.keras.models.model_from_json(f.read())
+                with np.load(weights_path) as weights:
+                    self.neural_network.set_weights([weights[f"arr_{i}"] for i in range(len(weights.files))])
+                self.console.log("NN loaded successfully from the weights checkpoint")
+                return
+            except Exception as e:
+                self.console.warn(f"Could not load the weights checkpoint, loading the saved model instead. {e}")
+
         try:
             self.neural_network = tf.keras.models.load_model(os.path.join(self.save_folder_path, self.nn_name), compile=False)
             self.console.log("NN loaded successfully")
@@ -80,6 +162,8 @@ class AbstractNN:
             self.console.log(
                 f"NN not found. Please check the path folder {self.save_folder_path} and make sure the model is saved there")
             raise e
+        # models saved before the weights checkpoints existed get one, so the next load is fast
+        self.__save_checkpoint__()
 
     def save(self, history=None):
         """
@@ -89,8 +173,14 @@ class AbstractNN:
         if not os.path.exists(folder_path):
             os.makedirs(folder_path)
 
+        # the old checkpoint is removed first, if writing the new one fails the load falls back to the new saved model instead of the stale weights
+        self.__remove_checkpoint__()
         path = os.path.join(folder_path, self.neural_network.name)  # type: ignore
         self.neural_network.save(path, save_format="tf")            # type: ignore
+        self.__save_checkpoint__()
+        if self.hidden_layers is not None:
+            with open(self.__get_hidden_layers_path__(), "w") as f:
+                f.write(json.dumps(list(self.hidden_layers)))
         self.console.log(f"Model saved to {folder_path}")
 
         if history is None:
@@ -100,6 +190,178 @@ class AbstractNN:
             f.write(json.dumps(history.history))
             self.console.log(f"History saved to {folder_path}")
 
+    def _fit_neural_network_(self, x: np.ndarray, y, epochs: int, batch_size: int, callbacks: list,
+                             use_data_pipeline: bool = False, map_fn=None):
+        """
+            Fits the neural network, holding out the last VALIDATION_SPLIT of the data for validation, and logs the training throughput (samples/s) of every epoch.
+            
+            Args:
+                x (np.ndarray): Train input values
+                y (np.ndarray | list[np.ndarray]): Train target values (a list for multiple outputs)
+                epochs (int): The number of epochs.
+                batch_size (int): Data points used for one batch.
+                callbacks (list): The training callbacks, a LoggerModel callback among them reports the training throughput.
+                use_data_pipeline (bool, optional): If True the data is fed through a tf.data pipeline (split once, shuffled batches, prefetching)
+                                                    instead of slicing the numpy arrays on the host every epoch. Defaults to False.
+                map_fn (function, optional): function: (x, y) -> (x, y) applied to every sample in parallel in the tf.data pipeline, so a random augmentation differs every epoch. Defaults to None.
+            
+            Returns:
+                history: The training history.
+        """
+        n_train = int(len(x) * (1 - VALIDATION_SPLIT))
+        for callback in callbacks:
+            if isinstance(callback, LoggerModel):
+                callback.samples = n_train
+
+        if not use_data_pipeline:
+            if map_fn is not None:
+                self.console.warn("map_fn is applied only when using the data pipeline, ignoring it")
+            return self.neural_network.fit(x, y,  # type: ignore
+                                           epochs=epochs,
+                                           batch_size=batch_size,
+                                           shuffle=True,
+                                           validation_split=VALIDATION_SPLIT,
+                                           callbacks=callbacks,
+                                           verbose=0)
+
+        train_dataset, validation_dataset = self.__get_datasets__(x, y, n_train, batch_size, map_fn)
+        return self.neural_network.fit(train_dataset,  # type: ignore
+                                       epochs=epochs,
+                                       validation_data=validation_dataset,
+                                       callbacks=callbacks,
+                                       verbose=0)
+
+    def _fine_tune_neural_network_(self, x_new: np.ndarray, y_new: np.ndarray, 
+                                   x_old: np.ndarray | None, y_old: np.ndarray | None,
+                                   loss, epochs: int = DEFAULT_FINE_TUNING_EPOCHS, batch_size: int = 32,
+                                   replay_ratio: float = DEFAULT_REPLAY_RATIO,
+                                   learning_rate: float = DEFAULT_FINE_TUNING_LEARNING_RATE,
+                                   use_data_pipeline: bool = False):
+        """
+            Fine-tunes the already trained neural network on new data, replaying a random subsample of the old data so the network does not forget it.
+            
+            Args:
+                x_new (np.ndarray): New input values
+                y_new (np.ndarray): New target values
+                x_old (np.ndarray | None): Input values the network was trained on. If None, only the new data is used.
+                y_old (np.ndarray | None): Target values the network was trained on.
+                loss: The training loss of the network.
+                epochs (int, optional): The maximum number of epochs. Defaults to DEFAULT_FINE_TUNING_EPOCHS.
+                batch_size (int, optional): Data points used for one batch. Defaults to 32.
+                replay_ratio (float, optional): The number of replayed old data points per new data point. Defaults to DEFAULT_REPLAY_RATIO.
+                learning_rate (float, optional): The learning rate, lower than the one of the initial training so the learned mapping is only adjusted. Defaults to DEFAULT_FINE_TUNING_LEARNING_RATE.
+                use_data_pipeline (bool, optional): If True the data is fed through a tf.data pipeline. Defaults to False.
+            
+            Returns:
+                history: The training history.
+        """
+        rng = np.random.default_rng(SEED)
+        x, y = x_new, y_new
+        if x_old is not None and y_old is not None and len(x_old) > 0:
+            replay_size = min(len(x_old), int(len(x_new) * replay_ratio))
+            replay_indices = rng.choice(len(x_old), size=replay_size, replace=False)
+            self.console.log(f"Replaying {replay_size} of the {len(x_old)} old data points")
+            x = np.concatenate((x_new, x_old[replay_indices]), axis=0)
+            y = np.concatenate((y_new, y_old[replay_indices].reshape((-1,) + y_new.shape[1:])), axis=0)
+
+        # mixing the new and the replayed data, so both are in the training and in the validation data
+        permutation = rng.permutation(len(x))
+        x, y = x[permutation], y[permutation]
+
+        self.neural_network.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),  # type: ignore
+                                    loss=loss,
+                                    metrics=["accuracy"])
+        stopping_callback = tf.keras.callbacks.EarlyStopping(monitor='val_loss', mode='min', patience=FINE_TUNING_PATIENCE, restore_best_weights=True)
+        logger_callback = LoggerModel(name=self.nn_name, show_init=False, epochs=epochs, print_fn=self.console.log)
+
+        self.console.log(f"Fine-tuning the model on {len(x)} data points for at most {epochs} epochs...")
+        history = self._fit_neural_network_(x, y,
+                                            epochs=epochs,
+                                            batch_size=batch_size,
+                                            callbacks=[stopping_callback, logger_callback],
+                                            use_data_pipeline=use_data_pipeline)
+        self.console.log("Model fine-tuned!")
+        self.save(history)
+        return history
+
+    def __get_datasets__(self, x: np.ndarray, y, n_train: int, batch_size: int, map_fn=None):
+        """
+            Builds the tf.data training and validation pipelines.
+            The split is made once over the in-memory arrays, the training batches are reshuffled every epoch and prefetched while the model trains.
+            The datasets are not cached, since caching the in-memory slices would only keep a second copy of the data.
+            The map_fn runs every epoch, so a random augmentation draws new samples every epoch.
+        """
+        x_original = x
+        x = np.asarray(x, dtype=np.float32)
+        y = tuple(y) if isinstance(y, list) else y
+        # the targets that are the inputs themselves (e.g. for auto encoders) share the converted inputs instead of being copied again
+        y = tf.nest.map_structure(lambda t: x if t is x_original else (t.astype(np.float32) if t.dtype == np.float64 else t), y)
+
+        def make_dataset(start: int | None, end: int | None):
+            dataset = tf.data.Dataset.from_tensor_slices((x[start:end], tf.nest.map_structure(lambda t: t[start:end], y)))
+            if map_fn is not None:
+                dataset = dataset.map(map_fn, num_parallel_calls=tf.data.AUTOTUNE)
+            return dataset
+
+        train_dataset = make_dataset(None, n_train) \
+            .shuffle(buffer_size=n_train, seed=SEED, reshuffle_each_iteration=True) \
+            .batch(batch_size) \
+            .prefetch(tf.data.AUTOTUNE)
+        validation_dataset = make_dataset(n_train, None) \
+            .batch(batch_size) \
+            .prefetch(tf.data.AUTOTUNE)
+        return train_dataset, validation_dataset
+
+    def __get_checkpoint_paths__(self):
+        """
+            Returns the paths of the architecture JSON and of the weights .npz files of the weights checkpoint.
+        """
+        return (os.path.join(self.save_folder_path, self.nn_name + ARCHITECTURE_FILE_SUFFIX),
+                os.path.join(self.save_folder_path, self.nn_name + WEIGHTS_FILE_SUFFIX))
+
+    def __get_hidden_layers_path__(self):
+        return os.path.join(self.save_folder_path, self.nn_name + HIDDEN_LAYERS_FILE_SUFFIX)
+
+    def __check_hidden_layers__(self):
+        """
+            Checks that the saved model was built with the requested hidden layers widths (e.g. another size preset).
+            
+            Raises:
+                Exception: If the widths differ, so the model is rebuilt instead of silently ignoring the requested size.
+        """
+        path = self.__get_hidden_layers_path__()
+        if self.hidden_layers is None or not os.path.exists(path):
+            # models saved before the widths were recorded cannot be checked
+            return
+        with open(path, "r") as f:
+            saved_hidden_layers = tuple(json.loads(f.read()))
+        if saved_hidden_layers != self.hidden_layers:
+            raise Exception(f"the model saved in {self.save_folder_path} has the hidden layers {saved_hidden_layers}, "
+                            f"but {self.hidden_layers} were requested")
+
+    def __save_checkpoint__(self):
+        """
+            Saves the weights checkpoint of the model, i.e. its architecture as JSON and its weights in a single .npz file.
+        """
+        architecture_path, weights_path = self.__get_checkpoint_paths__()
+        try:
+            # the weights are written first, so a checkpoint with an architecture file is always complete
+            with open(weights_path, "wb") as f:
+                np.savez(f, *self.neural_network.get_weights())  # type: ignore
+            with open(architecture_path, "w") as f:
+                f.write(self.neural_network.to_json())  # type: ignore
+        except Exception as e:
+            self.console.warn(f"Could not save the weights checkpoint. {e}")
+            self.__remove_checkpoint__()
+
+    def __remove_checkpoint__(self):
+        for path in self.__get_checkpoint_paths__():
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except Exception as e:
+                self.console.warn(f"Could not remove the weights checkpoint file {path}. {e}")
+
     def show_predictions(self, dataNd: np.ndarray, labels: np.ndarray, data2d: np.ndarray | None = None, n_samples: int = 16):
         """ Shows the predictions of the model. By taking first n_samples data points and comparing them to the actual labels.
 
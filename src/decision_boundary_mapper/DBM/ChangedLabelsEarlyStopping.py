@@ -0,0 +1,84 @@
+# Copyright 2023 Cristian Grosu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tensorflow as tf
+import numpy as np
+
+from ..Logger import Logger, LoggerInterface
+
+CHANGED_LABELS_TARGET_ACCURACY = 0.99
+CHANGED_LABELS_MIN_IMPROVEMENT = 0.005
+CHANGED_LABELS_PATIENCE = 2
+
+
+class ChangedLabelsEarlyStopping(tf.keras.callbacks.Callback):
+    """
+    Stops the fine-tuning of a classifier once it has learned the labels changed by the user.
+    After every epoch the training accuracy on the changed samples is computed, the training stops when it reaches
+    the target accuracy or when it stops improving for a number of successive epochs.
+
+    Example:
+        >>> stopping_callback = ChangedLabelsEarlyStopping(X[changed_indices], Y[changed_indices])
+        >>> classifier.fit(X, Y, callbacks=[stopping_callback])
+    """
+
+    def __init__(self, X_changed: np.ndarray, Y_changed: np.ndarray,
+                 target_accuracy: float = CHANGED_LABELS_TARGET_ACCURACY,
+                 min_improvement: float = CHANGED_LABELS_MIN_IMPROVEMENT,
+                 patience: int = CHANGED_LABELS_PATIENCE,
+                 logger: LoggerInterface | None = None):
+        """
+        Initializes the callback.
+
+        Args:
+            X_changed (np.ndarray): The samples whose labels were changed.
+            Y_changed (np.ndarray): The new labels of the changed samples.
+            target_accuracy (float, optional): The accuracy on the changed samples at which the training stops. Defaults to CHANGED_LABELS_TARGET_ACCURACY.
+            min_improvement (float, optional): The smallest accuracy increase counted as an improvement. Defaults to CHANGED_LABELS_MIN_IMPROVEMENT.
+            patience (int, optional): The number of successive epochs without improvement after which the training stops. Defaults to CHANGED_LABELS_PATIENCE.
+            logger (LoggerInterface, optional): The logger for outputting info messages. Defaults to console logging.
+        """
+        super().__init__()
+        self.X_changed = X_changed
+        self.Y_changed = np.asarray(Y_changed).reshape(-1)
+        self.target_accuracy = target_accuracy
+        self.min_improvement = min_improvement
+        self.patience = patience
+        self.console = logger if logger is not None else Logger(name="Changed labels early stopping")
+
+        self.best_accuracy = 0.0
+        self.epochs_without_improvement = 0
+
+    def on_train_begin(self, logs=None):
+        self.best_accuracy = 0.0
+        self.epochs_without_improvement = 0
+
+    def on_epoch_end(self, epoch, logs=None):
+        predictions = self.model(self.X_changed, training=False)
+        accuracy = float(np.mean(np.argmax(predictions, axis=1) == self.Y_changed))
+        self.console.log(f"[Epoch {epoch}] Accuracy on the changed labels: {accuracy * 100:.2f}%")
+
+        if accuracy >= self.target_accuracy:
+            self.console.log(f"The changed labels are learned, stopping the training at epoch {epoch}")
+            self.model.stop_training = True
+            return
+
+        if accuracy > self.best_accuracy + self.min_improvement:
+            self.best_accuracy = accuracy
+            self.epochs_without_improvement = 0
+        else:
+            self.epochs_without_improvement += 1
+            if self.epochs_without_improvement >= self.patience:
+                self.console.log(f"The accuracy on the changed labels converged, stopping the training at epoch {epoch}")
+                self.model.stop_training = True
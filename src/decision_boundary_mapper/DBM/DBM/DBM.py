@@ -13,19 +13,27 @@
 # limitations under the License.
 
 import os
+import json
+import hashlib
 import numpy as np
 
 from .NNInv import DEFAULT_MODEL_PATH, NNInv
-from .projections import PROJECTION_METHODS
+from .PCAInv import PCAInv
+from .projections import PROJECTION_METHODS, LANDMARK_STRATEGIES, Projection, LandmarkProjection, get_projection_parameters
+from .coreset import CORESET_STRATEGIES, CORESET_SEED, CORESET_DEFAULT_DENSITY_WEIGHT, select_coreset
 
 
+from ..AbstractNN import DEFAULT_FINE_TUNING_EPOCHS, DEFAULT_REPLAY_RATIO, NN_SIZE_PRESETS
+from ..MapStabilityEarlyStopping import MapStabilityEarlyStopping
 from ..AbstractDBM import AbstractDBM, DBM_DEFAULT_RESOLUTION, DEFAULT_TRAINING_EPOCHS, DEFAULT_BATCH_SIZE, FAST_DBM_STRATEGIES
 
-from ...utils import track_time_wrapper, TRAIN_DATA_POINT_MARKER, TEST_DATA_POINT_MARKER, TRAIN_2D_FILE_NAME, TEST_2D_FILE_NAME
+from ...utils import track_time_wrapper, get_array_fingerprint, TRAIN_DATA_POINT_MARKER, TEST_DATA_POINT_MARKER, TRAIN_2D_FILE_NAME, TEST_2D_FILE_NAME, PROJECTIONS_CACHE_FOLDER
 from ...Logger import LoggerInterface, Logger
 time_tracker_console = Logger(name="Decision Boundary Mapper - DBM", info_color="cyan", show_init=False)
 
 CUSTOM_PROJECTION_NAME = "Custom"
+LANDMARKS_CACHE_SUFFIX = "_landmarks.npy"
+CORESET_HOLDOUT_SIZE = 2000
 
 class DBM(AbstractDBM):
     """
@@ -35,6 +43,8 @@ class DBM(AbstractDBM):
     Public methods:
         fit: Learns an inverse projection by training a neural network. \n
         get_decision_boundary_map: Returns the decision boundary map for the given classifier. \n
+        transform_2d: Projects new data on the 2D space of the decision boundary map. \n
+        fine_tune: Adds new data to the decision boundary map and fine-tunes the inverse projection on it. \n
 
     Example:
         >>> from DBM import DBM
@@ -56,13 +66,20 @@ class DBM(AbstractDBM):
         """
         super().__init__(classifier, logger)
         self.neural_network = None  # type: ignore
+        self.projection: Projection | None = None
+        self.normalization: tuple[np.ndarray, np.ndarray] | None = None
 
     @track_time_wrapper(logger=time_tracker_console)
     def fit(self,
             X2d: np.ndarray, Xnd: np.ndarray,
             epochs: int = DEFAULT_TRAINING_EPOCHS, batch_size: int = DEFAULT_BATCH_SIZE,
             load_folder: str = DEFAULT_MODEL_PATH,
-            is_data_normalized: bool = True):
+            is_data_normalized: bool = True,
+            use_data_pipeline: bool = False,
+            stop_on_map_stability: bool = False,
+            size_preset: NN_SIZE_PRESETS = NN_SIZE_PRESETS.DEFAULT,
+            inverse_projection_NN: NNInv | None = None,
+            extra_callbacks: list | None = None):
         """ 
         Learns the inverse projection on the given data set.
 
@@ -72,16 +89,24 @@ class DBM(AbstractDBM):
             epochs (int, optional): The number of epochs for which the DBM is trained. Defaults to 300.
             batch_size (int, optional): Train batch size. Defaults to 32.
             is_data_normalized (bool, optional): Determine the last layer activation function of the NNinv, sigmoid or relu. Defaults to True (i.e. activation sigmoid).
+            use_data_pipeline (bool, optional): If True the NNInv is trained using a tf.data pipeline. Defaults to False.
+            stop_on_map_stability (bool, optional): If True the training also stops once a coarse decision boundary map stops changing. Defaults to False.
+            size_preset (NN_SIZE_PRESETS, optional): The size of the NNInv hidden layers. Defaults to NN_SIZE_PRESETS.DEFAULT.
+            inverse_projection_NN (NNInv | None, optional): An already created NNInv to train, if it was loaded it is not trained again. Defaults to None (i.e. it is created, or loaded from load_folder).
+            extra_callbacks (list | None, optional): Additional training callbacks (e.g. TrainingCancellation). Defaults to None.
      
         Returns:
             inverse_porjection_NN (NNInv): The trained inverse projection neural network.
         """
 
-        inverse_projection_NN = NNInv(folder_path=load_folder, logger=self.console)
+        if inverse_projection_NN is None:
+            inverse_projection_NN = NNInv(folder_path=load_folder, logger=self.console, preset=size_preset)
         inverse_projection_NN.fit(X2d, Xnd,
                                   epochs=epochs,
                                   batch_size=batch_size,
-                                  is_data_normalized=is_data_normalized)
+                                  is_data_normalized=is_data_normalized,
+                                  use_data_pipeline=use_data_pipeline,
+                                  extra_callbacks=([MapStabilityEarlyStopping(self.classifier, logger=self.console)] if stop_on_map_stability else []) + (extra_callbacks or []))
         return inverse_projection_NN
 
     def generate_boundary_map(self,
@@ -95,7 +120,18 @@ class DBM(AbstractDBM):
                               fast_decoding_strategy: FAST_DBM_STRATEGIES = FAST_DBM_STRATEGIES.NONE,
                               load_folder: str = DEFAULT_MODEL_PATH,
                               projection: str = 't-SNE',
-                              is_data_normalized: bool = True):
+                              is_data_normalized: bool = True,
+                              landmarks: int | None = None,
+                              landmarks_strategy: LANDMARK_STRATEGIES = LANDMARK_STRATEGIES.RANDOM,
+                              train_on_landmarks: bool = False,
+                              nn_use_data_pipeline: bool = False,
+                              nn_stop_on_map_stability: bool = False,
+                              nn_size_preset: NN_SIZE_PRESETS = NN_SIZE_PRESETS.DEFAULT,
+                              nn_coreset_budget: int | None = None,
+                              nn_coreset_strategy: CORESET_STRATEGIES = CORESET_STRATEGIES.DENSITY,
+                              nn_coreset_density_weight: float = CORESET_DEFAULT_DENSITY_WEIGHT,
+                              use_surrogate: bool = False,
+                              nn_extra_callbacks: list | None = None):
         """ 
         Generates a 2D boundary map of the classifier's decision boundary.
 
@@ -111,12 +147,24 @@ class DBM(AbstractDBM):
             load_folder (str, optional): The folder in which the model will be stored or if exists loaded from. Defaults to DEFAULT_MODEL_PATH
             projection (str, optional): The projection method to be used. Defaults to 't-SNE'.
             is_data_normalized (bool, optional): Determine the last layer activation function of the NNinv, sigmoid or relu. Defaults to True (i.e. activation sigmoid).
+            landmarks (int | None, optional): If given, only this many landmarks are projected using the projection method and the rest of the data is placed around them. Defaults to None (i.e. the whole data set is projected).
+            landmarks_strategy (LANDMARK_STRATEGIES, optional): How the landmarks are selected. Defaults to LANDMARK_STRATEGIES.RANDOM.
+            train_on_landmarks (bool, optional): If True the NNInv is trained only on the landmarks. Defaults to False.
+            nn_use_data_pipeline (bool, optional): If True the NNInv is trained using a tf.data pipeline. Defaults to False.
+            nn_stop_on_map_stability (bool, optional): If True the NNInv training also stops once a coarse decision boundary map stops changing. Defaults to False.
+            nn_size_preset (NN_SIZE_PRESETS, optional): The size of the NNInv hidden layers. Defaults to NN_SIZE_PRESETS.DEFAULT.
+            nn_coreset_budget (int | None, optional): If given, the NNInv is trained only on a core set of this many data points (its validation split is also taken from the core set), 
+                                                      the reconstruction errors on the rest of the data are only logged. It is ignored if a trained NNInv is loaded from load_folder. Defaults to None (i.e. all the data points).
+            nn_coreset_strategy (CORESET_STRATEGIES, optional): How the core set is selected. Defaults to CORESET_STRATEGIES.DENSITY.
+            nn_coreset_density_weight (float, optional): The weighting of the density-aware core set selection, 0 is uniform sampling. Defaults to CORESET_DEFAULT_DENSITY_WEIGHT.
+            use_surrogate (bool, optional): If True the fast decoding strategies use a distilled 2D -> class surrogate network and evaluate exactly only the points near the boundaries (see fit_surrogate). Defaults to False.
+            nn_extra_callbacks (list | None, optional): Additional callbacks of the NNInv training (e.g. TrainingCancellation). Defaults to None.
      
         Returns:
             img (np.array): A 2D numpy array with the decision boundary map, each element is an integer representing the class of the corresponding point.
             img_confidence (np.array): A 2D numpy array with the decision boundary map, each element is a float representing the confidence of the classifier for the corresponding point.
-            encoded_2d_train (np.array): An array representing the projection of the training data set, each element is a tuple representing the coordinates and the class of the corresponding point.
-            encoded_2d_test (np.array): An array representing the projection of the testing data set, each element is an tuple representing the coordinates and the class of the corresponding point.
+            encoded_2d_train (np.array): An array representing the projection of the training data set, each element is a tuple representing the coordinates and the class predicted by the classifier for the corresponding point.
+            encoded_2d_test (np.array): An array representing the projection of the testing data set, each element is an tuple representing the coordinates and the class predicted by the classifier for the corresponding point.
     
         Example:
             >>> dbm = DBM(classifier)
@@ -135,8 +183,9 @@ class DBM(AbstractDBM):
             assert projection in PROJECTION_METHODS.keys()
             Xnd_train_flatten = Xnd_train.reshape((Xnd_train.shape[0], -1))
             Xnd_test_flatten = Xnd_test.reshape((Xnd_test.shape[0], -1))
-            X2d_train, X2d_test = self.__transform_2d__(Xnd_train_flatten, Xnd_test_flatten, load_folder, projection)
+            X2d_train, X2d_test = self.__transform_2d__(Xnd_train_flatten, Xnd_test_flatten, load_folder, projection, landmarks, landmarks_strategy)
         else:
+            self.projection = None
             # Normalize the data to be in the range of [0,1]
             X2d_train, X2d_test = self.__normalize_2d__(X2d_train, X2d_test)
             
@@ -147,16 +196,47 @@ class DBM(AbstractDBM):
 
 
         if self.neural_network is None:
+            self.surrogate = None
             X2d = np.concatenate((X2d_train, X2d_test), axis=0)
             Xnd = np.concatenate((Xnd_train, Xnd_test), axis=0)
-            self.neural_network = self.fit(X2d, Xnd,
-                                           epochs = nn_train_epochs, 
-                                           batch_size = nn_train_batch_size,
-                                           load_folder=load_folder,
-                                           is_data_normalized=is_data_normalized)
+            if train_on_landmarks and isinstance(self.projection, LandmarkProjection) and self.projection.landmarks_indices is not None:
+                self.console.log(f"Training the inverse projection on {len(self.projection.landmarks_indices)} landmarks")
+                X2d, Xnd = X2d[self.projection.landmarks_indices], Xnd[self.projection.landmarks_indices]
+            if self.projection is not None and self.projection.name == "PCA":
+                # PCA has a closed form inverse, no need to learn it
+                self.neural_network = self.__get_pca_inverse_projection__(Xnd, load_folder, is_data_normalized)
+            else:
+                inverse_projection_NN = NNInv(folder_path=load_folder, logger=self.console, preset=nn_size_preset)
+                holdout_indices = None
+                if inverse_projection_NN.neural_network is not None:
+                    if nn_coreset_budget is not None:
+                        self.console.warn(f"The inverse projection was loaded from {load_folder} instead of being trained, the core set budget is ignored")
+                elif nn_coreset_budget is not None and nn_coreset_budget < len(X2d):
+                    self.console.log(f"Training the inverse projection on a core set of {nn_coreset_budget} out of {len(X2d)} data points ({nn_coreset_strategy.value})")
+                    coreset_indices = select_coreset(X2d, nn_coreset_budget, nn_coreset_strategy, nn_coreset_density_weight)
+                    holdout_indices = np.setdiff1d(np.arange(len(X2d)), coreset_indices)
+                    X2d_all, Xnd_all = X2d, Xnd
+                    X2d, Xnd = X2d[coreset_indices], Xnd[coreset_indices]
+                self.neural_network = self.fit(X2d, Xnd,
+                                               epochs = nn_train_epochs, 
+                                               batch_size = nn_train_batch_size,
+                                               load_folder=load_folder,
+                                               is_data_normalized=is_data_normalized,
+                                               use_data_pipeline=nn_use_data_pipeline,
+                                               stop_on_map_stability=nn_stop_on_map_stability,
+                                               size_preset=nn_size_preset,
+                                               inverse_projection_NN=inverse_projection_NN,
+                                               extra_callbacks=nn_extra_callbacks)
+                if holdout_indices is not None:
+                    self.__log_holdout_errors__(X2d, Xnd, X2d_all[holdout_indices], Xnd_all[holdout_indices])
 
         self.resolution = resolution
 
+        # without use_surrogate the map is always predicted exactly, even if a surrogate was fitted by an earlier call
+        self.use_surrogate = use_surrogate
+        if use_surrogate and fast_decoding_strategy != FAST_DBM_STRATEGIES.NONE and self.surrogate is None:
+            self.fit_surrogate()
+
         self.console.log("Decoding the 2D space... 2D -> nD")
 
         img, img_confidence = self.get_dbm(fast_decoding_strategy, resolution, load_folder)
@@ -171,22 +251,18 @@ class DBM(AbstractDBM):
         X2d_train = X2d_train.astype(int)
         X2d_test = X2d_test.astype(int)
 
-        encoded_2d_train = np.zeros((len(X2d_train), 3))
-        encoded_2d_test = np.zeros((len(X2d_test), 3))
+        # the labels of the data points are the classifier predictions, cached until the classifier changes
+        labels_train = self.predict_classifier(Xnd_train).argmax(axis=-1)
+        labels_test = self.predict_classifier(Xnd_test).argmax(axis=-1)
 
-        for k in range(len(X2d_train)):
-            [i, j] = X2d_train[k]
-            encoded_2d_train[k] = [i, j, img[i, j]]
-        for k in range(len(X2d_test)):
-            [i, j] = X2d_test[k]
-            encoded_2d_test[k] = [i, j, img[i, j]]
+        encoded_2d_train = np.column_stack((X2d_train, labels_train)).astype(np.float64)
+        encoded_2d_test = np.column_stack((X2d_test, labels_test)).astype(np.float64)
 
-        for [i, j] in X2d_test:
-            img[i, j] = TEST_DATA_POINT_MARKER
-            img_confidence[i, j] = 1
-        for [i, j] in X2d_train:
-            img[i, j] = TRAIN_DATA_POINT_MARKER
-            img_confidence[i, j] = 1
+        # the train markers are placed last, so they win over the test markers on shared pixels
+        img[X2d_test[:, 0], X2d_test[:, 1]] = TEST_DATA_POINT_MARKER
+        img_confidence[X2d_test[:, 0], X2d_test[:, 1]] = 1
+        img[X2d_train[:, 0], X2d_train[:, 1]] = TRAIN_DATA_POINT_MARKER
+        img_confidence[X2d_train[:, 0], X2d_train[:, 1]] = 1
 
         return (img, img_confidence, encoded_2d_train, encoded_2d_test)
 
@@ -207,25 +283,47 @@ class DBM(AbstractDBM):
         predicted_confidence = np.array([np.max(p) for p in predictions])
         return predicted_labels, predicted_confidence, predictions
 
-    def __transform_2d__(self, X_train: np.ndarray, X_test: np.ndarray, folder: str = DEFAULT_MODEL_PATH, projection: str = 't-SNE'):
+    def __transform_2d__(self, X_train: np.ndarray, X_test: np.ndarray, folder: str = DEFAULT_MODEL_PATH, projection: str = 't-SNE',
+                         landmarks: int | None = None, landmarks_strategy: LANDMARK_STRATEGIES = LANDMARK_STRATEGIES.RANDOM):
         """ 
         Transforms the given data to 2D using a projection method.
+        The projections are cached on the disk, keyed by the data content, the projection method and its parameters,
+        so projecting the same data again only reads the cached result.
 
         Args:
             X_train (np.ndarray): The training data.
             X_test (np.ndarray): The test data.
             folder (str, optional): The folder where the 2D data will be stored. Defaults to DEFAULT_MODEL_PATH.
             projection (str, optional): The projection method to be used. Defaults to 't-SNE'.
+            landmarks (int | None, optional): The number of landmarks of a landmark projection. Defaults to None (i.e. the whole data set is projected).
+            landmarks_strategy (LANDMARK_STRATEGIES, optional): How the landmarks are selected. Defaults to LANDMARK_STRATEGIES.RANDOM.
 
         Returns:
             X2d_train (np.ndarray): The transformed train data in 2D.
             X2d_test (np.ndarray): The transformed test data in 2D.
         """
-        self.console.log(f"Transforming the data to 2D using {projection}")
         X = np.concatenate((X_train, X_test), axis=0)
-        X2d = PROJECTION_METHODS[projection](X)
-
-        self.console.log(f"Finished transforming the data to 2D using {projection}")
+        if landmarks is None:
+            self.projection = Projection(projection)
+            parameters = get_projection_parameters(projection)
+        else:
+            self.projection = LandmarkProjection(projection, landmarks, strategy=landmarks_strategy)
+            parameters = self.projection.get_parameters()
+        cache_path = self.__get_projection_cache_path__(X, folder, projection, parameters)
+        landmarks_cache_path = cache_path.replace(".npy", LANDMARKS_CACHE_SUFFIX)
+
+        if os.path.exists(cache_path) and (landmarks is None or os.path.exists(landmarks_cache_path)):
+            self.console.log(f"Loading the cached 2D projection from the disk: {cache_path}")
+            X2d = np.load(cache_path, mmap_mode='r')
+            if isinstance(self.projection, LandmarkProjection):
+                self.projection.set_landmarks(X, X2d, np.load(landmarks_cache_path))
+        else:
+            self.console.log(f"Transforming the data to 2D using {projection}" + ("" if landmarks is None else f" on {landmarks} landmarks"))
+            X2d = self.projection.fit_transform(X)
+            self.console.log(f"Finished transforming the data to 2D using {projection}")
+            if isinstance(self.projection, LandmarkProjection):
+                self.__save_projection_cache__(self.projection.landmarks_indices, landmarks_cache_path)  # type: ignore
+            self.__save_projection_cache__(X2d, cache_path)
         X2d_train = X2d[:len(X_train)]
         X2d_test = X2d[len(X_train):]
 
@@ -247,6 +345,155 @@ class DBM(AbstractDBM):
 
         return X2d_train, X2d_test
 
+    def transform_2d(self, Xnd: np.ndarray) -> np.ndarray:
+        """ 
+        Projects new data on the 2D space of the decision boundary map, without recomputing the projection of the whole data set.
+        Projection methods with a native out-of-sample mapping (e.g. PCA, UMAP) are used directly, if fitted in this session;
+        otherwise (e.g. t-SNE, custom or cached projections) a parametric approximation of the projection is trained once on the mapped data.
+
+        Args:
+            Xnd (np.ndarray): The new data (nD)
+
+        Returns:
+            X2d (np.ndarray): The 2D coordinates of the new data, in the [0,1] space of the decision boundary map.
+        
+        Example:
+            >>> dbm = DBM(classifier)
+            >>> dbm.generate_boundary_map(X_train, X_test, projection='t-SNE')
+            >>> X2d_new = dbm.transform_2d(X_new)
+        """
+        if getattr(self, "X2d", None) is None or getattr(self, "Xnd", None) is None:
+            raise Exception("The decision boundary map must be generated before projecting new data")
+
+        if self.projection is not None and self.projection.can_transform and self.normalization is not None:
+            mins, ranges = self.normalization
+            return (self.projection.transform(Xnd) - mins) / ranges
+
+        if self.projection is None:
+            self.projection = Projection(CUSTOM_PROJECTION_NAME)
+        if self.projection.approximation is None:
+            self.console.log(f"Training a parametric approximation of the {self.projection.name} projection")
+            self.projection.fit_approximation(self.Xnd, self.X2d)
+        return self.projection.transform(Xnd)
+
+    def fine_tune(self, Xnd_new: np.ndarray,
+                  epochs: int = DEFAULT_FINE_TUNING_EPOCHS, batch_size: int = DEFAULT_BATCH_SIZE,
+                  replay_ratio: float = DEFAULT_REPLAY_RATIO,
+                  use_data_pipeline: bool = False) -> np.ndarray:
+        """ 
+        Adds new data to the decision boundary map, without retraining the inverse projection from scratch.
+        The new data is projected on the existing 2D space (see transform_2d) and the inverse projection is fine-tuned for a few epochs
+        on the new data together with a random subsample of the old data.
+        The decision boundary map itself has to be regenerated afterwards (e.g. get_dbm).
+
+        Args:
+            Xnd_new (np.ndarray): The new data (nD)
+            epochs (int, optional): The maximum number of fine-tuning epochs. Defaults to DEFAULT_FINE_TUNING_EPOCHS.
+            batch_size (int, optional): Train batch size. Defaults to DEFAULT_BATCH_SIZE.
+            replay_ratio (float, optional): The number of replayed old data points per new data point. Defaults to DEFAULT_REPLAY_RATIO.
+            use_data_pipeline (bool, optional): If True the NNInv is fine-tuned using a tf.data pipeline. Defaults to False.
+
+        Returns:
+            X2d_new (np.ndarray): The 2D coordinates of the new data, in the [0,1] space of the decision boundary map.
+        """
+        X2d_new = self.transform_2d(Xnd_new)
+
+        if isinstance(self.neural_network, NNInv):
+            self.neural_network.fine_tune(X2d_new, Xnd_new, self.X2d, self.Xnd,
+                                          epochs=epochs,
+                                          batch_size=batch_size,
+                                          replay_ratio=replay_ratio,
+                                          use_data_pipeline=use_data_pipeline)
+            # the surrogate was distilled from the previous inverse projection
+            self.surrogate = None
+        else:
+            self.console.log("The inverse projection is analytic, there is nothing to fine-tune")
+
+        self.X2d = np.concatenate((self.X2d, X2d_new), axis=0)
+        self.Xnd = np.concatenate((self.Xnd, Xnd_new.reshape((Xnd_new.shape[0], -1))), axis=0)
+        return X2d_new
+
+    def __log_holdout_errors__(self, X2d_coreset: np.ndarray, Xnd_coreset: np.ndarray, X2d_holdout: np.ndarray, Xnd_holdout: np.ndarray):
+        """ Logs the reconstruction errors of the inverse projection on the core set it was trained on and on the held-out data points.
+
+        Args:
+            X2d_coreset (np.ndarray): The 2D data points of the core set.
+            Xnd_coreset (np.ndarray): The nD data points of the core set.
+            X2d_holdout (np.ndarray): The 2D data points left out of the core set.
+            Xnd_holdout (np.ndarray): The nD data points left out of the core set.
+        """
+        rng = np.random.default_rng(CORESET_SEED)
+        errors = {}
+        for name, X2d, Xnd in (("core set", X2d_coreset, Xnd_coreset), ("held-out", X2d_holdout, Xnd_holdout)):
+            indices = rng.choice(len(X2d), size=min(len(X2d), CORESET_HOLDOUT_SIZE), replace=False)
+            reconstruction = self.neural_network.decode(X2d[indices]).reshape((len(indices), -1))  # type: ignore
+            squared_errors = (reconstruction - Xnd[indices].reshape((len(indices), -1))) ** 2
+            errors[name] = (float(np.mean(squared_errors)), float(np.mean(np.sqrt(np.sum(squared_errors, axis=1)))))
+        for name, (mse, mean_distance) in errors.items():
+            self.console.log(f"Inverse projection {name} reconstruction: MSE {mse:.5f}, mean distance {mean_distance:.5f}")
+        if errors["core set"][0] > 0:
+            self.console.log(f"Held-out / core set MSE ratio: {errors['held-out'][0] / errors['core set'][0]:.2f}")
+
+    def __get_pca_inverse_projection__(self, Xnd: np.ndarray, folder: str, is_data_normalized: bool = True):
+        """ 
+        Builds the analytic inverse projection of the PCA used for projecting the data.
+
+        Args:
+            Xnd (np.ndarray): The projected data (nD)
+            folder (str): The folder of the DBM model.
+            is_data_normalized (bool, optional): If True the decoded data is clipped to [0,1]. Defaults to True.
+
+        Returns:
+            inverse_projection (PCAInv): The analytic inverse projection.
+        """
+        assert self.projection is not None and self.normalization is not None
+        if not self.projection.is_fitted:
+            # the 2D projection was loaded from the cache, refitting the PCA is cheap and deterministic
+            if isinstance(self.projection, LandmarkProjection) and self.projection.landmarks_nd is not None:
+                Projection.fit_transform(self.projection, self.projection.landmarks_nd)
+            else:
+                self.projection.fit_transform(Xnd)
+        return PCAInv(self.projection.estimator, self.normalization, Xnd.shape[1:],  # type: ignore
+                      is_data_normalized=is_data_normalized, logger=self.console, folder_path=folder)
+
+    def __get_projection_cache_path__(self, X: np.ndarray, folder: str, projection: str, parameters: dict | None = None):
+        """ 
+        Computes the path of the cached 2D projection of the given data.
+
+        Args:
+            X (np.ndarray): The data to be projected.
+            folder (str): The folder in which the projections cache is stored.
+            projection (str): The projection method to be used.
+            parameters (dict | None, optional): The parameters of the projection. Defaults to None (i.e. the parameters of the projection method).
+
+        Returns:
+            cache_path (str): The path of the cached projection, which exists only if the projection was already computed.
+        """
+        if parameters is None:
+            parameters = get_projection_parameters(projection)
+        parameters_str = json.dumps(parameters, sort_keys=True, default=str)
+        key = hashlib.blake2b(f"{get_array_fingerprint(X)} {projection} {parameters_str}".encode(), digest_size=16).hexdigest()
+        return os.path.join(folder, PROJECTIONS_CACHE_FOLDER, f"{key}.npy")
+
+    def __save_projection_cache__(self, X2d: np.ndarray, cache_path: str):
+        """ 
+        Stores a 2D projection in the projections cache.
+
+        Args:
+            X2d (np.ndarray): The 2D projection.
+            cache_path (str): The path of the cached projection.
+        """
+        cache_folder = os.path.dirname(cache_path)
+        if not os.path.exists(cache_folder):
+            os.makedirs(cache_folder)
+
+        # writing to a temporary file first, so an interrupted run never leaves a partial cache entry behind
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, X2d)
+        os.replace(tmp_path, cache_path)
+        self.console.log("Saved the 2D projection to the projections cache: " + cache_path)
+
     def __normalize_2d__(self, X2d_train: np.ndarray, X2d_test: np.ndarray):
         """ 
         Normalizes the given 2D data to [0,1].
@@ -265,6 +512,7 @@ class DBM(AbstractDBM):
         y_max = max(np.max(X2d_train[:, 1]), np.max(X2d_test[:, 1]))
         mins = np.array([x_min, y_min])
         ranges = np.array([x_max - x_min, y_max - y_min])
+        self.normalization = (mins, ranges)
 
         X2d_train = (X2d_train - mins) / ranges  # type: ignore
         X2d_test = (X2d_test - mins) / ranges   # type: ignore
@@ -16,7 +16,7 @@ import tensorflow as tf
 import numpy as np
 import os
 
-from ..AbstractNN import AbstractNN, SEED
+from ..AbstractNN import AbstractNN, SEED, DEFAULT_FINE_TUNING_EPOCHS, DEFAULT_REPLAY_RATIO, NN_SIZE_PRESETS, get_hidden_layers, build_dense_layers
 from ...Logger import LoggerInterface, LoggerModel
 
 DEFAULT_MODEL_PATH = os.path.join("tmp", "DBM")
@@ -29,21 +29,29 @@ class NNInv(AbstractNN):
     """
         Inverse Projection Neural Network.        
         The inverse projection 2D -> nD. 
-        (Sequential model 2 -> 32 -> 64 -> 128 -> 512 -> nD)            
+        (Sequential model 2 -> 32 -> 64 -> 128 -> 512 -> nD by default, see NN_SIZE_PRESETS)            
     """
 
     def __init__(self,
                  logger: LoggerInterface | None = None,
-                 folder_path: str = DEFAULT_MODEL_PATH):
+                 folder_path: str = DEFAULT_MODEL_PATH,
+                 preset: NN_SIZE_PRESETS = NN_SIZE_PRESETS.DEFAULT,
+                 width: int | None = None,
+                 depth: int | None = None):
         """
             Creates an inverse Projection Neural Network model.
+
+            Args:
+                preset (NN_SIZE_PRESETS, optional): The size of the hidden layers. Defaults to NN_SIZE_PRESETS.DEFAULT.
+                width (int | None, optional): The width of the last hidden layer, overrides the preset. Defaults to None.
+                depth (int | None, optional): The number of hidden layers, overrides the preset. Defaults to None.
         """
-        super().__init__(folder_path=folder_path, nn_name=NNINV_NAME, logger=logger)
+        super().__init__(folder_path=folder_path, nn_name=NNINV_NAME, logger=logger, hidden_layers=get_hidden_layers(preset, width, depth))
 
     def __build__(self, output_shape: tuple = (2, 2), show_summary: bool = False, is_data_normalized: bool = True):
         """
         Builds an NNInv model
-        (Sequential 2D -> 32 -> 64 -> 128 -> 512 -> nD)
+        (Sequential 2D -> hidden layers -> nD)
 
         Args:
             output_shape (tuple, optional): The output shape of the Nd data. Defaults to (2,2).
@@ -59,14 +67,7 @@ class NNInv(AbstractNN):
         last_layer_activation_function = 'sigmoid' if is_data_normalized else 'relu'
 
         self.decoder = tf.keras.Sequential([
-            tf.keras.layers.Dense(32, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  kernel_regularizer=tf.keras.regularizers.l2(0.0002)),
-            tf.keras.layers.Dense(64, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  bias_initializer=tf.keras.initializers.Constant(0.01)),  # type: ignore
-            tf.keras.layers.Dense(128, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  bias_initializer=tf.keras.initializers.Constant(0.01)),  # type: ignore
-            tf.keras.layers.Dense(512, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  bias_initializer=tf.keras.initializers.Constant(0.01)),  # type: ignore
+            *build_dense_layers(self.hidden_layers),
             tf.keras.layers.Dense(output_size, activation=last_layer_activation_function,
                                   kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED)),  # type: ignore
             tf.keras.layers.Reshape(output_shape)
@@ -89,6 +90,9 @@ class NNInv(AbstractNN):
             x2d: np.ndarray, xNd: np.ndarray,
             epochs: int = 300, batch_size: int = 32,
             is_data_normalized: bool = True,
+            use_data_pipeline: bool = False,
+            map_fn=None,
+            extra_callbacks: list | None = None,
             ):
         """ 
         Fits the model to the specified data.
@@ -99,6 +103,9 @@ class NNInv(AbstractNN):
             epochs (int, optional): The number of epochs. Defaults to 300.
             batch_size (int, optional): Data points used for one batch. Defaults to 32.
             is_data_normalized (bool, optional): Determine the last layer activation function, sigmoid or relu. Defaults to True (i.e. activation sigmoid).
+            use_data_pipeline (bool, optional): If True the data is fed through a shuffled and prefetched tf.data pipeline. Defaults to False.
+            map_fn (function, optional): function: (x, y) -> (x, y) mapped in parallel over the samples of the tf.data pipeline every epoch (e.g. data augmentation). Defaults to None.
+            extra_callbacks (list, optional): Additional training callbacks (e.g. MapStabilityEarlyStopping). Defaults to None.
         """
         if self.neural_network is not None:
             self.console.log("Model already loaded. Skipping build.")
@@ -111,15 +118,51 @@ class NNInv(AbstractNN):
         logger_callback = LoggerModel(name=NNINV_NAME, show_init=False, epochs=epochs, print_fn=self.console.log)
         self.console.log("Fitting model...")
 
-        hist = self.neural_network.fit(x2d, xNd,
-                                       epochs=epochs,
-                                       batch_size=batch_size,
-                                       shuffle=True,
-                                       validation_split=0.2,
-                                       callbacks=[stopping_callback,
-                                                  logger_callback],
-                                       verbose=0)
+        hist = self._fit_neural_network_(x2d, xNd,
+                                         epochs=epochs,
+                                         batch_size=batch_size,
+                                         callbacks=[stopping_callback,
+                                                    logger_callback] + (extra_callbacks or []),
+                                         use_data_pipeline=use_data_pipeline,
+                                         map_fn=map_fn)
 
         self.console.log("Model fitted!")
         self.save(hist)
         # self.show_predictions(dataNd=xNd_test, data2d=x2d_test, labels=y_test)
+
+    def fine_tune(self,
+                  x2d_new: np.ndarray, xNd_new: np.ndarray,
+                  x2d_old: np.ndarray | None = None, xNd_old: np.ndarray | None = None,
+                  epochs: int = DEFAULT_FINE_TUNING_EPOCHS, batch_size: int = 32,
+                  replay_ratio: float = DEFAULT_REPLAY_RATIO,
+                  is_data_normalized: bool = True,
+                  use_data_pipeline: bool = False):
+        """ 
+        Fine-tunes the trained (or loaded) model on new data for a few epochs, replaying a subsample of the old data.
+        If there is no trained model yet, the model is trained from scratch on all the data.
+
+        Args:
+            x2d_new (np.ndarray): New input values (2D)
+            xNd_new (np.ndarray): New input values (nD)
+            x2d_old (np.ndarray, optional): Input values (2D) the model was trained on. Defaults to None.
+            xNd_old (np.ndarray, optional): Input values (nD) the model was trained on. Defaults to None.
+            epochs (int, optional): The maximum number of epochs. Defaults to DEFAULT_FINE_TUNING_EPOCHS.
+            batch_size (int, optional): Data points used for one batch. Defaults to 32.
+            replay_ratio (float, optional): The number of replayed old data points per new data point. Defaults to DEFAULT_REPLAY_RATIO.
+            is_data_normalized (bool, optional): Determine the last layer activation function, used only when training from scratch. Defaults to True.
+            use_data_pipeline (bool, optional): If True the data is fed through a tf.data pipeline. Defaults to False.
+        """
+        if self.neural_network is None:
+            self.console.warn("No trained model to fine-tune, training it from scratch.")
+            if x2d_old is not None and xNd_old is not None:
+                x2d_new = np.concatenate((x2d_old, x2d_new), axis=0)
+                xNd_new = np.concatenate((xNd_old.reshape((-1,) + xNd_new.shape[1:]), xNd_new), axis=0)
+            self.fit(x2d_new, xNd_new, batch_size=batch_size, is_data_normalized=is_data_normalized, use_data_pipeline=use_data_pipeline)
+            return
+
+        self._fine_tune_neural_network_(x2d_new, xNd_new, x2d_old, xNd_old,
+                                        loss=DECODER_LOSS,
+                                        epochs=epochs,
+                                        batch_size=batch_size,
+                                        replay_ratio=replay_ratio,
+                                        use_data_pipeline=use_data_pipeline)
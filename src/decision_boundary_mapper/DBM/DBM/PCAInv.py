@@ -0,0 +1,99 @@
+# Copyright 2023 Cristian Grosu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from sklearn.decomposition import PCA
+
+from ..AbstractNN import AbstractNN
+from .NNInv import DEFAULT_MODEL_PATH
+from ...Logger import LoggerInterface
+
+PCAINV_NAME = "PCAInv"
+
+
+class PCAInv(AbstractNN):
+    """
+        Analytic inverse projection for PCA.
+        The inverse projection 2D -> nD is computed in closed form from a fitted PCA, so no training is needed.
+        The [0,1] normalization of the 2D space is folded into the inverse mapping, so decoding is a single (2 x nD) matrix multiplication.
+    """
+
+    def __init__(self,
+                 pca: PCA,
+                 normalization: tuple[np.ndarray, np.ndarray],
+                 output_shape: tuple,
+                 is_data_normalized: bool = True,
+                 logger: LoggerInterface | None = None,
+                 folder_path: str = DEFAULT_MODEL_PATH):
+        """
+            Creates an analytic inverse projection from a fitted PCA.
+
+            Args:
+                pca (PCA): The fitted PCA used for projecting the data to 2D.
+                normalization (tuple[np.ndarray, np.ndarray]): The minimums and the ranges used for normalizing the 2D data to [0,1].
+                output_shape (tuple): The shape of a nD data point.
+                is_data_normalized (bool, optional): If True the decoded data is clipped to [0,1], otherwise only negative values are clipped. Defaults to True.
+        """
+        super().__init__(folder_path=folder_path, nn_name=PCAINV_NAME, logger=logger)
+        self.output_shape = tuple(output_shape)
+        self.clip_max = 1 if is_data_normalized else None
+        self.mins, self.ranges = normalization
+
+        # the inverse projection is affine: Xnd = X2d_normalized @ W + b
+        origin = pca.inverse_transform(self.mins.reshape(1, -1))
+        basis = pca.inverse_transform(self.mins + np.diag(self.ranges))
+        self.bias = origin[0].astype(np.float32)
+        self.weights = (basis - origin).astype(np.float32)
+        # keeping the PCA for encoding
+        self.pca = pca
+        self.console.log("Analytic PCA inverse projection ready, no training needed")
+
+    def load(self):
+        """
+            The analytic inverse projection is built from the fitted PCA, so there is nothing to load.
+        """
+        return
+
+    def save(self, history=None):
+        """
+            The analytic inverse projection is built from the fitted PCA, so there is nothing to save.
+        """
+        return
+
+    def decode(self, data: np.ndarray, verbose: int = 0) -> np.ndarray:
+        """ Decodes the data points.
+
+        Args:
+            data (np.ndarray): The normalized 2D data points to decode.
+            verbose (int, optional): Kept for compatibility with the neural network decoders. Defaults to 0.
+
+        Returns:
+            np.ndarray: The decoded nD data points.
+        """
+        Xnd = np.asarray(data, dtype=np.float32) @ self.weights + self.bias
+        np.clip(Xnd, 0, self.clip_max, out=Xnd)
+        return Xnd.reshape((Xnd.shape[0],) + self.output_shape)
+
+    def encode(self, data: np.ndarray, verbose: int = 0) -> np.ndarray:
+        """ Encodes the data points.
+
+        Args:
+            data (np.ndarray): The nD data points to encode.
+            verbose (int, optional): Kept for compatibility with the neural network encoders. Defaults to 0.
+
+        Returns:
+            np.ndarray: The encoded normalized 2D data points.
+        """
+        X2d = self.pca.transform(data.reshape((data.shape[0], -1)))
+        return (X2d - self.mins) / self.ranges
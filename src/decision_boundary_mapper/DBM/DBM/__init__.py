@@ -13,3 +13,6 @@
 # limitations under the License.
 
 from .DBM import DBM
+from .PCAInv import PCAInv
+from .benchmark import benchmark_inverse_projection_presets
+from .coreset import CORESET_STRATEGIES, select_coreset
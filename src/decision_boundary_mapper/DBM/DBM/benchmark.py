@@ -0,0 +1,110 @@
+# Copyright 2023 Cristian Grosu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+from time import time
+import numpy as np
+
+from .NNInv import NNInv
+from ..AbstractNN import NN_SIZE_PRESETS
+from ...Logger import Logger, LoggerInterface
+
+BENCHMARK_RESOLUTION = 256
+BENCHMARK_EPOCHS = 100
+BENCHMARK_BATCH_SIZE = 32
+
+
+def benchmark_inverse_projection_presets(X2d: np.ndarray, Xnd: np.ndarray, classifier,
+                                         presets: list[NN_SIZE_PRESETS] | None = None,
+                                         epochs: int = BENCHMARK_EPOCHS,
+                                         batch_size: int = BENCHMARK_BATCH_SIZE,
+                                         resolution: int = BENCHMARK_RESOLUTION,
+                                         is_data_normalized: bool = True,
+                                         folder: str | None = None,
+                                         logger: LoggerInterface | None = None) -> dict:
+    """
+    Trains an inverse projection (NNInv) for each architecture preset and compares their speed and accuracy.
+    Only the NNInv of the DBM is benchmarked, the Autoencoder and the SSNP of the SDBM use the same presets but are not compared here.
+    The models are always trained from scratch in a new folder, so models saved by earlier runs are never reused.
+    For each preset the following are reported:
+        decode throughput: the number of 2D points decoded per second when decoding the whole map \n
+        reconstruction error: the mean squared error between Xnd and the decoded X2d \n
+        label disagreement: the fraction of map pixels whose label differs from the map of the DEFAULT preset \n
+
+    Args:
+        X2d (np.ndarray): The normalized 2D data points.
+        Xnd (np.ndarray): The nD data points.
+        classifier (tf.keras.Model): The classifier used for labelling the map.
+        presets (list[NN_SIZE_PRESETS] | None, optional): The presets to compare. Defaults to None (i.e. all the presets).
+        epochs (int, optional): The number of training epochs of each model. Defaults to BENCHMARK_EPOCHS.
+        batch_size (int, optional): The training batch size. Defaults to BENCHMARK_BATCH_SIZE.
+        resolution (int, optional): The resolution of the decoded map. Defaults to BENCHMARK_RESOLUTION.
+        is_data_normalized (bool, optional): Determine the last layer activation function, sigmoid or relu. Defaults to True.
+        folder (str | None, optional): The folder in which a new run folder is created for the models, one sub folder per preset. Defaults to None (i.e. the system temporary folder).
+        logger (LoggerInterface, optional): The logger for outputting the report. Defaults to console logging.
+
+    Returns:
+        dict: preset value -> {"decode_throughput", "decode_time", "reconstruction_error", "label_disagreement", "hidden_layers"}
+
+    Example:
+        >>> report = benchmark_inverse_projection_presets(X2d, Xnd, classifier)
+        >>> report["small"]["label_disagreement"]
+    """
+    console = logger if logger is not None else Logger(name="Inverse projection benchmark")
+    presets = presets if presets is not None else list(NN_SIZE_PRESETS)
+    # the default preset is the reference for the label disagreement
+    ordered_presets = [NN_SIZE_PRESETS.DEFAULT] + [preset for preset in presets if preset != NN_SIZE_PRESETS.DEFAULT]
+
+    if folder is not None:
+        os.makedirs(folder, exist_ok=True)
+    run_folder = tempfile.mkdtemp(prefix="benchmark_", dir=folder)
+    console.log(f"Saving the benchmarked models to {run_folder}")
+
+    space2d = np.array([(i / resolution, j / resolution) for i in range(resolution) for j in range(resolution)], dtype=np.float32)
+
+    report = {}
+    reference_labels = None
+    for preset in ordered_presets:
+        console.log(f"Benchmarking the {preset.value} preset")
+        inverse_projection = NNInv(folder_path=os.path.join(run_folder, preset.value), logger=console, preset=preset)
+        inverse_projection.fit(X2d, Xnd, epochs=epochs, batch_size=batch_size, is_data_normalized=is_data_normalized)
+
+        reconstruction = inverse_projection.decode(X2d)
+        reconstruction_error = float(np.mean((reconstruction.reshape(Xnd.shape) - Xnd) ** 2))
+
+        # decoding once before timing so the graph tracing is not measured
+        inverse_projection.decode(space2d[:batch_size])
+        start = time()
+        spaceNd = inverse_projection.decode(space2d)
+        decode_time = time() - start
+
+        labels = np.argmax(classifier.predict(spaceNd, verbose=0), axis=1)
+        if reference_labels is None:
+            reference_labels = labels
+
+        if preset in presets:
+            report[preset.value] = {
+                "hidden_layers": inverse_projection.hidden_layers,
+                "decode_time": decode_time,
+                "decode_throughput": len(space2d) / decode_time,
+                "reconstruction_error": reconstruction_error,
+                "label_disagreement": float(np.mean(labels != reference_labels)),
+            }
+
+    console.log(f"{'preset':<10}{'hidden layers':<26}{'points/s':>12}{'MSE':>12}{'disagreement':>14}")
+    for preset, results in report.items():
+        console.log(f"{preset:<10}{str(results['hidden_layers']):<26}{results['decode_throughput']:>12.0f}"
+                    f"{results['reconstruction_error']:>12.5f}{results['label_disagreement'] * 100:>13.2f}%")
+    return report
@@ -0,0 +1,90 @@
+# Copyright 2023 Cristian Grosu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from enum import Enum
+import numpy as np
+
+from ..tools import farthest_point_sampling
+
+CORESET_SEED = 42
+CORESET_DENSITY_GRID_SIZE = 64
+CORESET_DEFAULT_DENSITY_WEIGHT = 1.0
+# the farthest point sampling runs on a random subset of this many candidates per selected point
+# so its cost does not grow with the size of the data set
+CORESET_FPS_CANDIDATES_PER_SAMPLE = 8
+
+
+class CORESET_STRATEGIES(Enum):
+    DENSITY = "density"
+    FARTHEST_POINT = "farthest_point"
+
+    @classmethod
+    def list(cls):
+        return list(map(lambda c: c.value, cls))
+
+
+def get_2d_density(X2d: np.ndarray, grid_size: int = CORESET_DENSITY_GRID_SIZE) -> np.ndarray:
+    """
+    Estimates the density of each 2D data point as the number of data points falling in its cell of a grid_size x grid_size grid.
+
+    Args:
+        X2d (np.ndarray): The normalized (i.e. in [0,1]) 2D data points.
+        grid_size (int, optional): The number of cells per axis. Defaults to CORESET_DENSITY_GRID_SIZE.
+
+    Returns:
+        np.ndarray: The density of each data point.
+    """
+    cells = np.clip((X2d * grid_size).astype(np.int64), 0, grid_size - 1)
+    cell_indices = cells[:, 0] * grid_size + cells[:, 1]
+    counts = np.bincount(cell_indices, minlength=grid_size * grid_size)
+    return counts[cell_indices]
+
+
+def select_coreset(X2d: np.ndarray, budget: int,
+                   strategy: CORESET_STRATEGIES = CORESET_STRATEGIES.DENSITY,
+                   density_weight: float = CORESET_DEFAULT_DENSITY_WEIGHT) -> np.ndarray:
+    """
+    Selects a core set of the data points that covers the 2D projection evenly, so that the dense regions do not dominate the training.
+
+    Args:
+        X2d (np.ndarray): The normalized (i.e. in [0,1]) 2D data points.
+        budget (int): The number of data points to select.
+        strategy (CORESET_STRATEGIES, optional): How the data points are selected. Defaults to CORESET_STRATEGIES.DENSITY.
+            DENSITY: random sampling with probability proportional to density^(-density_weight) \n
+            FARTHEST_POINT: farthest point sampling in 2D \n
+        density_weight (float, optional): Used by the DENSITY strategy, 0 samples uniformly and 1 samples every grid cell evenly. Defaults to CORESET_DEFAULT_DENSITY_WEIGHT.
+
+    Returns:
+        np.ndarray: The sorted indices of the selected data points.
+
+    Raises:
+        Exception: If the strategy is unknown.
+    """
+    n_samples = X2d.shape[0]
+    if budget >= n_samples:
+        return np.arange(n_samples)
+
+    rng = np.random.default_rng(CORESET_SEED)
+    match strategy:
+        case CORESET_STRATEGIES.DENSITY:
+            probabilities = get_2d_density(X2d).astype(np.float64) ** (-density_weight)
+            probabilities /= probabilities.sum()
+            return np.sort(rng.choice(n_samples, size=budget, replace=False, p=probabilities))
+        case CORESET_STRATEGIES.FARTHEST_POINT:
+            n_candidates = min(n_samples, budget * CORESET_FPS_CANDIDATES_PER_SAMPLE)
+            candidates = np.sort(rng.choice(n_samples, size=n_candidates, replace=False))
+            selected = farthest_point_sampling(np.ascontiguousarray(X2d[candidates], dtype=np.float64), budget)
+            return np.sort(candidates[selected])
+        case _:
+            raise Exception(f"Unknown core set strategy {strategy}")
@@ -13,13 +13,37 @@
 # limitations under the License.
 from sklearn.manifold import TSNE
 from sklearn.decomposition import PCA
-from umap import UMAP
+from sklearn.neural_network import MLPRegressor
+from sklearn.cluster import MiniBatchKMeans
+from typing import Callable
+from enum import Enum
 import numpy as np
 
+from ..tools import interpolate_from_landmarks
 
-def generate_transformation(projection: TSNE | PCA | UMAP):
+APPROXIMATION_HIDDEN_LAYERS = (256, 128)
+APPROXIMATION_MAX_EPOCHS = 200
+APPROXIMATION_SEED = 42
+LANDMARKS_SEED = 42
+DEFAULT_LANDMARKS_NEIGHBORS = 8
+LANDMARKS_BLOCK_SIZE = 8192
+
+class LANDMARK_STRATEGIES(Enum):
+    RANDOM = "random"
+    KMEANS = "kmeans"
+
+    @classmethod
+    def list(cls):
+        return list(map(lambda c: c.value, cls))
+
+
+def generate_transformation(build_projection: Callable):
     """
     Generates a 2D projection functionality
+    The projection object is built only when the transformation is used.
+
+    Args:
+        build_projection (Callable): function: () -> projection object (e.g. TSNE, PCA, UMAP)
     
     Returns:
         function: X: (nd data) -> 2d projection
@@ -32,14 +56,234 @@ def generate_transformation(projection: TSNE | PCA | UMAP):
             X (np.ndarray): The data to be transformed
         """
         X_flat = X.reshape(X.shape[0], -1)
-        X2d = projection.fit_transform(X_flat)
+        X2d = build_projection().fit_transform(X_flat)
         return X2d
     
     return transform
 
+def build_umap():
+    """
+    Builds a UMAP projection. umap is imported here, since importing it is slow and most runs never use it.
+    """
+    from umap import UMAP
+    return UMAP(n_components=2, random_state=0)
+
+PROJECTIONS = {
+    "t-SNE": lambda: TSNE(n_components=2, random_state=0, learning_rate="auto", init="random"),
+    "PCA": lambda: PCA(n_components=2, random_state=0),
+    "UMAP": build_umap,
+}
+
 PROJECTION_METHODS = {
-    "t-SNE": generate_transformation(TSNE(n_components=2, random_state=0, learning_rate="auto", init="random")),
-    "PCA": generate_transformation(PCA(n_components=2, random_state=0)),
-    "UMAP": generate_transformation(UMAP(n_components=2, random_state=0)),
+    "t-SNE": generate_transformation(PROJECTIONS["t-SNE"]),
+    "PCA": generate_transformation(PROJECTIONS["PCA"]),
+    "UMAP": generate_transformation(PROJECTIONS["UMAP"]),
     "CUSTOM": None,
 }
+
+def get_projection_parameters(projection_name: str) -> dict:
+    """
+    Returns the parameters of a projection method, e.g. to tell apart the results of differently configured projections.
+
+    Args:
+        projection_name (str): The name of the projection method
+    """
+    if projection_name not in PROJECTIONS:
+        return {}
+    return PROJECTIONS[projection_name]().get_params()
+
+class Projection:
+    """
+    A 2D projection that keeps its fitted estimator, so new data can be projected without recomputing the embedding of the whole data set.
+    PCA and UMAP project new data natively. Projections without a native out-of-sample mapping (e.g. t-SNE, custom or cached projections)
+    use a parametric approximation, i.e. a small neural network trained to reproduce the embedding.
+
+    Public methods:
+        fit_transform: Projects the data and keeps the fitted estimator. \n
+        fit_approximation: Trains the parametric approximation of an embedding. \n
+        transform: Projects new data on the fitted embedding. \n
+
+    Example:
+        >>> projection = Projection("t-SNE")
+        >>> X2d = projection.fit_transform(X)
+        >>> projection.fit_approximation(X, X2d)
+        >>> X2d_new = projection.transform(X_new)
+    """
+
+    def __init__(self, name: str):
+        """
+        Initializes the projection.
+
+        Args:
+            name (str): The name of the projection method (e.g. t-SNE, PCA, UMAP). Unknown names (e.g. custom projections) can only be approximated.
+        """
+        self.name = name
+        self.estimator = PROJECTIONS[name]() if name in PROJECTIONS else None
+        self.is_fitted = False
+        self.approximation = None
+
+    @property
+    def has_native_transform(self) -> bool:
+        return self.estimator is not None and hasattr(self.estimator, "transform")
+
+    @property
+    def can_transform(self) -> bool:
+        return self.is_fitted and self.has_native_transform
+
+    def fit_transform(self, X: np.ndarray) -> np.ndarray:
+        """
+        Fits the projection method and transforms the given data to 2D.
+
+        Args:
+            X (np.ndarray): The data to be transformed
+        """
+        if self.estimator is None:
+            raise Exception(f"The projection {self.name} can not be computed, only approximated")
+        X2d = self.estimator.fit_transform(X.reshape(X.shape[0], -1))
+        self.is_fitted = True
+        return X2d
+
+    def fit_approximation(self, X: np.ndarray, X2d: np.ndarray):
+        """
+        Trains a parametric approximation (X -> X2d) of the given embedding, used for projecting new data.
+
+        Args:
+            X (np.ndarray): The data
+            X2d (np.ndarray): The 2D embedding of the data
+        """
+        self.approximation = MLPRegressor(hidden_layer_sizes=APPROXIMATION_HIDDEN_LAYERS,
+                                          max_iter=APPROXIMATION_MAX_EPOCHS,
+                                          early_stopping=True,
+                                          random_state=APPROXIMATION_SEED)
+        self.approximation.fit(X.reshape(X.shape[0], -1), X2d)
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """
+        Transforms new data to 2D, using the native transform of the fitted estimator if available or the parametric approximation otherwise.
+
+        Args:
+            X (np.ndarray): The data to be transformed
+        """
+        X_flat = X.reshape(X.shape[0], -1)
+        if self.can_transform:
+            return self.estimator.transform(X_flat)  # type: ignore
+        if self.approximation is not None:
+            return self.approximation.predict(X_flat)
+        raise Exception(f"The projection {self.name} is not fitted, call fit_transform or fit_approximation first")
+
+
+class LandmarkProjection(Projection):
+    """
+    A 2D projection for large data sets, which projects only a representative subset of the data (the landmarks)
+    and places every other data point by inverse distance weighting of the 2D positions of its nearest landmarks in nD.
+    New data is placed the same way, so the landmark projection always supports out-of-sample transforms.
+
+    Example:
+        >>> projection = LandmarkProjection("t-SNE", n_landmarks=5000, strategy=LANDMARK_STRATEGIES.KMEANS)
+        >>> X2d = projection.fit_transform(X)
+        >>> X_landmarks = X[projection.landmarks_indices]
+    """
+
+    def __init__(self, name: str, n_landmarks: int,
+                 strategy: LANDMARK_STRATEGIES = LANDMARK_STRATEGIES.RANDOM,
+                 n_neighbors: int = DEFAULT_LANDMARKS_NEIGHBORS):
+        """
+        Initializes the landmark projection.
+
+        Args:
+            name (str): The name of the projection method used for the landmarks (e.g. t-SNE, PCA, UMAP).
+            n_landmarks (int): The number of landmarks.
+            strategy (LANDMARK_STRATEGIES, optional): How the landmarks are selected, uniformly at random or as the data points closest to the k-means centroids. Defaults to LANDMARK_STRATEGIES.RANDOM.
+            n_neighbors (int, optional): The number of landmarks each data point is interpolated from. Defaults to DEFAULT_LANDMARKS_NEIGHBORS.
+        """
+        super().__init__(name)
+        self.n_landmarks = n_landmarks
+        self.strategy = strategy
+        self.n_neighbors = n_neighbors
+        self.landmarks_indices: np.ndarray | None = None
+        self.landmarks_nd: np.ndarray | None = None
+        self.landmarks_2d: np.ndarray | None = None
+
+    @property
+    def can_transform(self) -> bool:
+        return self.landmarks_nd is not None and self.landmarks_2d is not None
+
+    def get_parameters(self) -> dict:
+        """
+        Returns the parameters of the landmark projection, e.g. to tell apart the results of differently configured projections.
+        """
+        return {
+            "projection": get_projection_parameters(self.name),
+            "n_landmarks": self.n_landmarks,
+            "strategy": self.strategy.value,
+            "n_neighbors": self.n_neighbors,
+        }
+
+    def fit_transform(self, X: np.ndarray) -> np.ndarray:
+        """
+        Selects the landmarks, projects them using the projection method and places the rest of the data around them.
+
+        Args:
+            X (np.ndarray): The data to be transformed
+        """
+        X_flat = X.reshape(X.shape[0], -1)
+        if self.n_landmarks >= X_flat.shape[0]:
+            self.landmarks_indices = np.arange(X_flat.shape[0])
+        else:
+            self.landmarks_indices = self.__select_landmarks__(X_flat)
+
+        self.landmarks_nd = np.array(X_flat[self.landmarks_indices])
+        self.landmarks_2d = super().fit_transform(self.landmarks_nd)
+
+        X2d = interpolate_from_landmarks(X_flat, self.landmarks_nd, self.landmarks_2d, k=self.n_neighbors)
+        X2d[self.landmarks_indices] = self.landmarks_2d
+        return X2d
+
+    def set_landmarks(self, X: np.ndarray, X2d: np.ndarray, landmarks_indices: np.ndarray):
+        """
+        Restores the landmarks of an already computed landmark projection (e.g. loaded from the cache).
+
+        Args:
+            X (np.ndarray): The data
+            X2d (np.ndarray): The landmark projection of the data
+            landmarks_indices (np.ndarray): The indices of the landmarks
+        """
+        self.landmarks_indices = landmarks_indices
+        self.landmarks_nd = np.array(X.reshape(X.shape[0], -1)[landmarks_indices])
+        self.landmarks_2d = np.array(X2d[landmarks_indices])
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        """
+        Places new data in 2D by interpolating the 2D positions of its nearest landmarks.
+
+        Args:
+            X (np.ndarray): The data to be transformed
+        """
+        if not self.can_transform:
+            return super().transform(X)
+        return interpolate_from_landmarks(X, self.landmarks_nd, self.landmarks_2d, k=self.n_neighbors)
+
+    def __select_landmarks__(self, X: np.ndarray) -> np.ndarray:
+        """
+        Selects the indices of the landmarks.
+
+        Args:
+            X (np.ndarray): The (flattened) data
+        """
+        match self.strategy:
+            case LANDMARK_STRATEGIES.RANDOM:
+                rng = np.random.default_rng(LANDMARKS_SEED)
+                return np.sort(rng.choice(X.shape[0], size=self.n_landmarks, replace=False))
+            case LANDMARK_STRATEGIES.KMEANS:
+                kmeans = MiniBatchKMeans(n_clusters=self.n_landmarks, random_state=LANDMARKS_SEED, n_init=3)
+                labels = kmeans.fit_predict(X)
+                # the landmark of a cluster is its data point closest to the centroid
+                distances = np.empty(X.shape[0])
+                for start in range(0, X.shape[0], LANDMARKS_BLOCK_SIZE):
+                    diff = X[start:start + LANDMARKS_BLOCK_SIZE] - kmeans.cluster_centers_[labels[start:start + LANDMARKS_BLOCK_SIZE]]
+                    distances[start:start + LANDMARKS_BLOCK_SIZE] = np.einsum("ij,ij->i", diff, diff)
+                order = np.lexsort((distances, labels))
+                _, first = np.unique(labels[order], return_index=True)
+                return np.sort(order[first])
+            case _:
+                raise Exception(f"Unknown landmark strategy {self.strategy}")
@@ -0,0 +1,96 @@
+# Copyright 2023 Cristian Grosu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tensorflow as tf
+import numpy as np
+
+from ..Logger import Logger, LoggerInterface
+
+STABILITY_MAP_RESOLUTION = 64
+STABILITY_CHECK_EVERY = 5
+STABILITY_THRESHOLD = 0.005
+STABILITY_PATIENCE = 2
+
+
+class MapStabilityEarlyStopping(tf.keras.callbacks.Callback):
+    """
+    Stops the training of an inverse projection once the decision boundary map it produces stops changing.
+    Every few epochs a coarse map is rendered (the classifier labels of the decoded pixels) and compared to the previous one,
+    the training stops when the fraction of pixels that changed their label stays below a threshold for a number of successive checks.
+
+    Example:
+        >>> stability_callback = MapStabilityEarlyStopping(classifier)
+        >>> model.fit(X2d, Xnd, callbacks=[stability_callback])
+    """
+
+    def __init__(self, classifier,
+                 resolution: int = STABILITY_MAP_RESOLUTION,
+                 check_every: int = STABILITY_CHECK_EVERY,
+                 threshold: float = STABILITY_THRESHOLD,
+                 patience: int = STABILITY_PATIENCE,
+                 decoder_name: str | None = None,
+                 logger: LoggerInterface | None = None):
+        """
+        Initializes the callback.
+
+        Args:
+            classifier (tf.keras.Model): The classifier of the decision boundary map.
+            resolution (int, optional): The resolution of the coarse map. Defaults to STABILITY_MAP_RESOLUTION.
+            check_every (int, optional): The number of epochs between two renderings of the map. Defaults to STABILITY_CHECK_EVERY.
+            threshold (float, optional): The fraction of pixels changing their label below which the map is considered stable. Defaults to STABILITY_THRESHOLD.
+            patience (int, optional): The number of successive stable checks after which the training stops. Defaults to STABILITY_PATIENCE.
+            decoder_name (str | None, optional): The name of the decoder layer of the trained model, None if the model is the decoder itself (e.g. NNInv). Defaults to None.
+            logger (LoggerInterface, optional): The logger for outputting info messages. Defaults to console logging.
+        """
+        super().__init__()
+        self.classifier = classifier
+        self.check_every = check_every
+        self.threshold = threshold
+        self.patience = patience
+        self.decoder_name = decoder_name
+        self.console = logger if logger is not None else Logger(name="Map stability early stopping")
+        self.space2d = np.array([(i / resolution, j / resolution) for i in range(resolution) for j in range(resolution)], dtype=np.float32)
+
+        self.previous_map = None
+        self.stable_checks = 0
+        self.disagreements = []
+
+    def on_train_begin(self, logs=None):
+        self.previous_map = None
+        self.stable_checks = 0
+        self.disagreements = []
+
+    def on_epoch_end(self, epoch, logs=None):
+        if (epoch + 1) % self.check_every != 0:
+            return
+
+        current_map = self.__render_map__()
+        if self.previous_map is not None:
+            disagreement = float(np.mean(current_map != self.previous_map))
+            self.disagreements.append(disagreement)
+            self.stable_checks = self.stable_checks + 1 if disagreement < self.threshold else 0
+            self.console.log(f"[Epoch {epoch}] {disagreement * 100:.2f}% of the map pixels changed their label")
+            if self.stable_checks >= self.patience:
+                self.console.log(f"The decision boundary map is stable, stopping the training at epoch {epoch}")
+                self.model.stop_training = True
+        self.previous_map = current_map
+
+    def __render_map__(self) -> np.ndarray:
+        """
+        Renders the labels of the coarse decision boundary map using the current weights of the trained model.
+        """
+        decoder = self.model if self.decoder_name is None else self.model.get_layer(self.decoder_name)
+        spaceNd = decoder(self.space2d, training=False)
+        predictions = self.classifier(spaceNd, training=False)
+        return np.argmax(predictions, axis=1)
@@ -0,0 +1,164 @@
+# Copyright 2023 Cristian Grosu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+from sklearn.decomposition import PCA
+from sklearn.neighbors import KDTree
+
+from .tools import count_closer_points, get_bounded_ranks_parallel, get_candidates_squared_distances_parallel, get_proj_errors_from_ranks_parallel, get_squared_distances_block, PROJECTION_ERRORS_BLOCK_ELEMENTS
+
+DEFAULT_REDUCED_DIMENSIONS = 16
+DEFAULT_MAX_RANK_FACTOR = 20
+DEFAULT_RANK_SAMPLE_SIZE = 2048
+
+
+class NeighborsIndex:
+    """
+    Neighbors index of a dataset and of its 2D projection, used to compute the projection errors of arbitrary (2D, nD) point pairs.
+    The indexes are built once and reused for every query:
+        - a KD-tree over the 2D projection, which gives exact neighbors and exact ranks
+        - a KD-tree over a PCA reduction of the nD data, which gives the nD candidates of a query. 
+          The reduced distances never exceed the true ones, so the candidates contain every point closer than the farthest candidate in the reduced space.
+          When that bound does not cover the k nearest neighbors of a query (e.g. on isotropic data, where the reduction shrinks the distances a lot),
+          the query is computed exactly against the whole data set.
+        - a random sample of the nD data, which estimates the nD ranks beyond the candidates
+
+    Public methods:
+        get_projection_errors: Computes the projection errors of a batch of points. \n
+
+    Example:
+        >>> index = NeighborsIndex(Xnd, X2d)
+        >>> errors = index.get_projection_errors(space2d, spaceNd, k=10)
+    """
+
+    def __init__(self, Xnd: np.ndarray, X2d: np.ndarray, 
+                 reduced_dimensions: int = DEFAULT_REDUCED_DIMENSIONS,
+                 rank_sample_size: int = DEFAULT_RANK_SAMPLE_SIZE):
+        """
+        Builds the neighbors indexes.
+
+        Args:
+            Xnd (np.ndarray): The nD data set
+            X2d (np.ndarray): The 2D projection of the data set
+            reduced_dimensions (int, optional): The number of PCA components used to search the nD candidates. Defaults to DEFAULT_REDUCED_DIMENSIONS.
+            rank_sample_size (int, optional): The number of data points used to estimate the nD ranks beyond the candidates. Defaults to DEFAULT_RANK_SAMPLE_SIZE.
+        """
+        assert len(Xnd) == len(X2d)
+        self.Xnd = np.ascontiguousarray(Xnd.reshape((Xnd.shape[0], -1)), dtype=np.float64)
+        self.X2d = np.ascontiguousarray(X2d, dtype=np.float64)
+        self.n_samples = len(self.Xnd)
+        self.Xnd_squared_norms = np.einsum("ij,ij->i", self.Xnd, self.Xnd)
+
+        self.tree_2d = KDTree(self.X2d)
+
+        if self.Xnd.shape[1] > reduced_dimensions:
+            self.pca = PCA(n_components=reduced_dimensions, random_state=0).fit(self.Xnd)
+            self.tree_nd_reduced = KDTree(self.pca.transform(self.Xnd))
+        else:
+            self.pca = None
+            self.tree_nd_reduced = KDTree(self.Xnd)
+
+        sample_indices = np.random.default_rng(0).choice(self.n_samples, size=min(rank_sample_size, self.n_samples), replace=False)
+        self.Xnd_sample = self.Xnd[np.sort(sample_indices)]
+        self.Xnd_sample_squared_norms = np.einsum("ij,ij->i", self.Xnd_sample, self.Xnd_sample)
+
+    def _reduce_(self, spaceNd: np.ndarray):
+        return self.pca.transform(spaceNd) if self.pca is not None else spaceNd
+
+    def get_ranks_2d(self, space2d: np.ndarray, neighbors: np.ndarray):
+        """
+        Computes the exact ranks in the 2D space of the given neighbors, i.e. the number of points strictly closer than them.
+
+        Args:
+            space2d (np.ndarray): The 2D query points
+            neighbors (np.ndarray): The indices of the neighbors to rank for each point (n_points x k)
+        """
+        k = neighbors.shape[1]
+        points = np.repeat(space2d, k, axis=0)
+        radii = np.linalg.norm(points - self.X2d[neighbors.ravel()], axis=1)
+        # shrinking the radii so the neighbor itself (and any point at the same distance) is not counted
+        radii = np.nextafter(radii, 0)
+        ranks = self.tree_2d.query_radius(points, radii, count_only=True)
+        return ranks.reshape(neighbors.shape)
+
+    def get_projection_errors(self, space2d: np.ndarray, spaceNd: np.ndarray, k: int = 10, max_rank: int | None = None):
+        """
+        Computes the projection errors (i.e. the mean of the continuity and trustworthiness errors) of the given (2D, nD) point pairs w.r.t. the data set.
+        The nD neighbors and the nD ranks up to the candidates bound are exact, the ranks beyond it are estimated.
+        The points whose candidates do not contain their k nearest neighbors are computed exactly.
+
+        Args:
+            space2d (np.ndarray): The 2D points
+            spaceNd (np.ndarray): The nD points corresponding to the 2D points (e.g. got through the inverse projection)
+            k (int, optional): The number of neighbors to consider. Defaults to 10.
+            max_rank (int, optional): The number of nD candidates of each point, i.e. the bound of the exact rank search. Defaults to DEFAULT_MAX_RANK_FACTOR * k.
+
+        Returns:
+            errors (np.ndarray): The projection error of each point
+        """
+        if max_rank is None:
+            max_rank = DEFAULT_MAX_RANK_FACTOR * k
+        n_candidates = min(max(max_rank, k), self.n_samples)
+
+        space2d = np.ascontiguousarray(space2d, dtype=np.float64)
+        spaceNd = np.ascontiguousarray(spaceNd.reshape((spaceNd.shape[0], -1)), dtype=np.float64)
+
+        # nD candidates, sorted by their distance in the reduced space
+        candidates_reduced_distances, candidates = self.tree_nd_reduced.query(self._reduce_(spaceNd), k=n_candidates)
+        candidates_distances = get_candidates_squared_distances_parallel(self.Xnd, spaceNd, candidates)
+        if n_candidates == self.n_samples:
+            candidates_bound = np.full(len(spaceNd), np.inf)
+        else:
+            candidates_bound = candidates_reduced_distances[:, -1] ** 2
+
+        nearest_candidates = np.argsort(candidates_distances, axis=1)[:, :k]
+        neighbors_nd = np.take_along_axis(candidates, nearest_candidates, axis=1)
+        neighbors_2d = self.tree_2d.query(space2d, k=k, return_distance=False)
+
+        # trustworthiness: ranks in nD of the 2D neighbors
+        thresholds = get_candidates_squared_distances_parallel(self.Xnd, spaceNd, neighbors_2d)
+        sample_distances = get_squared_distances_block(spaceNd, self.Xnd_sample, self.Xnd_sample_squared_norms)
+        ranks_nd = get_bounded_ranks_parallel(candidates_distances, candidates_bound, thresholds, sample_distances, self.n_samples)
+
+        # a point outside the candidates may be closer than the k-th candidate if it is beyond the bound
+        kth_distances = np.take_along_axis(candidates_distances, nearest_candidates[:, -1:], axis=1)[:, 0]
+        uncertain = np.flatnonzero(kth_distances > candidates_bound)
+        if len(uncertain) > 0:
+            self._compute_exactly_(spaceNd, uncertain, neighbors_2d, neighbors_nd, ranks_nd, k)
+
+        # continuity: ranks in 2D of the nD neighbors
+        ranks_2d = self.get_ranks_2d(space2d, neighbors_nd)
+
+        return get_proj_errors_from_ranks_parallel(ranks_2d, ranks_nd, self.n_samples, k=k)
+
+    def _compute_exactly_(self, spaceNd: np.ndarray, indices: np.ndarray, neighbors_2d: np.ndarray, neighbors_nd: np.ndarray, ranks_nd: np.ndarray, k: int):
+        """
+        Computes the nD neighbors and the nD ranks of the 2D neighbors of the given points against the whole data set, in place.
+
+        Args:
+            spaceNd (np.ndarray): The nD points
+            indices (np.ndarray): The indices of the points to compute exactly
+            neighbors_2d (np.ndarray): The 2D neighbors of every point (n_points x k)
+            neighbors_nd (np.ndarray): The nD neighbors of every point, updated for the given points (n_points x k)
+            ranks_nd (np.ndarray): The nD ranks of the 2D neighbors of every point, updated for the given points (n_points x k)
+            k (int): The number of neighbors
+        """
+        block_size = max(1, PROJECTION_ERRORS_BLOCK_ELEMENTS // self.n_samples)
+        for start in range(0, len(indices), block_size):
+            block = indices[start:start + block_size]
+            distances = get_squared_distances_block(spaceNd[block], self.Xnd, self.Xnd_squared_norms)
+            nearest = np.argpartition(distances, k - 1, axis=1)[:, :k] if k < self.n_samples else np.tile(np.arange(self.n_samples), (len(block), 1))
+            neighbors_nd[block] = np.take_along_axis(nearest, np.argsort(np.take_along_axis(distances, nearest, axis=1), axis=1), axis=1)
+            for row, p in enumerate(block):
+                ranks_nd[p] = count_closer_points(distances[row], -1, distances[row, neighbors_2d[p]])
@@ -0,0 +1,89 @@
+# Copyright 2023 Cristian Grosu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+
+
+class PixelIndex:
+    """
+    Inverted index from the pixels of the decision boundary map to the data points encoded in them.
+    The index is stored in a compressed sparse row layout: the indices of the data points of pixel p are
+    indices[indptr[p]:indptr[p + 1]], so a pixel may hold any number of data points.
+
+    Public methods:
+        get: Returns the indices of the data points of a pixel. \n
+        first: Returns the index of the first data point of a pixel. \n
+        get_many: Returns the indices of the data points of several pixels. \n
+
+    Example:
+        >>> index = PixelIndex(encoded_train[:, :2], img.shape)
+        >>> k = index.first(i, j)
+    """
+
+    def __init__(self, positions: np.ndarray, shape: tuple):
+        """
+        Builds the index.
+
+        Args:
+            positions (np.ndarray): The (row, column) pixel of every data point
+            shape (tuple): The shape (rows, columns) of the decision boundary map
+        """
+        self.shape = (int(shape[0]), int(shape[1]))
+        positions = np.asarray(positions).astype(np.int64).reshape((-1, 2))
+        pixels = positions[:, 0] * self.shape[1] + positions[:, 1]
+
+        # a stable sort keeps the data points of a pixel in their original order
+        self.indices = np.argsort(pixels, kind="stable").astype(np.int32)
+        self.indptr = np.zeros(self.shape[0] * self.shape[1] + 1, dtype=np.int32)
+        np.cumsum(np.bincount(pixels, minlength=self.shape[0] * self.shape[1]), out=self.indptr[1:])
+
+    def get(self, i: int, j: int) -> np.ndarray:
+        """
+        Returns the indices of the data points encoded in the pixel (i, j).
+
+        Args:
+            i (int): The row of the pixel
+            j (int): The column of the pixel
+        """
+        pixel = i * self.shape[1] + j
+        return self.indices[self.indptr[pixel]:self.indptr[pixel + 1]]
+
+    def first(self, i: int, j: int) -> int | None:
+        """
+        Returns the index of the first data point encoded in the pixel (i, j), None if the pixel is empty.
+
+        Args:
+            i (int): The row of the pixel
+            j (int): The column of the pixel
+        """
+        pixel = i * self.shape[1] + j
+        start, end = self.indptr[pixel], self.indptr[pixel + 1]
+        return int(self.indices[start]) if start < end else None
+
+    def get_many(self, rows: np.ndarray, columns: np.ndarray) -> np.ndarray:
+        """
+        Returns the indices of the data points encoded in the given pixels.
+
+        Args:
+            rows (np.ndarray): The rows of the pixels
+            columns (np.ndarray): The columns of the pixels
+        """
+        pixels = np.asarray(rows, dtype=np.int64) * self.shape[1] + np.asarray(columns, dtype=np.int64)
+        starts, ends = self.indptr[pixels], self.indptr[pixels + 1]
+        counts = ends - starts
+        if counts.sum() == 0:
+            return np.empty(0, dtype=np.int32)
+        # the positions in indices of every data point of every pixel, without a python loop over the pixels
+        offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())
+        return self.indices[offsets]
@@ -15,7 +15,7 @@
 import tensorflow as tf
 import numpy as np
 
-from ..AbstractNN import AbstractNN, SEED
+from ..AbstractNN import AbstractNN, SEED, NN_SIZE_PRESETS, get_hidden_layers, build_dense_layers, DEFAULT_FINE_TUNING_EPOCHS, DEFAULT_REPLAY_RATIO
 from ...Logger import LoggerInterface, LoggerModel
 
 DECODER_NAME = "decoder"
@@ -29,7 +29,10 @@ LOSS = "mean_squared_error"
 class Autoencoder(AbstractNN):
     def __init__(self,
                  folder_path: str,
-                 logger: LoggerInterface | None = None):
+                 logger: LoggerInterface | None = None,
+                 preset: NN_SIZE_PRESETS = NN_SIZE_PRESETS.DEFAULT,
+                 width: int | None = None,
+                 depth: int | None = None):
         """
             Creates an autoencoder model.
             Classifier: The classifier part of the autoencoder.
@@ -37,8 +40,11 @@ class Autoencoder(AbstractNN):
             Args:
                 folder_path: The path to the folder where the model will be saved/loaded.
                 logger: The logger used to log the model's progress.
+                preset (NN_SIZE_PRESETS, optional): The size of the hidden layers of the encoder and of the decoder. Defaults to NN_SIZE_PRESETS.DEFAULT.
+                width (int | None, optional): The width of the widest hidden layer, overrides the preset. Defaults to None.
+                depth (int | None, optional): The number of hidden layers of the encoder and of the decoder, overrides the preset. Defaults to None.
         """
-        super().__init__(folder_path=folder_path, logger=logger, nn_name=AUTOENCODER_NAME)
+        super().__init__(folder_path=folder_path, logger=logger, nn_name=AUTOENCODER_NAME, hidden_layers=get_hidden_layers(preset, width, depth))
 
     def __build__(self, input_shape: tuple = (28, 28), show_summary: bool = False, is_data_normalized: bool = True):
         """
@@ -58,27 +64,13 @@ class Autoencoder(AbstractNN):
 
         encoder = tf.keras.models.Sequential([
             tf.keras.layers.Flatten(),
-            tf.keras.layers.Dense(512, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  kernel_regularizer=tf.keras.regularizers.l2(0.0002)),
-            tf.keras.layers.Dense(128, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  bias_initializer=tf.keras.initializers.Constant(0.01)),       # type: ignore
-            tf.keras.layers.Dense(64, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),   # type: ignore
-                                  bias_initializer=tf.keras.initializers.Constant(0.01)),       # type: ignore
-            tf.keras.layers.Dense(32, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),   # type: ignore
-                                  bias_initializer=tf.keras.initializers.Constant(0.01)),       # type: ignore
+            *build_dense_layers(self.hidden_layers[::-1]),
             tf.keras.layers.Dense(2, activation='sigmoid', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
                                   bias_initializer=tf.keras.initializers.Constant(0.01)),  # type: ignore
         ], name=ENCODER_NAME)
 
         decoder = tf.keras.models.Sequential([
-            tf.keras.layers.Dense(32, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),   # type: ignore
-                                  kernel_regularizer=tf.keras.regularizers.l2(0.0002)),
-            tf.keras.layers.Dense(64, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),   # type: ignore
-                                  bias_initializer=tf.keras.initializers.Constant(0.01)),  # type: ignore
-            tf.keras.layers.Dense(128, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  bias_initializer=tf.keras.initializers.Constant(0.01)),  # type: ignore
-            tf.keras.layers.Dense(512, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  bias_initializer=tf.keras.initializers.Constant(0.01)),  # type: ignore
+            *build_dense_layers(self.hidden_layers),
             tf.keras.layers.Dense(output_size, activation=last_decoder_layer_activation_function,
                                   kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED)),  # type: ignore
             tf.keras.layers.Reshape(input_shape)
@@ -103,7 +95,10 @@ class Autoencoder(AbstractNN):
     def fit(self, X: np.ndarray,
             epochs: int = 10,
             batch_size: int = 128,
-            is_data_normalized: bool = True
+            is_data_normalized: bool = True,
+            use_data_pipeline: bool = False,
+            map_fn=None,
+            extra_callbacks: list | None = None
             ):
         """ 
         Fits the model to the specified data.
@@ -113,6 +108,9 @@ class Autoencoder(AbstractNN):
             epochs (int, optional): The number of epochs. Defaults to 10.
             batch_size (int, optional): Data points used for one batch. Defaults to 128.
             is_data_normalized (bool, optional): Determine the last layer activation function, sigmoid or relu. Defaults to True (i.e. activation sigmoid).
+            use_data_pipeline (bool, optional): If True the data is fed through a shuffled and prefetched tf.data pipeline. Defaults to False.
+            map_fn (function, optional): function: (x, y) -> (x, y) mapped in parallel over the samples of the tf.data pipeline every epoch (e.g. data augmentation). Defaults to None.
+            extra_callbacks (list, optional): Additional training callbacks (e.g. MapStabilityEarlyStopping). Defaults to None.
         """
         if self.neural_network is not None:
             self.console.log("Model already loaded. Skipping build.")
@@ -128,13 +126,12 @@ class Autoencoder(AbstractNN):
 
         self.console.log("Fitting model...")
 
-        history = self.neural_network.fit(X, X,
-                                          epochs=epochs,
-                                          batch_size=batch_size,
-                                          shuffle=True,
-                                          validation_split=0.2,
-                                          callbacks=[stopping_callback, logger_callback],
-                                          verbose=0)
+        history = self._fit_neural_network_(X, X,
+                                            epochs=epochs,
+                                            batch_size=batch_size,
+                                            callbacks=[stopping_callback, logger_callback] + (extra_callbacks or []),
+                                            use_data_pipeline=use_data_pipeline,
+                                            map_fn=map_fn)
 
         self.console.log("Model fitted!")
         self.save(history)
@@ -167,3 +164,36 @@ class Autoencoder(AbstractNN):
         """
         xNd = self.decoder.predict(data, verbose=verbose)
         return xNd
+
+    def fine_tune(self, X_new: np.ndarray, X_old: np.ndarray | None = None,
+                  epochs: int = DEFAULT_FINE_TUNING_EPOCHS, batch_size: int = 128,
+                  replay_ratio: float = DEFAULT_REPLAY_RATIO,
+                  is_data_normalized: bool = True,
+                  use_data_pipeline: bool = False):
+        """ 
+        Fine-tunes the trained (or loaded) autoencoder on new data for a few epochs, replaying a subsample of the old data.
+        If there is no trained model yet, the model is trained from scratch on all the data.
+
+        Args:
+            X_new (np.ndarray): New input values
+            X_old (np.ndarray, optional): Input values the model was trained on. Defaults to None.
+            epochs (int, optional): The maximum number of epochs. Defaults to DEFAULT_FINE_TUNING_EPOCHS.
+            batch_size (int, optional): Data points used for one batch. Defaults to 128.
+            replay_ratio (float, optional): The number of replayed old data points per new data point. Defaults to DEFAULT_REPLAY_RATIO.
+            is_data_normalized (bool, optional): Determine the last layer activation function, used only when training from scratch. Defaults to True.
+            use_data_pipeline (bool, optional): If True the data is fed through a tf.data pipeline. Defaults to False.
+        """
+        if self.neural_network is None:
+            self.console.warn("No trained model to fine-tune, training it from scratch.")
+            X = X_new if X_old is None else np.concatenate((X_old, X_new), axis=0)
+            self.fit(X, batch_size=batch_size, is_data_normalized=is_data_normalized, use_data_pipeline=use_data_pipeline)
+            return
+
+        self._fine_tune_neural_network_(X_new, X_new, X_old, X_old,
+                                        loss=LOSS,
+                                        epochs=epochs,
+                                        batch_size=batch_size,
+                                        replay_ratio=replay_ratio,
+                                        use_data_pipeline=use_data_pipeline)
+        self.encoder = self.neural_network.get_layer(ENCODER_NAME)
+        self.decoder = self.neural_network.get_layer(DECODER_NAME)
@@ -17,8 +17,10 @@ import os
 import numpy as np
 from enum import Enum
 
-from .Autoencoder import Autoencoder
+from .Autoencoder import Autoencoder, DECODER_NAME
 from .SSNP import SSNP
+from ..AbstractNN import DEFAULT_FINE_TUNING_EPOCHS, DEFAULT_REPLAY_RATIO, NN_SIZE_PRESETS
+from ..MapStabilityEarlyStopping import MapStabilityEarlyStopping
 from ..AbstractDBM import AbstractDBM, DBM_DEFAULT_RESOLUTION, DEFAULT_TRAINING_EPOCHS, DEFAULT_BATCH_SIZE, FAST_DBM_STRATEGIES
 
 from ...utils import track_time_wrapper, TEST_DATA_POINT_MARKER, TRAIN_DATA_POINT_MARKER
@@ -42,6 +44,7 @@ class SDBM(AbstractDBM):
         Public methods:
             fit: Learns a direct and an inverse projection by training a neural network. \n
             get_decision_boundary_map: Returns the decision boundary map for the given classifier. \n
+            fine_tune: Adds new data to the decision boundary map and fine-tunes the autoencoder on it. \n
 
         Example:
             >>> from SDBM import SDBM
@@ -70,7 +73,10 @@ class SDBM(AbstractDBM):
             X: np.ndarray, Y: np.ndarray,
             architecture: NNArchitecture = NNArchitecture.AUTOENCODER,
             epochs: int = DEFAULT_TRAINING_EPOCHS, batch_size: int = DEFAULT_BATCH_SIZE,
-            load_folder: str = DEFAULT_MODEL_PATH, is_data_normalized: bool = True):
+            load_folder: str = DEFAULT_MODEL_PATH, is_data_normalized: bool = True,
+            use_data_pipeline: bool = False, stop_on_map_stability: bool = False,
+            size_preset: NN_SIZE_PRESETS = NN_SIZE_PRESETS.DEFAULT,
+            extra_callbacks: list | None = None):
         """
         Train a neural network that will contain the direct projection and the inverse projection.
         This neural network will be used to reduce the dimensionality of the data (nD -> 2D) and decode the 2D space to nD.
@@ -83,18 +89,23 @@ class SDBM(AbstractDBM):
             batch_size (int, optional): Defaults to 32.
             load_folder (str, optional): The folder path which contains a pre-trained network or will be used to store it if not exists. Defaults to DEFAULT_MODEL_PATH.
             is_data_normalized (bool, optional): Determine the last layer activation function of the decoder, sigmoid or relu. Defaults to True (i.e. activation sigmoid).
+            use_data_pipeline (bool, optional): If True the neural network is trained using a tf.data pipeline. Defaults to False.
+            stop_on_map_stability (bool, optional): If True the training also stops once a coarse decision boundary map stops changing. Defaults to False.
+            size_preset (NN_SIZE_PRESETS, optional): The size of the encoder and decoder hidden layers. Defaults to NN_SIZE_PRESETS.DEFAULT.
+            extra_callbacks (list | None, optional): Additional training callbacks (e.g. TrainingCancellation). Defaults to None.
      
         Returns:
             neural_network (Autoencoder | SSNP): The trained neural network.
         """
+        extra_callbacks = ([MapStabilityEarlyStopping(self.classifier, decoder_name=DECODER_NAME, logger=self.console)] if stop_on_map_stability else []) + (extra_callbacks or [])
         match architecture:
             case NNArchitecture.SSNP:
-                ssnp = SSNP(folder_path=load_folder, logger=self.console)
-                ssnp.fit(X, Y, epochs, batch_size, is_data_normalized=is_data_normalized)
+                ssnp = SSNP(folder_path=load_folder, logger=self.console, preset=size_preset)
+                ssnp.fit(X, Y, epochs, batch_size, is_data_normalized=is_data_normalized, use_data_pipeline=use_data_pipeline, extra_callbacks=extra_callbacks)
                 return ssnp
             case _:
-                autoencoder = Autoencoder(folder_path=load_folder, logger=self.console)
-                autoencoder.fit(X, epochs, batch_size, is_data_normalized=is_data_normalized)
+                autoencoder = Autoencoder(folder_path=load_folder, logger=self.console, preset=size_preset)
+                autoencoder.fit(X, epochs, batch_size, is_data_normalized=is_data_normalized, use_data_pipeline=use_data_pipeline, extra_callbacks=extra_callbacks)
                 return autoencoder
 
     def generate_boundary_map(self,
@@ -107,6 +118,11 @@ class SDBM(AbstractDBM):
                               fast_decoding_strategy: FAST_DBM_STRATEGIES = FAST_DBM_STRATEGIES.NONE,
                               load_folder: str = DEFAULT_MODEL_PATH,
                               is_data_normalized: bool = True,
+                              nn_use_data_pipeline: bool = False,
+                              nn_stop_on_map_stability: bool = False,
+                              nn_size_preset: NN_SIZE_PRESETS = NN_SIZE_PRESETS.DEFAULT,
+                              use_surrogate: bool = False,
+                              nn_extra_callbacks: list | None = None,
                               ):
         """Generate the decision boundary map
 
@@ -122,12 +138,17 @@ class SDBM(AbstractDBM):
                 fast_decoding_strategy (FAST_DBM_STRATEGIES, optional): The strategy to use for the generation of the DBM. Defaults to FAST_DBM_STRATEGIES.NONE
                 load_folder (str, optional): The folder path which contains a pre-trained neural network or in which it will be stored. Defaults to DEFAULT_MODEL_PATH.
                 is_data_normalized (bool, optional): Determine the last layer activation function of the decoder, sigmoid or relu. Defaults to True (i.e. activation sigmoid).
+                nn_use_data_pipeline (bool, optional): If True the neural network is trained using a tf.data pipeline. Defaults to False.
+                nn_stop_on_map_stability (bool, optional): If True the training also stops once a coarse decision boundary map stops changing. Defaults to False.
+                nn_size_preset (NN_SIZE_PRESETS, optional): The size of the encoder and decoder hidden layers. Defaults to NN_SIZE_PRESETS.DEFAULT.
+                use_surrogate (bool, optional): If True the fast decoding strategies use a distilled 2D -> class surrogate network and evaluate exactly only the points near the boundaries (see fit_surrogate). Defaults to False.
+                nn_extra_callbacks (list | None, optional): Additional callbacks of the neural network training (e.g. TrainingCancellation). Defaults to None.
      
             Returns:
                 img (np.ndarray): The decision boundary map
                 img_confidence (np.ndarray): The confidence map
-                encoded_2d_train (np.ndarray): The 2D coordinates of the training data for each pixel of the decision boundary map and the assigned classifier label
-                encoded_2d_test (np.ndarray): The 2D coordinates of the testing data for each pixel of the decision boundary map and the assigned classifier label
+                encoded_2d_train (np.ndarray): The 2D coordinates of the training data for each pixel of the decision boundary map and the label predicted by the classifier
+                encoded_2d_test (np.ndarray): The 2D coordinates of the testing data for each pixel of the decision boundary map and the label predicted by the classifier
                 
             Example:
                 >>> import SDBM
@@ -140,6 +161,7 @@ class SDBM(AbstractDBM):
 
         # first train the autoencoder if it is not already trained
         if self.neural_network is None:
+            self.surrogate = None
             X = np.concatenate((X_train, X_test), axis=0)
             Y = np.concatenate((Y_train, Y_test), axis=0)
             self.neural_network = self.fit(X, Y,
@@ -147,7 +169,11 @@ class SDBM(AbstractDBM):
                                            load_folder=load_folder,
                                            epochs=nn_train_epochs,
                                            batch_size=nn_train_batch_size,
-                                           is_data_normalized=is_data_normalized
+                                           is_data_normalized=is_data_normalized,
+                                           use_data_pipeline=nn_use_data_pipeline,
+                                           stop_on_map_stability=nn_stop_on_map_stability,
+                                           size_preset=nn_size_preset,
+                                           extra_callbacks=nn_extra_callbacks
                                            )
 
         # encoder the train and test data and show the encoded data in 2D space
@@ -160,6 +186,11 @@ class SDBM(AbstractDBM):
 
         self.resolution = resolution
 
+        # without use_surrogate the map is always predicted exactly, even if a surrogate was fitted by an earlier call
+        self.use_surrogate = use_surrogate
+        if use_surrogate and fast_decoding_strategy != FAST_DBM_STRATEGIES.NONE and self.surrogate is None:
+            self.fit_surrogate()
+
         img, img_confidence = self.get_dbm(fast_decoding_strategy, resolution, load_folder)
 
         self.X2d = np.concatenate((encoded_training_data, encoded_testing_data), axis=0)
@@ -171,25 +202,58 @@ class SDBM(AbstractDBM):
         encoded_training_data = encoded_training_data.astype(int)
         encoded_testing_data = encoded_testing_data.astype(int)
 
-        encoded_2d_train = np.zeros((len(encoded_training_data), 3))
-        encoded_2d_test = np.zeros((len(encoded_testing_data), 3))
+        # the labels of the data points are the classifier predictions, cached until the classifier changes
+        labels_train = self.predict_classifier(X_train).argmax(axis=-1)
+        labels_test = self.predict_classifier(X_test).argmax(axis=-1)
 
-        for k in range(len(encoded_training_data)):
-            [i, j] = encoded_training_data[k]
-            encoded_2d_train[k] = [i, j, img[i, j]]
-        for k in range(len(encoded_testing_data)):
-            [i, j] = encoded_testing_data[k]
-            encoded_2d_test[k] = [i, j, img[i, j]]
+        encoded_2d_train = np.column_stack((encoded_training_data, labels_train)).astype(np.float64)
+        encoded_2d_test = np.column_stack((encoded_testing_data, labels_test)).astype(np.float64)
 
-        for [i, j] in encoded_testing_data:
-            img[i, j] = TEST_DATA_POINT_MARKER
-            img_confidence[i, j] = 1
-        for [i, j] in encoded_training_data:
-            img[i, j] = TRAIN_DATA_POINT_MARKER
-            img_confidence[i, j] = 1
+        # the train markers are placed last, so they win over the test markers on shared pixels
+        img[encoded_testing_data[:, 0], encoded_testing_data[:, 1]] = TEST_DATA_POINT_MARKER
+        img_confidence[encoded_testing_data[:, 0], encoded_testing_data[:, 1]] = 1
+        img[encoded_training_data[:, 0], encoded_training_data[:, 1]] = TRAIN_DATA_POINT_MARKER
+        img_confidence[encoded_training_data[:, 0], encoded_training_data[:, 1]] = 1
 
         return (img, img_confidence, encoded_2d_train, encoded_2d_test)
 
+    def fine_tune(self, X_new: np.ndarray,
+                  epochs: int = DEFAULT_FINE_TUNING_EPOCHS, batch_size: int = DEFAULT_BATCH_SIZE,
+                  replay_ratio: float = DEFAULT_REPLAY_RATIO,
+                  use_data_pipeline: bool = False) -> np.ndarray:
+        """ 
+        Adds new data to the decision boundary map, without retraining the autoencoder from scratch.
+        The autoencoder is fine-tuned for a few epochs on the new data together with a random subsample of the old data,
+        then all the data is encoded again. The decision boundary map itself has to be regenerated afterwards (e.g. get_dbm).
+
+        Args:
+            X_new (np.ndarray): The new data
+            epochs (int, optional): The maximum number of fine-tuning epochs. Defaults to DEFAULT_FINE_TUNING_EPOCHS.
+            batch_size (int, optional): Train batch size. Defaults to DEFAULT_BATCH_SIZE.
+            replay_ratio (float, optional): The number of replayed old data points per new data point. Defaults to DEFAULT_REPLAY_RATIO.
+            use_data_pipeline (bool, optional): If True the autoencoder is fine-tuned using a tf.data pipeline. Defaults to False.
+
+        Returns:
+            X2d_new (np.ndarray): The 2D encoding of the new data.
+        """
+        if getattr(self, "Xnd", None) is None or not isinstance(self.neural_network, Autoencoder):
+            raise Exception("Fine-tuning needs a generated decision boundary map using the autoencoder architecture")
+
+        X_old = self.Xnd.reshape((-1,) + X_new.shape[1:])
+        self.neural_network.fine_tune(X_new, X_old,
+                                      epochs=epochs,
+                                      batch_size=batch_size,
+                                      replay_ratio=replay_ratio,
+                                      use_data_pipeline=use_data_pipeline)
+        # the surrogate was distilled from the previous decoder
+        self.surrogate = None
+
+        # the encoder changed, so the old data moves in 2D as well
+        X = np.concatenate((X_old, X_new), axis=0)
+        self.X2d = self.neural_network.encode(X)
+        self.Xnd = X.reshape((X.shape[0], -1))
+        return self.X2d[len(X_old):]
+
     def _predict2dspace_(self, X2d: np.ndarray):
         """ 
         Predicts the labels for the given 2D data set.
@@ -15,7 +15,7 @@
 import tensorflow as tf
 import numpy as np
 
-from ..AbstractNN import AbstractNN, SEED
+from ..AbstractNN import AbstractNN, SEED, NN_SIZE_PRESETS, get_hidden_layers, build_dense_layers
 from ...Logger import LoggerInterface, LoggerModel
 
 DECODER_NAME = "decoder"
@@ -32,15 +32,21 @@ CLASSIFIER_LOSS_WEIGHT = 0.125
 class SSNP(AbstractNN):
     def __init__(self,
                  folder_path: str,
-                 logger: LoggerInterface | None = None):
+                 logger: LoggerInterface | None = None,
+                 preset: NN_SIZE_PRESETS = NN_SIZE_PRESETS.DEFAULT,
+                 width: int | None = None,
+                 depth: int | None = None):
         """
             Creates an SSNP model.
 
             Args:
                 folder_path: The path to the folder where the model will be saved/loaded.
                 logger: The logger used to log the model's progress.
+                preset (NN_SIZE_PRESETS, optional): The size of the hidden layers of the encoder and of the decoder. Defaults to NN_SIZE_PRESETS.DEFAULT.
+                width (int | None, optional): The width of the widest hidden layer, overrides the preset. Defaults to None.
+                depth (int | None, optional): The number of hidden layers of the encoder and of the decoder, overrides the preset. Defaults to None.
         """
-        super().__init__(folder_path=folder_path, logger=logger, nn_name=SSNP_NAME)
+        super().__init__(folder_path=folder_path, logger=logger, nn_name=SSNP_NAME, hidden_layers=get_hidden_layers(preset, width, depth))
 
     def __build__(self, input_shape: tuple = (28, 28), num_classes: int = 10, show_summary: bool = False, is_data_normalized: bool = True):
         """
@@ -60,27 +66,13 @@ class SSNP(AbstractNN):
 
         encoder = tf.keras.models.Sequential([
             tf.keras.layers.Flatten(),
-            tf.keras.layers.Dense(512, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  kernel_regularizer=tf.keras.regularizers.l2(0.0002)),
-            tf.keras.layers.Dense(128, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  bias_initializer=tf.keras.initializers.Constant(0.01)),  # type: ignore
-            tf.keras.layers.Dense(64, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  bias_initializer=tf.keras.initializers.Constant(0.01)),  # type: ignore
-            tf.keras.layers.Dense(32, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  bias_initializer=tf.keras.initializers.Constant(0.01)),  # type: ignore
+            *build_dense_layers(self.hidden_layers[::-1]),
             tf.keras.layers.Dense(
                 2, activation='sigmoid', bias_initializer=tf.keras.initializers.Constant(0.01)),  # type: ignore
         ], name=ENCODER_NAME)
 
         decoder = tf.keras.models.Sequential([
-            tf.keras.layers.Dense(32, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  kernel_regularizer=tf.keras.regularizers.l2(0.0002)),
-            tf.keras.layers.Dense(64, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  bias_initializer=tf.keras.initializers.Constant(0.01)),  # type: ignore
-            tf.keras.layers.Dense(128, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  bias_initializer=tf.keras.initializers.Constant(0.01)),  # type: ignore
-            tf.keras.layers.Dense(512, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED),  # type: ignore
-                                  bias_initializer=tf.keras.initializers.Constant(0.01)),  # type: ignore
+            *build_dense_layers(self.hidden_layers),
             tf.keras.layers.Dense(output_size, activation=last_decoder_layer_activation_function,
                                   kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED)),  # type: ignore
             tf.keras.layers.Reshape(input_shape)
@@ -114,7 +106,10 @@ class SSNP(AbstractNN):
 
     def fit(self, X: np.ndarray, Y: np.ndarray,
             epochs: int = 100, batch_size: int = 128, 
-            is_data_normalized: bool = True):
+            is_data_normalized: bool = True,
+            use_data_pipeline: bool = False,
+            map_fn=None,
+            extra_callbacks: list | None = None):
         """ Fits the model to the specified data.
 
         Args:
@@ -123,6 +118,9 @@ class SSNP(AbstractNN):
             epochs (int, optional): The number of epochs. Defaults to 10.
             batch_size (int, optional): Data points used for one batch. Defaults to 128.
             is_data_normalized (bool, optional): Determine the last layer activation function, sigmoid or relu. Defaults to True (i.e. activation sigmoid).
+            use_data_pipeline (bool, optional): If True the data is fed through a shuffled and prefetched tf.data pipeline. Defaults to False.
+            map_fn (function, optional): function: (x, y) -> (x, y) mapped in parallel over the samples of the tf.data pipeline every epoch (e.g. data augmentation). Defaults to None.
+            extra_callbacks (list, optional): Additional training callbacks (e.g. MapStabilityEarlyStopping). Defaults to None.
         """
         if self.neural_network is not None:
             self.console.log("Model already loaded. Skipping build.")
@@ -139,13 +137,12 @@ class SSNP(AbstractNN):
 
         self.console.log("Fitting model...")
 
-        history = self.neural_network.fit(X, [X, Y],
-                                          epochs=epochs,
-                                          batch_size=batch_size,
-                                          shuffle=True,
-                                          validation_split=0.2,
-                                          callbacks=[stopping_callback, logger_callback],
-                                          verbose=0)
+        history = self._fit_neural_network_(X, [X, Y],
+                                            epochs=epochs,
+                                            batch_size=batch_size,
+                                            callbacks=[stopping_callback, logger_callback] + (extra_callbacks or []),
+                                            use_data_pipeline=use_data_pipeline,
+                                            map_fn=map_fn)
 
         self.console.log("Model fitted!")
         self.save(history)
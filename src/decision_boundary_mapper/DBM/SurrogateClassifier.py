@@ -0,0 +1,107 @@
+# Copyright 2023 Cristian Grosu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tensorflow as tf
+import numpy as np
+
+from .AbstractNN import SEED
+from ..Logger import Logger, LoggerInterface, LoggerModel
+
+SURROGATE_NAME = "Surrogate"
+SURROGATE_HIDDEN_LAYERS = (64, 64)
+SURROGATE_TRAINING_SAMPLES = 128 * 128
+SURROGATE_EPOCHS = 50
+SURROGATE_BATCH_SIZE = 256
+SURROGATE_PREDICT_BATCH_SIZE = 65536
+SURROGATE_MARGIN_THRESHOLD = 0.2
+
+
+class SurrogateClassifier:
+    """
+    A tiny 2D -> C network distilled from the composite classifier(inverse_projection(p)).
+    It predicts the class probabilities of a 2D point without decoding it, the points where its margin
+    (the difference between its two highest probabilities) is low are left to the exact pipeline.
+
+    Example:
+        >>> surrogate = SurrogateClassifier()
+        >>> surrogate.fit(space2d, exact_predictions)
+        >>> predictions, is_uncertain = surrogate.predict(X2d)
+    """
+
+    def __init__(self,
+                 hidden_layers: tuple = SURROGATE_HIDDEN_LAYERS,
+                 margin_threshold: float = SURROGATE_MARGIN_THRESHOLD,
+                 logger: LoggerInterface | None = None):
+        """
+        Initializes the surrogate.
+
+        Args:
+            hidden_layers (tuple, optional): The widths of the hidden layers. Defaults to SURROGATE_HIDDEN_LAYERS.
+            margin_threshold (float, optional): The points with a margin below this threshold are considered uncertain. Defaults to SURROGATE_MARGIN_THRESHOLD.
+            logger (LoggerInterface, optional): The logger for outputting info messages. Defaults to console logging.
+        """
+        self.hidden_layers = hidden_layers
+        self.margin_threshold = margin_threshold
+        self.console = logger if logger is not None else Logger(name=SURROGATE_NAME)
+        self.neural_network: tf.keras.Model | None = None
+
+    def fit(self, X2d: np.ndarray, predictions: np.ndarray, epochs: int = SURROGATE_EPOCHS, batch_size: int = SURROGATE_BATCH_SIZE):
+        """
+        Distills the exact predictions of the 2D points into the surrogate.
+
+        Args:
+            X2d (np.ndarray): The 2D points.
+            predictions (np.ndarray): The class probabilities of the 2D points computed by the exact pipeline.
+            epochs (int, optional): The number of epochs. Defaults to SURROGATE_EPOCHS.
+            batch_size (int, optional): Train batch size. Defaults to SURROGATE_BATCH_SIZE.
+        """
+        n_classes = predictions.shape[1]
+        self.neural_network = tf.keras.Sequential([
+            tf.keras.Input(shape=(2,)),
+            *[tf.keras.layers.Dense(width, activation='relu', kernel_initializer=tf.keras.initializers.HeUniform(seed=SEED))  # type: ignore
+              for width in self.hidden_layers],
+            tf.keras.layers.Dense(n_classes, activation='softmax')
+        ], name=SURROGATE_NAME)
+        # the exact probabilities are used as soft labels
+        self.neural_network.compile(optimizer=tf.keras.optimizers.Adam(), loss="categorical_crossentropy")
+
+        stopping_callback = tf.keras.callbacks.EarlyStopping(monitor='loss', mode='min', patience=5, restore_best_weights=True)
+        logger_callback = LoggerModel(name=SURROGATE_NAME, show_init=False, epochs=epochs, print_fn=self.console.log)
+        self.console.log(f"Distilling the classifier into a 2D -> {n_classes} surrogate on {len(X2d)} points...")
+        self.neural_network.fit(X2d.astype(np.float32), predictions.astype(np.float32),
+                                epochs=epochs, batch_size=batch_size, shuffle=True, verbose=0,  # type: ignore
+                                callbacks=[stopping_callback, logger_callback])
+
+        labels = np.argmax(predictions, axis=1)
+        surrogate_predictions, is_uncertain = self.predict(X2d)
+        agreement = np.mean(np.argmax(surrogate_predictions, axis=1) == labels)
+        confident_agreement = np.mean(np.argmax(surrogate_predictions[~is_uncertain], axis=1) == labels[~is_uncertain]) if np.any(~is_uncertain) else 1
+        self.console.log(f"Surrogate agreement: {agreement * 100:.2f}% overall, {confident_agreement * 100:.2f}% on the "
+                         f"{np.mean(~is_uncertain) * 100:.2f}% confident points")
+
+    def predict(self, X2d: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Predicts the class probabilities of the 2D points.
+
+        Args:
+            X2d (np.ndarray): The 2D points.
+
+        Returns:
+            predictions (np.ndarray): The class probabilities predicted by the surrogate.
+            is_uncertain (np.ndarray): True for the points that should be evaluated by the exact pipeline.
+        """
+        predictions = self.neural_network.predict(np.asarray(X2d, dtype=np.float32), verbose=0, batch_size=SURROGATE_PREDICT_BATCH_SIZE)  # type: ignore
+        top2 = np.partition(predictions, -2, axis=1)[:, -2:] if predictions.shape[1] > 1 else np.concatenate((np.zeros_like(predictions), predictions), axis=1)
+        is_uncertain = (top2[:, 1] - top2[:, 0]) < self.margin_threshold
+        return predictions, is_uncertain
@@ -0,0 +1,44 @@
+# Copyright 2023 Cristian Grosu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import tensorflow as tf
+
+
+class TrainingCancellation(tf.keras.callbacks.Callback):
+    """
+    Interrupts a training (or a prediction) after the current batch once it was cancelled from the outside, e.g. by the Cancel button of the GUI.
+    The cancellation check raises an exception that propagates out of model.fit, so nothing after the fit runs and a half-trained model is never saved.
+
+    Example:
+        >>> model.fit(X, Y, callbacks=[TrainingCancellation(job.check_cancelled)])
+    """
+
+    def __init__(self, check_cancelled):
+        """
+        Initializes the callback.
+
+        Args:
+            check_cancelled (function: () -> None): Raises an exception if the training was cancelled (e.g. Job.check_cancelled).
+        """
+        super().__init__()
+        self.check_cancelled = check_cancelled
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.check_cancelled()
+
+    def on_test_batch_end(self, batch, logs=None):
+        self.check_cancelled()
+
+    def on_predict_batch_end(self, batch, logs=None):
+        self.check_cancelled()
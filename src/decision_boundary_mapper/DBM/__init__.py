@@ -12,8 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .DBM import DBM
+from .DBM import DBM, PCAInv, benchmark_inverse_projection_presets, CORESET_STRATEGIES, select_coreset
 from .SDBM import SDBM, NNArchitecture
 from .AbstractDBM import AbstractDBM, FAST_DBM_STRATEGIES
-from .AbstractNN import AbstractNN
+from .AbstractNN import AbstractNN, NN_SIZE_PRESETS
+from .NeighborsIndex import NeighborsIndex
+from .PixelIndex import PixelIndex
+from .MapStabilityEarlyStopping import MapStabilityEarlyStopping
+from .SurrogateClassifier import SurrogateClassifier
+from .ChangedLabelsEarlyStopping import ChangedLabelsEarlyStopping
+from .TrainingCancellation import TrainingCancellation
 from .tools import *
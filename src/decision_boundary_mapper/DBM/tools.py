@@ -16,42 +16,26 @@ from math import ceil, floor
 import numpy as np
 from numba import jit, njit, prange
 
-@njit(parallel=True)
-def get_nd_indices_parallel(X_nd, metric):
-    """ Generates the indices of the nearest neighbors for each point in the nD space.
-        Args:
-            X_nd (np.ndarray): the nD dataset
-            metric (function): the metric to use for calculating the distances
-    """
-    n_samples = X_nd.shape[0]
-    dist_vector = np.zeros(n_samples, dtype=np.float64)
-    indices = np.zeros((n_samples, n_samples - 1), dtype=np.int64)
+PROJECTION_ERRORS_BLOCK_ELEMENTS = 2**23  # maximum number of pairwise distances kept in memory at once
+INVERSE_PROJECTION_ERRORS_PROGRESS_BLOCK_SIZE = 1024  # number of pixels computed between two progress updates
 
-    for i in range(n_samples):
-        for j in prange(n_samples):
-            dist_vector[j] = metric(X_nd[i], X_nd[j])
-
-        indices[i] = np.argsort(dist_vector)[1:]  # exclude the point itself
-
-    return indices
-
-@njit()
-def generate_point_indices(X, point, metric):
-    """ Generates the indices of the nearest neighbors for a point.
+@njit(cache=True)
+def generate_point_indices(X, point):
+    """ Generates the indices of the nearest neighbors for a point, using the euclidean distance.
+        The metric is not a parameter, since numba cannot cache the kernels that take a function argument.
         Args:
             X (np.ndarray): the (Nd or 2d) dataset
             point (np.ndarray): the (Nd or 2d) point
-            metric (function): the metric to use for calculating the distances
     """
     data_samples = X.shape[0]
     dist_vector = np.zeros(data_samples, dtype=np.float64)
 
     for j in range(data_samples):
-        dist_vector[j] = metric(point, X[j])
+        dist_vector[j] = euclidean(point, X[j])
 
     return np.argsort(dist_vector)
 
-@njit(fastmath=True)
+@njit(fastmath=True, cache=True)
 def euclidean(x, y):
     r"""Standard euclidean distance.
 
@@ -63,11 +47,11 @@ def euclidean(x, y):
         result += (x[i] - y[i]) ** 2
     return np.sqrt(result)
 
-@jit
+@jit(cache=True)
 def get_inv_proj_error(dx, dy):
     return np.sqrt(np.linalg.norm(dx)**2 + np.linalg.norm(dy)**2)
 
-@njit(parallel=True)
+@njit(parallel=True, cache=True)
 def get_proj_error_parallel(indices_source: np.ndarray, indices_embedding: np.ndarray, k: int = 10):
     """ Calculates the projection error for a given data point.
         Args:
@@ -102,7 +86,7 @@ def get_proj_error_parallel(indices_source: np.ndarray, indices_embedding: np.nd
 
     return (continuity + trustworthiness) / 2
 
-@njit()
+@njit(cache=True)
 def get_proj_error(indices_source: np.ndarray, indices_embedding: np.ndarray, k: int = 10):
     """ Calculates the projection error for a given data point.
         Args:
@@ -137,7 +121,203 @@ def get_proj_error(indices_source: np.ndarray, indices_embedding: np.ndarray, k:
 
     return (continuity + trustworthiness) / 2
 
-@jit
+@njit(cache=True)
+def get_k_nearest_indices(dist_vector: np.ndarray, self_index: int, k: int = 10):
+    """ Selects the indices of the k nearest neighbors from a row of distances, without sorting the whole row.
+        Args:
+            dist_vector (np.ndarray): the distances from a point to every point of the dataset
+            self_index (int): the index of the point itself, which is excluded from its neighbors
+            k (int): the number of neighbors to select
+    """
+    best_dist = np.full(k, np.inf)
+    best_indices = np.full(k, -1, dtype=np.int64)
+
+    for j in range(dist_vector.shape[0]):
+        d = dist_vector[j]
+        if j == self_index or d >= best_dist[k - 1]:
+            continue
+        # insertion into the sorted list of the current k best candidates
+        pos = k - 1
+        while pos > 0 and best_dist[pos - 1] > d:
+            best_dist[pos] = best_dist[pos - 1]
+            best_indices[pos] = best_indices[pos - 1]
+            pos -= 1
+        best_dist[pos] = d
+        best_indices[pos] = j
+
+    return best_indices
+
+@njit(cache=True)
+def count_closer_points(dist_vector: np.ndarray, self_index: int, thresholds: np.ndarray):
+    """ Counts for every threshold how many points of the dataset are strictly closer than it, in a single pass over the row.
+        The count is the (0-based) rank the threshold would get in the sorted row of distances.
+        Args:
+            dist_vector (np.ndarray): the distances from a point to every point of the dataset
+            self_index (int): the index of the point itself, which is not counted
+            thresholds (np.ndarray): the distances to rank
+    """
+    k = thresholds.shape[0]
+    order = np.argsort(thresholds)
+    sorted_thresholds = thresholds[order]
+    histogram = np.zeros(k + 1, dtype=np.int64)
+
+    for j in range(dist_vector.shape[0]):
+        if j == self_index:
+            continue
+        # the point is closer than all the thresholds from this position on
+        histogram[np.searchsorted(sorted_thresholds, dist_vector[j], side='right')] += 1
+
+    ranks = np.zeros(k, dtype=np.int64)
+    closer = 0
+    for m in range(k):
+        closer += histogram[m]
+        ranks[order[m]] = closer
+
+    return ranks
+
+@njit(parallel=True, cache=True)
+def get_proj_errors_from_distances_parallel(dist_nd: np.ndarray, dist_2d: np.ndarray, offset: int, k: int = 10):
+    """ Calculates the projection error for a block of consecutive data points from their distance rows.
+        Only the k nearest neighbors of each space and their ranks in the other space are computed, 
+        so the full neighbors ordering of the rows is never built.
+        Args:
+            dist_nd (np.ndarray): the (squared) distances of the block points to all the points in the source (i.e. nD) space
+            dist_2d (np.ndarray): the (squared) distances of the block points to all the points in the embedding (i.e. 2D) space
+            offset (int): the index of the first point of the block in the dataset
+            k (int): the number of neighbors to consider
+    """
+    n_rows, n_samples = dist_nd.shape
+    n = n_samples - 1
+    normalization = k * (2*n - 3*k - 1)
+    errors = np.zeros(n_rows, dtype=np.float64)
+
+    for r in prange(n_rows):
+        i = offset + r
+        row_nd, row_2d = dist_nd[r], dist_2d[r]
+        neighbors_nd = get_k_nearest_indices(row_nd, i, k)
+        neighbors_2d = get_k_nearest_indices(row_2d, i, k)
+
+        # ranks in the embedding of the source neighbors and ranks in the source of the embedding neighbors
+        ranks_2d = count_closer_points(row_2d, i, row_2d[neighbors_nd])
+        ranks_nd = count_closer_points(row_nd, i, row_nd[neighbors_2d])
+
+        continuity = 0.0
+        trustworthiness = 0.0
+        for m in range(k):
+            if ranks_2d[m] > k:
+                continuity += ranks_2d[m] - k
+            if ranks_nd[m] > k:
+                trustworthiness += ranks_nd[m] - k
+
+        continuity = 2 * continuity / normalization
+        trustworthiness = 2 * trustworthiness / normalization
+        errors[r] = (continuity + trustworthiness) / 2
+
+    return errors
+
+def get_squared_distances_block(X_block: np.ndarray, X: np.ndarray, X_squared_norms: np.ndarray):
+    """ Computes the squared euclidean distances between a block of points and the whole dataset using a single matrix product.
+        Args:
+            X_block (np.ndarray): the block of points
+            X (np.ndarray): the dataset
+            X_squared_norms (np.ndarray): the squared norms of the dataset points
+    """
+    distances = X_block @ X.T
+    distances *= -2
+    distances += X_squared_norms[None, :]
+    distances += np.einsum("ij,ij->i", X_block, X_block)[:, None]
+    np.maximum(distances, 0, out=distances)
+    return distances
+
+def get_proj_errors(X_nd: np.ndarray, X_2d: np.ndarray, k: int = 10, block_elements: int = PROJECTION_ERRORS_BLOCK_ELEMENTS):
+    """ Calculates the projection error (i.e. the mean of the continuity and trustworthiness errors) of every data point.
+        The distances are computed block by block, so the memory used stays bounded by the block size instead of growing as n x n.
+        Args:
+            X_nd (np.ndarray): the nD dataset
+            X_2d (np.ndarray): the 2D projection of the dataset
+            k (int): the number of neighbors to consider
+            block_elements (int): the maximum number of distances held in memory at once for each space
+    """
+    X_nd = np.ascontiguousarray(X_nd.reshape((X_nd.shape[0], -1)), dtype=np.float64)
+    X_2d = np.ascontiguousarray(X_2d, dtype=np.float64)
+    n_samples = X_nd.shape[0]
+    assert n_samples == X_2d.shape[0]
+    assert n_samples > k + 1
+
+    block_size = max(1, min(n_samples, block_elements // n_samples))
+    squared_norms_nd = np.einsum("ij,ij->i", X_nd, X_nd)
+    squared_norms_2d = np.einsum("ij,ij->i", X_2d, X_2d)
+
+    errors = np.zeros(n_samples, dtype=np.float64)
+    for start in range(0, n_samples, block_size):
+        end = min(start + block_size, n_samples)
+        dist_nd = get_squared_distances_block(X_nd[start:end], X_nd, squared_norms_nd)
+        dist_2d = get_squared_distances_block(X_2d[start:end], X_2d, squared_norms_2d)
+        errors[start:end] = get_proj_errors_from_distances_parallel(dist_nd, dist_2d, start, k=k)
+
+    return errors
+
+def interpolate_from_landmarks(X: np.ndarray, landmarks_nd: np.ndarray, landmarks_2d: np.ndarray, k: int = 8, block_elements: int = PROJECTION_ERRORS_BLOCK_ELEMENTS):
+    """ Places data points in 2D by inverse distance weighting of the 2D positions of their k nearest landmarks in nD.
+        The distances are computed block by block, so the memory used stays bounded by the block size.
+        Args:
+            X (np.ndarray): the nD data points to be placed
+            landmarks_nd (np.ndarray): the nD landmarks
+            landmarks_2d (np.ndarray): the 2D positions of the landmarks
+            k (int): the number of landmarks to interpolate from
+            block_elements (int): the maximum number of distances held in memory at once
+    """
+    X = np.ascontiguousarray(X.reshape((X.shape[0], -1)), dtype=np.float32)
+    landmarks_nd = np.ascontiguousarray(landmarks_nd.reshape((landmarks_nd.shape[0], -1)), dtype=np.float32)
+    n_samples, n_landmarks = X.shape[0], landmarks_nd.shape[0]
+    k = min(k, n_landmarks)
+
+    block_size = max(1, block_elements // n_landmarks)
+    squared_norms = np.einsum("ij,ij->i", landmarks_nd, landmarks_nd)
+
+    X2d = np.empty((n_samples, 2), dtype=np.float64)
+    for start in range(0, n_samples, block_size):
+        end = min(start + block_size, n_samples)
+        distances = get_squared_distances_block(X[start:end], landmarks_nd, squared_norms)
+        nearest = np.argpartition(distances, k - 1, axis=1)[:, :k] if k < n_landmarks else np.tile(np.arange(n_landmarks), (end - start, 1))
+        nearest_distances = np.sqrt(np.take_along_axis(distances, nearest, axis=1))
+        weights = 1 / (nearest_distances + 1e-8) ** 2
+        weights /= weights.sum(axis=1, keepdims=True)
+        X2d[start:end] = np.einsum("ij,ijk->ik", weights, landmarks_2d[nearest])
+
+    return X2d
+
+@njit(cache=True)
+def farthest_point_sampling(X: np.ndarray, n_samples: int, first: int = 0):
+    """ Greedily selects n_samples points, each one being the farthest from the points already selected.
+        Args:
+            X (np.ndarray): the data points (e.g. 2D projection)
+            n_samples (int): the number of points to be selected
+            first (int): the index of the first selected point
+        Returns:
+            selected (np.ndarray): the indices of the selected points, in the order they were selected
+    """
+    n, dims = X.shape
+    n_samples = min(n_samples, n)
+    selected = np.empty(n_samples, dtype=np.int64)
+    min_distances = np.full(n, np.inf)
+    current = first
+    for s in range(n_samples):
+        selected[s] = current
+        farthest, farthest_distance = 0, -1.0
+        for i in range(n):
+            d = 0.0
+            for j in range(dims):
+                diff = X[i, j] - X[current, j]
+                d += diff * diff
+            if d < min_distances[i]:
+                min_distances[i] = d
+            if min_distances[i] > farthest_distance:
+                farthest, farthest_distance = i, min_distances[i]
+        current = farthest
+    return selected
+
+@jit(cache=True)
 def get_pixel_priority(img, i, j, window_width, window_height, label):
     """
        Calculates the priority of decoding a chunk of pixels.
@@ -183,7 +363,7 @@ def get_pixel_priority(img, i, j, window_width, window_height, label):
 
     return 1/cost
 
-@njit
+@njit(cache=True)
 def binary_split(i, j, W, H):
     Wc, Wf = ceil(W/2), floor(W/2)
     Hc, Hf = ceil(H/2), floor(H/2)
@@ -198,23 +378,127 @@ def binary_split(i, j, W, H):
     sizes = [(Wc, Hc), (Wc, Hf), (Wf, Hc), (Wf, Hf)]
     return representatives, sizes
 
-@njit(parallel=True)
-def get_projection_errors_using_inverse_projection(Xnd: np.ndarray, X2d: np.ndarray, spaceNd: np.ndarray, space2d: np.ndarray, progress, k: int = 10):
-
+@njit(parallel=True, cache=True)
+def get_projection_errors_using_inverse_projection_parallel(Xnd: np.ndarray, X2d: np.ndarray, spaceNd: np.ndarray, space2d: np.ndarray, k: int = 10):
+    """ Computes the projection error of each 2D point using its decoded nD point, it takes only arrays so the compiled kernel can be cached.
+        Args:
+            Xnd (np.ndarray): the nD dataset
+            X2d (np.ndarray): the 2D dataset
+            spaceNd (np.ndarray): the decoded nD points
+            space2d (np.ndarray): the 2D points
+            k (int, optional): the number of neighbors. Defaults to 10.
+    """
     n_points = len(space2d)
-    data_samples = len(X2d)
     errors = np.zeros(n_points, dtype=np.float64)
 
     for index in prange(n_points):
-        indices_embedded, indices_source = np.zeros(data_samples, dtype=np.int64), np.zeros(data_samples, dtype=np.int64)
-        indices_embedded = generate_point_indices(X2d, space2d[index], metric=euclidean)
-        indices_source = generate_point_indices(Xnd, spaceNd[index], metric=euclidean)
+        indices_embedded = generate_point_indices(X2d, space2d[index])
+        indices_source = generate_point_indices(Xnd, spaceNd[index])
         errors[index] = get_proj_error(indices_source, indices_embedded, k=k)
-        progress.update(1)
 
     return errors
 
-@njit
+def get_projection_errors_using_inverse_projection(Xnd: np.ndarray, X2d: np.ndarray, spaceNd: np.ndarray, space2d: np.ndarray, progress=None, k: int = 10,
+                                                   block_size: int = INVERSE_PROJECTION_ERRORS_PROGRESS_BLOCK_SIZE):
+    """ Computes the projection error of each 2D point using its decoded nD point, block by block so the progress is reported between the blocks.
+        Args:
+            Xnd (np.ndarray): the nD dataset
+            X2d (np.ndarray): the 2D dataset
+            spaceNd (np.ndarray): the decoded nD points
+            space2d (np.ndarray): the 2D points
+            progress (ProgressBar, optional): the progress bar updated after every block. Defaults to None.
+            k (int, optional): the number of neighbors. Defaults to 10.
+            block_size (int, optional): the number of points computed between two progress updates. Defaults to INVERSE_PROJECTION_ERRORS_PROGRESS_BLOCK_SIZE.
+    """
+    n_points = len(space2d)
+    errors = np.zeros(n_points, dtype=np.float64)
+
+    for start in range(0, n_points, block_size):
+        end = min(start + block_size, n_points)
+        errors[start:end] = get_projection_errors_using_inverse_projection_parallel(Xnd, X2d, spaceNd[start:end], space2d[start:end], k=k)
+        if progress is not None:
+            progress.update(end - start)
+
+    return errors
+
+@njit(cache=True)
+def squared_euclidean(x, y):
+    r"""Squared euclidean distance.
+
+    ..math::
+        D(x, y) = \sum_i (x_i - y_i)^2
+    """
+    result = 0.0
+    for i in range(x.shape[0]):
+        result += (x[i] - y[i]) ** 2
+    return result
+
+@njit(parallel=True, cache=True)
+def get_candidates_squared_distances_parallel(X: np.ndarray, points: np.ndarray, candidates: np.ndarray):
+    """ Computes the exact squared distances from each point to its own list of candidate neighbors.
+        Args:
+            X (np.ndarray): the dataset
+            points (np.ndarray): the query points
+            candidates (np.ndarray): the indices of the candidate neighbors of each query point (n_points x n_candidates)
+    """
+    n_points, n_candidates = candidates.shape
+    distances = np.zeros((n_points, n_candidates), dtype=np.float64)
+    for p in prange(n_points):
+        for c in range(n_candidates):
+            distances[p, c] = squared_euclidean(points[p], X[candidates[p, c]])
+    return distances
+
+@njit(parallel=True, cache=True)
+def get_bounded_ranks_parallel(candidates_distances: np.ndarray, candidates_bound: np.ndarray, thresholds: np.ndarray, sample_distances: np.ndarray, n_samples: int):
+    """ Computes for each point the ranks of a set of distances (i.e. the number of dataset points strictly closer), searching exactly only among the point's candidates.
+        The candidates of a point must contain every dataset point whose distance is below the point's bound, 
+        so ranks of distances within the bound are exact. Ranks of distances beyond the bound are estimated from a random sample of the dataset.
+        Args:
+            candidates_distances (np.ndarray): the exact distances from each point to its candidates (n_points x n_candidates)
+            candidates_bound (np.ndarray): the distance up to which the candidates of each point are complete (n_points)
+            thresholds (np.ndarray): the distances to rank for each point (n_points x k)
+            sample_distances (np.ndarray): the distances from each point to a random sample of the dataset (n_points x n_sample)
+            n_samples (int): the number of points in the dataset
+    """
+    n_points, k = thresholds.shape
+    scale = n_samples / sample_distances.shape[1]
+    ranks = np.zeros((n_points, k), dtype=np.int64)
+
+    for p in prange(n_points):
+        ranks[p] = count_closer_points(candidates_distances[p], -1, thresholds[p])
+        if np.all(thresholds[p] <= candidates_bound[p]):
+            continue
+        estimates = count_closer_points(sample_distances[p], -1, thresholds[p])
+        for m in range(k):
+            if thresholds[p, m] > candidates_bound[p]:
+                ranks[p, m] = max(ranks[p, m], int(round(estimates[m] * scale)))
+
+    return ranks
+
+@njit(parallel=True, cache=True)
+def get_proj_errors_from_ranks_parallel(ranks_2d: np.ndarray, ranks_nd: np.ndarray, n: int, k: int = 10):
+    """ Calculates the projection errors of a batch of points from the ranks of their neighbors.
+        Args:
+            ranks_2d (np.ndarray): the ranks in the embedding (i.e. 2D) space of the k nearest neighbors in the source (i.e. nD) space (n_points x k)
+            ranks_nd (np.ndarray): the ranks in the source (i.e. nD) space of the k nearest neighbors in the embedding (i.e. 2D) space (n_points x k)
+            n (int): the number of points the ranks are computed against
+            k (int): the number of neighbors to consider
+    """
+    n_points = ranks_2d.shape[0]
+    normalization = k * (2*n - 3*k - 1)
+    errors = np.zeros(n_points, dtype=np.float64)
+    for p in prange(n_points):
+        continuity = 0.0
+        trustworthiness = 0.0
+        for m in range(k):
+            if ranks_2d[p, m] > k:
+                continuity += ranks_2d[p, m] - k
+            if ranks_nd[p, m] > k:
+                trustworthiness += ranks_nd[p, m] - k
+        errors[p] = (2 * continuity / normalization + 2 * trustworthiness / normalization) / 2
+    return errors
+
+@njit(cache=True)
 def generate_windows(window_size: int, initial_resolution: int, resolution: int = 1024):
 
     indexes = [((i * window_size + window_size / 2 - 0.5), (j * window_size + window_size / 2 - 0.5)) for i in range(initial_resolution) for j in range(initial_resolution)]
@@ -243,7 +527,7 @@ def generate_windows(window_size: int, initial_resolution: int, resolution: int
     
     return indexes, sizes, border_indexes
 
-@njit
+@njit(cache=True)
 def get_window_borders(x, y, w, h):
     # returns the borders of the window by its center and size
     # x, y - center of the window
@@ -272,7 +556,7 @@ def get_tasks_with_same_priority(priority_queue):
             
     return items
 
-@njit 
+@njit(cache=True)
 def get_split_position(x1: float, x2:float, bound: float, c11: float, c12: float, c21: float, c22: float) -> int | None:
     assert(x1 != x2)
 
@@ -373,3 +657,27 @@ def confidence_based_split(splits_x, splits_y, c_y, c_x, W, H, top, bottom, left
             sizes.append((w, h))
     
     return representatives, sizes
+
+def warmup_kernels():
+    """ Compiles the numba kernels for the argument types used by the decision boundary mapper, by running them on tiny inputs.
+        The compiled kernels are cached on the disk (cache=True), so only the first process ever pays for the compilation
+        and any later process just loads them.
+    """
+    rng = np.random.default_rng(0)
+    for dtype in (np.float32, np.float64):
+        X_nd = rng.random((16, 4)).astype(dtype)
+        X_2d = rng.random((16, 2)).astype(dtype)
+        get_proj_errors(X_nd, X_2d, k=2)
+        interpolate_from_landmarks(X_nd, X_nd[:4], X_2d[:4].astype(np.float64), k=2)
+        get_inv_proj_error(X_nd[0], X_nd[1])
+        farthest_point_sampling(X_2d, 4)
+        # the decoded points are float32 (predicted by the network) and the 2D grid is float64
+        get_projection_errors_using_inverse_projection_parallel(X_nd, X_2d, X_nd[:4].astype(np.float32), X_2d[:4].astype(np.float64), k=2)
+
+    img = np.zeros((8, 8), dtype=np.int16)
+    for (x, y), (w, h) in zip(*generate_windows(4, initial_resolution=2, resolution=8)[:2]):
+        get_window_borders(x, y, w, h)
+        get_pixel_priority(img, y, x, w, h, np.int64(0))
+        binary_split(y, x, w, h)
+    get_window_borders(1, 1, 2, 2)
+    get_split_position(1.0, 3.0, 5.0, 0.9, 0.4, 0.1, 0.6)
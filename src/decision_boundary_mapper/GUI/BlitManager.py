@@ -0,0 +1,79 @@
+# Copyright 2023 Cristian Grosu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+class BlitManager:
+    """
+    Redraws the animated artists of a figure (e.g. the hover tooltips and the selection markers) with blitting:
+    the rest of the figure is rendered once into a background, and an update only restores the background and draws the animated artists on top of it.
+    The background is captured again on every full draw of the figure (e.g. after a resize or a fig.canvas.draw_idle()).
+
+    The figure canvas may be replaced (e.g. by draw_figure_to_canvas), the manager always uses the current canvas of the figure.
+
+    Example:
+        >>> blit_manager = BlitManager(fig)
+        >>> blit_manager.add_artist(annotation)
+        >>> annotation.xy = (x, y)
+        >>> blit_manager.update()
+    """
+
+    def __init__(self, figure):
+        """
+        Initializes the manager.
+
+        Args:
+            figure (matplotlib.figure.Figure): The figure whose animated artists are managed.
+        """
+        self.figure = figure
+        self.background = None
+        self.artists = []
+        # the canvas callbacks are stored in the figure, so they survive a replacement of the canvas
+        self.draw_event_cid = figure.canvas.mpl_connect("draw_event", self.on_draw)
+
+    def on_draw(self, event):
+        """ Captures the background after a full draw of the figure and draws the animated artists on top of it. """
+        canvas = self.figure.canvas
+        if not getattr(canvas, "supports_blit", False):
+            return
+        self.background = canvas.copy_from_bbox(self.figure.bbox)
+        self.__draw_animated__()
+
+    def add_artist(self, artist):
+        """ Marks the artist as animated, so it is drawn only by the manager. """
+        artist.set_animated(True)
+        self.artists.append(artist)
+
+    def remove_artist(self, artist):
+        """ Stops managing the artist, it is also removed from its axes if it is still in them. """
+        if artist in self.artists:
+            self.artists.remove(artist)
+        if artist.axes is not None:
+            artist.remove()
+
+    def update(self):
+        """ Redraws the animated artists. """
+        canvas = self.figure.canvas
+        if self.background is None or not getattr(canvas, "supports_blit", False):
+            # nothing rendered yet, a full draw captures the background
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self.background)
+        self.__draw_animated__()
+        canvas.blit(self.figure.bbox)
+        canvas.flush_events()
+
+    def __draw_animated__(self):
+        for artist in self.artists:
+            if artist.get_visible():
+                self.figure.draw_artist(artist)
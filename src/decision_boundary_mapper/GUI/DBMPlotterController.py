@@ -16,25 +16,24 @@ import os
 import numpy as np
 import json
 import threading
+import time
+from collections import OrderedDict
 import tensorflow as tf
+from sklearn.neighbors import KDTree
 from math import sqrt
 from datetime import datetime
 import shutil
-from sklearn.metrics import cohen_kappa_score
 from matplotlib.patches import Patch, Circle
 from matplotlib.offsetbox import OffsetImage, AnnotationBbox, TextArea
 
 from .. import Logger, LoggerInterface
-from ..DBM import DBM, SDBM 
-from ..utils import TRAIN_DATA_POINT_MARKER, TEST_DATA_POINT_MARKER, TRAIN_2D_FILE_NAME, TEST_2D_FILE_NAME, INVERSE_PROJECTION_ERRORS_FILE, PROJECTION_ERRORS_INTERPOLATED_FILE, PROJECTION_ERRORS_INVERSE_PROJECTION_FILE, get_latest_created_file_from_folder, run_timer
+from ..DBM import DBM, SDBM, PixelIndex, TrainingCancellation
+from .SnapshotStore import SnapshotStore
+from ..utils import get_classification_metrics, TRAIN_DATA_POINT_MARKER, TEST_DATA_POINT_MARKER, TRAIN_2D_FILE_NAME, TEST_2D_FILE_NAME, INVERSE_PROJECTION_ERRORS_FILE, PROJECTION_ERRORS_INTERPOLATED_FILE, PROJECTION_ERRORS_INVERSE_PROJECTION_FILE, get_latest_created_file_from_folder, run_timer
 
 CLASSIFIER_PERFORMANCE_HISTORY_FILE = "classifier_performance.log"
 CLASSIFIER_REFIT_FOLDER = "refit_classifier"
 CLASSIFIER_STACKED_FOLDER = "stacked_classifier"
-CLASSIFIER_STACKED_LABELS_FILE = "classifier_old_labels.npy"
-CLASSIFIER_STACKED_LABELS_CHANGES_FILE = "classifier_old_labels_changes.npy"
-CLASSIFIER_STACKED_BOUNDARY_MAP_FILE = "classifier_old_boundary_map.npy"
-CLASSIFIER_STACKED_CONFIDENCE_MAP_FILE = "classifier_old_boundary_map_confidence.npy"
 
 PLOT_SNAPSHOTS_FOLDER = "plot_snapshots"
 
@@ -50,6 +49,27 @@ TIMER_WARNING_INTERVAL = 30 # seconds
 EPOCHS_FOR_REFIT = 20
 EPOCHS_FOR_REFIT_RANGE = (1, 100)
 
+DECODED_PIXELS_CACHE_SIZE = 4096
+HOVER_PREFETCH_RADIUS = 2 # pixels decoded around the cursor in the same batch
+HOVER_THROTTLE_INTERVAL = 0.03 # seconds
+
+def generate_color_lut(colors_mapper):
+    """Builds a lookup table from the labels of the map to their uint8 RGB colors.
+
+    Args:
+        colors_mapper (dict): Mapper of labels to colors (RGB in [0,1]).
+
+    Returns:
+        lut (np.ndarray): The (labels, 3) uint8 lookup table.
+        offset (int): The value added to a label to get its row in the lookup table (the markers are negative labels).
+    """
+    labels = np.array(list(colors_mapper.keys()), dtype=np.int64)
+    offset = -int(labels.min())
+    lut = np.zeros((int(labels.max()) + offset + 1, 3), dtype=np.uint8)
+    for label, color in colors_mapper.items():
+        lut[int(label) + offset] = np.round(np.asarray(color[:3]) * 255)
+    return lut, offset
+
 class DBMPlotterController:
     def __init__(self,
                 logger,
@@ -118,6 +138,8 @@ class DBMPlotterController:
         
         self.inverse_projection_errors = None
         self.projection_errors = None
+        # the alpha layers of the rendered map, computed once and combined by mix_image
+        self.render_layers = {}
         self.positions_of_labels_changes = ([], [], [])
 
         self.dbm_model = dbm_model
@@ -148,11 +170,22 @@ class DBMPlotterController:
         
         # ----------------------------------------------------------------
         self.stop_timer_event = threading.Event()
+        # held by the background jobs while they use the dbm model, so the GUI thread does not use it concurrently
+        self.dbm_model_lock = threading.Lock()
+        # the versions of the classifier, labels and maps before each labels changes iteration, used by undo_changes
+        self.snapshots = SnapshotStore(capacity=USER_ALLOWED_INTERACTION_ITERATIONS,
+                                       folder=os.path.join(self.save_folder, CLASSIFIER_STACKED_FOLDER),
+                                       logger=self.console)
+        # the event connections and the artists of the annotation mapper, released by clear_annotation_mapper
+        self.annotation_mapper_connections = []
+        self.annotation_mapper_artists = []
         
         self.initialize()
         
     def initialize(self):
-        self.train_mapper, self.test_mapper = self.generate_encoded_mapping()
+        self.train_pixel_index, self.test_pixel_index = self.generate_encoded_mapping()
+        # spatial index of the encoded train data positions (row, column) for the circle selection
+        self.train_positions_tree = KDTree(self.encoded_train[:, :2])
         # --------------------- Others ------------------------------
         self.expert_updates_labels_mapper = {}
         self.motion_event_cid = None
@@ -163,6 +196,12 @@ class DBMPlotterController:
         self.current_selected_point_assigned_label = None
         self.update_labels_by_circle_select = True
         self.update_labels_circle = None
+        # the nD points decoded for the hover tooltips, least recently used first
+        self.decoded_pixels_cache = OrderedDict()
+        self.last_hover_event = (None, 0.0)
+        # the latest throttled motion event, it is shown by the hover timer when the throttle interval ends
+        self.pending_hover_event = None
+        self.hover_timer = None
     
     def clear_resources(self):
         # stop the timer if there is any
@@ -171,10 +210,6 @@ class DBMPlotterController:
         files_to_delete = [
             CLASSIFIER_PERFORMANCE_HISTORY_FILE,
             LABELS_CHANGES_FILE,
-            CLASSIFIER_STACKED_BOUNDARY_MAP_FILE,
-            CLASSIFIER_STACKED_CONFIDENCE_MAP_FILE,
-            CLASSIFIER_STACKED_LABELS_FILE,
-            CLASSIFIER_STACKED_LABELS_CHANGES_FILE
         ]
 
         for file in files_to_delete:
@@ -182,6 +217,9 @@ class DBMPlotterController:
             if os.path.exists(file):
                 os.remove(file)
 
+        self.snapshots.clear()
+        self.snapshots.flush()
+
         folders_to_delete = [
             CLASSIFIER_STACKED_FOLDER
         ]
@@ -205,11 +243,8 @@ class DBMPlotterController:
             patches: The legend patches.
         """
         img = self.img
-        color_img = np.zeros((img.shape[0], img.shape[1], 3))
-
-        for i, j in np.ndindex(img.shape):
-            color_img[i][j] = colors_mapper[img[i][j]]
-        values = np.unique(img)
+        lut, offset = generate_color_lut(colors_mapper)
+        color_img = lut[img.astype(np.int64) + offset]
 
         patches = []
         for value in colors_mapper.keys():
@@ -225,6 +260,7 @@ class DBMPlotterController:
 
         self.color_img = color_img
         self.legend = patches
+        self.render_layers = {}
 
         return color_img, patches
 
@@ -232,20 +268,12 @@ class DBMPlotterController:
         """Generates a mapping of the encoded data to the original data.
 
         Returns:
-            train_mapper (dict): Mapping of the encoded train data to the original train data.
-            test_mapper (dict): Mapping of the encoded test data to the original test data.
+            train_pixel_index (PixelIndex): Mapping of the pixels to the indices of the original train data encoded in them.
+            test_pixel_index (PixelIndex): Mapping of the pixels to the indices of the original test data encoded in them.
         """
-        train_mapper = {}
-        for k in range(len(self.encoded_train)):
-            [i, j, _] = self.encoded_train[k]
-            train_mapper[f"{int(i)} {int(j)}"] = k
-
-        test_mapper = {}
-        for k in range(len(self.encoded_test)):
-            [i, j, _] = self.encoded_test[k]
-            test_mapper[f"{int(i)} {int(j)}"] = k
-
-        return train_mapper, test_mapper
+        train_pixel_index = PixelIndex(self.encoded_train[:, :2], self.img.shape)
+        test_pixel_index = PixelIndex(self.encoded_test[:, :2], self.img.shape)
+        return train_pixel_index, test_pixel_index
     
     def get_classifier_performance_history(self):
         path = os.path.join(self.save_folder, CLASSIFIER_PERFORMANCE_HISTORY_FILE)
@@ -274,9 +302,9 @@ class DBMPlotterController:
     
         X_test = self.X_test if self.X_test_latent is None else self.X_test_latent
        
-        loss, accuracy = self.dbm_model.classifier.evaluate(X_test, self.Y_test, verbose=0)
-        Y_pred = self.dbm_model.classifier.predict(X_test, verbose=0).argmax(axis=-1)
-        kappa_score = cohen_kappa_score(self.Y_test, Y_pred)
+        # the test predictions are cached by the dbm model until the classifier is refitted
+        accuracy, loss, kappa_score = get_classification_metrics(self.dbm_model.predict_classifier(X_test), self.Y_test,
+                                                                 loss_function=self.dbm_model.compute_classifier_loss)
         self.console.log(f"Classifier Accuracy: {(100 * accuracy):.2f}%  Loss: {loss:.4f} Kappa: {kappa_score:.4f}")
 
         path = os.path.join(self.save_folder, CLASSIFIER_PERFORMANCE_HISTORY_FILE)
@@ -326,7 +354,8 @@ class DBMPlotterController:
         alphas = [alpha - ALPHA_DECAY_ON_UPDATE if alpha > ALPHA_DECAY_ON_UPDATE else ALPHA_DECAY_ON_UPDATE for alpha in alphas]
 
         for pos in expert_updates_labels_mapper:
-            k = self.train_mapper[pos]
+            # all the train data points encoded in the pixel get the new label
+            k = self.train_pixel_index.get(*map(int, pos.split(" ")))
             pos_x = np.append(pos_x, int(pos.split(" ")[1]))
             pos_y = np.append(pos_y, int(pos.split(" ")[0]))
             alphas = np.append(alphas, 1)
@@ -347,14 +376,32 @@ class DBMPlotterController:
             json.dump(label_changes, f, indent=2)
 
     def compute_inverse_projection_errors(self):
+        """Computes the inverse projection errors, it can run on a worker thread since it does not change the state used by the GUI.
+
+        Returns:
+            np.ndarray: The inverse projection errors, to be passed to set_inverse_projection_errors on the main thread.
+        """
         possible_path = os.path.join(self.save_folder, INVERSE_PROJECTION_ERRORS_FILE)
         # try to get projection errors from cache first
         if os.path.exists(possible_path):
-            self.inverse_projection_errors = np.load(possible_path)
-        else:
-            self.inverse_projection_errors = self.dbm_model.generate_inverse_projection_errors(save_folder=self.save_folder, resolution=len(self.img))
+            return np.load(possible_path)
+        with self.dbm_model_lock:
+            return self.dbm_model.generate_inverse_projection_errors(save_folder=self.save_folder, resolution=len(self.img))
+
+    def set_inverse_projection_errors(self, inverse_projection_errors):
+        """Shows the computed inverse projection errors, it must run on the main thread."""
+        self.inverse_projection_errors = inverse_projection_errors
+        self.render_layers.pop("inverse_projection_errors", None)
             
     def compute_projection_errors(self, type = "non_interpolated"):
+        """Computes the projection errors, it can run on a worker thread since it does not change the state used by the GUI.
+
+        Args:
+            type (str, optional): "interpolated" or "non_interpolated". Defaults to "non_interpolated".
+
+        Returns:
+            np.ndarray: The projection errors, to be passed to set_projection_errors on the main thread.
+        """
         if type == "interpolated":
             use_interpolation = True
             file = PROJECTION_ERRORS_INTERPOLATED_FILE
@@ -366,51 +413,25 @@ class DBMPlotterController:
 
         # try to get projection errors from cache first
         if os.path.exists(possible_path):
-            self.projection_errors = np.load(possible_path)
-        else:
-            self.projection_errors = self.dbm_model.generate_projection_errors(use_interpolation=use_interpolation, save_folder=self.save_folder)
-
-    def undo_changes(self):
-        if not os.path.exists(os.path.join(self.save_folder, CLASSIFIER_STACKED_FOLDER)):
-            raise Exception("Can not undo changes, no previous model found")
-
-        if not os.path.exists(os.path.join(self.save_folder, CLASSIFIER_STACKED_LABELS_FILE)):
-            raise Exception("Can not undo changes, no previous labels found")
+            return np.load(possible_path)
+        with self.dbm_model_lock:
+            return self.dbm_model.generate_projection_errors(use_interpolation=use_interpolation, save_folder=self.save_folder)
 
-        if not os.path.exists(os.path.join(self.save_folder, CLASSIFIER_STACKED_BOUNDARY_MAP_FILE)):
-            raise Exception("Can not undo changes, no previous boundary map found")
+    def set_projection_errors(self, projection_errors):
+        """Shows the computed projection errors, it must run on the main thread."""
+        self.projection_errors = projection_errors
+        self.render_layers.pop("projection_errors", None)
 
-        if not os.path.exists(os.path.join(self.save_folder, CLASSIFIER_STACKED_CONFIDENCE_MAP_FILE)):
-            raise Exception("Can not undo changes, no previous confidence map found")
-        
-        if not os.path.exists(os.path.join(self.save_folder, CLASSIFIER_STACKED_LABELS_CHANGES_FILE)):
-            raise Exception("Can not undo changes, no previous labels changes found")
-        
-        if not os.path.exists(os.path.join(self.save_folder, CLASSIFIER_STACKED_FOLDER)):
-            raise Exception("Can not undo changes, no previous model found")
-
-        self.dbm_model.load_classifier(os.path.join(self.save_folder, CLASSIFIER_STACKED_FOLDER))
-
-        with open(os.path.join(self.save_folder, CLASSIFIER_STACKED_LABELS_FILE), "rb") as f:
-            self.Y_train = np.load(f)
-        with open(os.path.join(self.save_folder, CLASSIFIER_STACKED_BOUNDARY_MAP_FILE), "rb") as f:
-            self.img = np.load(f)
-        with open(os.path.join(self.save_folder, CLASSIFIER_STACKED_CONFIDENCE_MAP_FILE), "rb") as f:
-            self.img_confidence = np.load(f)
-        with open(os.path.join(self.save_folder, CLASSIFIER_STACKED_LABELS_CHANGES_FILE), "rb") as f:
-            self.positions_of_labels_changes = np.load(f)
-            
-        files_to_delete = [
-            CLASSIFIER_STACKED_LABELS_FILE,
-            CLASSIFIER_STACKED_BOUNDARY_MAP_FILE,
-            CLASSIFIER_STACKED_CONFIDENCE_MAP_FILE,
-            CLASSIFIER_STACKED_LABELS_CHANGES_FILE
-        ]
-
-        for file in files_to_delete:
-            file = os.path.join(self.save_folder, file)
-            if os.path.exists(file):
-                os.remove(file)
+    def undo_changes(self):
+        if len(self.snapshots) == 0:
+            raise Exception("Can not undo changes, no previous version found")
+
+        snapshot = self.snapshots.pop()
+        self.dbm_model.set_classifier_weights(snapshot["classifier_weights"])
+        self.Y_train = snapshot["labels"]
+        self.img = snapshot["boundary_map"]
+        self.img_confidence = snapshot["confidence_map"]
+        self.positions_of_labels_changes = tuple(snapshot["labels_changes"])
                 
         # revoke the latest plot snapshot
         if not os.path.exists(os.path.join(self.save_folder, PLOT_SNAPSHOTS_FOLDER)):
@@ -428,24 +449,48 @@ class DBMPlotterController:
         except Exception as e:
             self.console.error(f"Error while revoking the latest plot snapshot: {str(e)}")
 
+    def get_render_layer(self, name):
+        """Returns an alpha layer of the rendered map, computing it only the first time it is needed.
+
+        Args:
+            name (str): One of "confidence", "inverse_projection_errors", "projection_errors".
+
+        Returns:
+            np.ndarray: The float32 alpha layer.
+        """
+        if name not in self.render_layers:
+            match name:
+                case "confidence":
+                    layer = self.img_confidence
+                case "inverse_projection_errors":
+                    layer = 1 - self.inverse_projection_errors
+                case "projection_errors":
+                    layer = 1 - self.projection_errors
+                case _:
+                    raise Exception(f"Unknown render layer {name}")
+            self.render_layers[name] = np.asarray(layer, dtype=np.float32)
+        return self.render_layers[name]
+
     def mix_image(self, show_color_map, show_confidence, show_inverse_projection_errors, show_projection_errors):
-        color_img = np.zeros((self.img.shape[0], self.img.shape[1], 3))
-        alphas = 1 + np.zeros((self.img.shape[0], self.img.shape[1]))
-        img = np.zeros((self.img.shape[0], self.img.shape[1], 4))
+        """Composes the RGBA image of the map from the cached color image and alpha layers.
+
+        Returns:
+            np.ndarray: The uint8 RGBA image.
+        """
+        img = np.zeros((self.img.shape[0], self.img.shape[1], 4), dtype=np.uint8)
 
         if show_color_map:
-            color_img = self.color_img
+            img[:, :, :3] = self.color_img
 
+        alphas = np.ones(self.img.shape, dtype=np.float32)
         if show_confidence:
-            alphas = alphas * self.img_confidence
-        if show_inverse_projection_errors:
-            alphas = alphas * (1 - self.inverse_projection_errors)
-
+            alphas *= self.get_render_layer("confidence")
+        if show_inverse_projection_errors and self.inverse_projection_errors is not None:
+            alphas *= self.get_render_layer("inverse_projection_errors")
         if show_projection_errors and self.projection_errors is not None:
-            alphas = alphas * (1 - self.projection_errors)
+            alphas *= self.get_render_layer("projection_errors")
 
-        img[:, :, :3] = color_img
-        img[:, :, 3] = alphas
+        img[:, :, 3] = np.round(alphas * 255)
         return img
     
     def get_encoded_train_data(self):
@@ -458,6 +503,12 @@ class DBMPlotterController:
         return self.positions_of_labels_changes
     
     def regenerate_boundary_map(self, Y_transformed, fast_decoding_strategy):
+        dbm_info = self.generate_boundary_map(Y_transformed, fast_decoding_strategy)
+        self.set_boundary_map(dbm_info, Y_transformed)
+
+    def generate_boundary_map(self, Y_transformed, fast_decoding_strategy):
+        """Generates the decision boundary map of the current classifier without changing the state of the controller,
+        so it can run on a worker thread while the GUI uses the current map."""
         X_train = self.X_train if self.X_train_latent is None else self.X_train_latent
         X_test = self.X_test if self.X_test_latent is None else self.X_test_latent
         
@@ -488,6 +539,9 @@ class DBMPlotterController:
                 is_data_normalized=self.helper_decoder is None
             )
         
+        return dbm_info
+
+    def set_boundary_map(self, dbm_info, Y_transformed):
         img, img_confidence, encoded_train, encoded_test = dbm_info
         
         self.img = img
@@ -497,7 +551,19 @@ class DBMPlotterController:
         self.Y_train = Y_transformed
         self.initialize()
         
-    def apply_labels_changes(self, decoding_strategy, epochs = None):
+    def apply_labels_changes(self, decoding_strategy, epochs = None, warm_start = False):
+        Y_transformed = self.prepare_labels_changes()
+        if Y_transformed is None:
+            return
+        dbm_info = self.refit_classifier_with_labels_changes(None, Y_transformed, decoding_strategy, epochs, warm_start)
+        self.finish_labels_changes(dbm_info, Y_transformed)
+
+    def prepare_labels_changes(self):
+        """Validates the labels changes and stores the current state so it can be restored, it must run on the main thread.
+
+        Returns:
+            np.ndarray | None: The transformed training labels, None if the changes can not be applied.
+        """
         if self.user_allowed_interaction_iterations <= 0:
             message = "Max number of iterations reached! Applying labels changes is not allowed anymore!"
             self.console.error(message)
@@ -509,25 +575,32 @@ class DBMPlotterController:
             message = "No changes to apply!"
             self.console.error(message)
             self.updates_logger.error(message)
-            return
+            return None
         
-        # store the changes done so far so we can restore them when needed
-        with open(os.path.join(self.save_folder, CLASSIFIER_STACKED_LABELS_CHANGES_FILE), "wb") as f:
-            np.save(f, self.positions_of_labels_changes)
-
         Y_transformed, label_changes, positions_of_labels_changes = self.transform_changes(self.Y_train, self.expert_updates_labels_mapper, self.positions_of_labels_changes)
         
-        if len(label_changes) > 0.8 * len(self.Y_train):
+        # a pixel can encode many training samples, so the changed samples are counted instead of the changed pixels
+        if np.count_nonzero(Y_transformed != self.Y_train) > 0.8 * len(self.Y_train):
             message = "The amount of changes can not be more than 80% of the training set in one iteration"
             self.console.error(message)
             self.updates_logger.error(message)
-            return
+            return None
         
         # stop the user timer
         self.stop_timer()
         
         # block the user from applying changes
         self.gui.window["-APPLY CHANGES SECTION-"].update(visible=False)
+
+        # store the current classifier, labels, maps and changes so we can restore them when needed,
+        # the snapshot is kept in memory and written to the disk in the background
+        self.snapshots.push({
+            "classifier_weights": self.dbm_model.get_classifier_weights(),
+            "labels": self.Y_train,
+            "boundary_map": self.img,
+            "confidence_map": self.img_confidence,
+            "labels_changes": [np.asarray(positions) for positions in self.positions_of_labels_changes],
+        })
         
         self.positions_of_labels_changes = positions_of_labels_changes
 
@@ -536,33 +609,48 @@ class DBMPlotterController:
 
         self.updates_logger.log("Applying changes... This might take some time...")
 
-        save_folder = os.path.join(self.save_folder, CLASSIFIER_REFIT_FOLDER)
-
-        # store the old model so we can restore it when needed
-        self.dbm_model.save_classifier(save_folder=os.path.join(self.save_folder, CLASSIFIER_STACKED_FOLDER))
-        # store the old labels so we can restore them when needed
-        with open(os.path.join(self.save_folder, CLASSIFIER_STACKED_LABELS_FILE), "wb") as f:
-            np.save(f, self.Y_train)
-
-        # store the old decision boundary map and confidence map so we can restore them when needed
-        with open(os.path.join(self.save_folder, CLASSIFIER_STACKED_BOUNDARY_MAP_FILE), "wb") as f:
-            np.save(f, self.img)
-        with open(os.path.join(self.save_folder, CLASSIFIER_STACKED_CONFIDENCE_MAP_FILE), "wb") as f:
-            np.save(f, self.img_confidence)
-
         # store the plot presented when the user applies the changes
         current_time = datetime.now().strftime("%D %H:%M:%S").replace(" ", "_").replace("/", "_")
         self.gui.fig.savefig(os.path.join(self.save_folder, PLOT_SNAPSHOTS_FOLDER, f"{current_time}.png"))
+        return Y_transformed
+
+    def refit_classifier_with_labels_changes(self, job, Y_transformed, decoding_strategy, epochs = None, warm_start = False):
+        """Refits the classifier on the transformed labels and generates its decision boundary map.
+        It runs on a worker thread of the GUI job executor, so it does not touch the GUI nor the state used by it.
+
+        Args:
+            job (Job | None): The job running the refit, checked for cancellation after every batch of the refit and before the map generation.
+            Y_transformed (np.ndarray): The transformed training labels.
+            decoding_strategy (FAST_DBM_STRATEGIES): The decoding strategy of the new decision boundary map.
+            epochs (int, optional): The number of epochs of the refit. Defaults to EPOCHS_FOR_REFIT.
+            warm_start (bool, optional): Fine-tune the current classifier instead of retraining it. Defaults to False.
 
+        Returns:
+            tuple: The DBM info of the new decision boundary map.
+        """
         if epochs is None:
             epochs = EPOCHS_FOR_REFIT
         
-        self.updates_logger.log(f"The classifier will be retrained for {epochs} epochs")
+        if warm_start:
+            self.updates_logger.log(f"The classifier will be fine-tuned for at most {epochs} epochs")
+        else:
+            self.updates_logger.log(f"The classifier will be retrained for {epochs} epochs")
 
         X_train = self.X_train if self.X_train_latent is None else self.X_train_latent
-        self.dbm_model.refit_classifier(X_train, Y_transformed, save_folder=save_folder, epochs=epochs)
-        self.regenerate_boundary_map(Y_transformed, decoding_strategy)
-
+        changed_indices = np.flatnonzero(Y_transformed != self.Y_train)
+        save_folder = os.path.join(self.save_folder, CLASSIFIER_REFIT_FOLDER)
+        with self.dbm_model_lock:
+            self.dbm_model.refit_classifier(X_train, Y_transformed, save_folder=save_folder, epochs=epochs,
+                                            warm_start=warm_start, changed_indices=changed_indices,
+                                            callbacks=[TrainingCancellation(job.check_cancelled)] if job is not None else None)
+            # the classifier is restored by revert_labels_changes if the job is cancelled here
+            if job is not None:
+                job.check_cancelled()
+            return self.generate_boundary_map(Y_transformed, decoding_strategy)
+
+    def finish_labels_changes(self, dbm_info, Y_transformed):
+        """Shows the decision boundary map of the refitted classifier, it must run on the main thread."""
+        self.set_boundary_map(dbm_info, Y_transformed)
         self.updates_logger.log("Changes applied successfully!")
 
         # decrease the number of user allowed interactions
@@ -587,6 +675,15 @@ class DBMPlotterController:
         self.start_timer(self.timer_ui)
         
         self.gui.window["-APPLY CHANGES SECTION-"].update(visible=True)
+
+    def revert_labels_changes(self):
+        """Restores the state stored by prepare_labels_changes after a failed or cancelled refit, it must run on the main thread."""
+        try:
+            self.undo_changes()
+        except Exception as e:
+            self.updates_logger.error("Failed to restore the previous classifier: " + str(e))
+        self.start_timer(self.timer_ui)
+        self.gui.window["-APPLY CHANGES SECTION-"].update(visible=True)
         
     def start_timer(self, ui_component):
         # create a new timer that will update the ui_component
@@ -622,10 +719,94 @@ class DBMPlotterController:
     def set_show_tooltip_for_dataset_only(self, value):
         self.show_tooltip_for_dataset_only = value
     
-    def build_annotation_mapper(self, fig, ax, connect_click_event=True):
+    def decode_pixel(self, i, j):
+        """Returns the nD point of the pixel (i, j) decoded by the inverse projection (and the helper decoder).
+        The decoded pixels are kept in an LRU cache, and a missing pixel is decoded in one batch together with its
+        uncached neighbours, so moving the cursor around mostly hits the cache.
+
+        Args:
+            i (int): The row of the pixel.
+            j (int): The column of the pixel.
+
+        Returns:
+            np.ndarray | None: The decoded nD point, None if the inverse projection is busy with a background job.
+        """
+        if (i, j) in self.decoded_pixels_cache:
+            self.decoded_pixels_cache.move_to_end((i, j))
+            return self.decoded_pixels_cache[(i, j)]
+
+        if not self.dbm_model_lock.acquire(blocking=False):
+            return None
+        try:
+            return self.__decode_pixels__(i, j)
+        finally:
+            self.dbm_model_lock.release()
+
+    def __decode_pixels__(self, i, j):
+        # decodes the pixel (i, j) together with its uncached neighbours
+        rows, columns = self.img.shape[:2]
+        pixels = [(i, j)] + [(y, x)
+                             for y in range(max(0, i - HOVER_PREFETCH_RADIUS), min(rows, i + HOVER_PREFETCH_RADIUS + 1))
+                             for x in range(max(0, j - HOVER_PREFETCH_RADIUS), min(columns, j + HOVER_PREFETCH_RADIUS + 1))
+                             if (y, x) != (i, j) and (y, x) not in self.decoded_pixels_cache]
+        space2d = np.array([(y / rows, x / columns) for (y, x) in pixels])
+
+        points = self.dbm_model.neural_network.decode(space2d)
+        if self.helper_decoder is not None:
+            points = self.helper_decoder.predict(points, verbose=0)
+
+        for pixel, point in zip(pixels, points):
+            self.decoded_pixels_cache[pixel] = point
+        while len(self.decoded_pixels_cache) > DECODED_PIXELS_CACHE_SIZE:
+            self.decoded_pixels_cache.popitem(last=False)
+        self.decoded_pixels_cache.move_to_end((i, j))
+        return points[0]
+
+    def clear_annotation_mapper(self, fig, blit_manager=None):
+        """ Disconnects the events and removes the artists of the annotation mapper, so it can be built again on the same figure. """
+        for cid in self.annotation_mapper_connections:
+            fig.canvas.mpl_disconnect(cid)
+        if self.hover_timer is not None:
+            self.hover_timer.stop()
+            self.hover_timer = None
+        self.pending_hover_event = None
+        for artist in self.annotation_mapper_artists:
+            if blit_manager is not None:
+                blit_manager.remove_artist(artist)
+            elif artist.axes is not None:
+                artist.remove()
+        self.annotation_mapper_connections = []
+        self.annotation_mapper_artists = []
+
+    def build_annotation_mapper(self, fig, ax, connect_click_event=True, blit_manager=None):
         """ Builds the annotation mapper.
             This is used to display the data point label when hovering over the decision boundary.
+            The tooltips and the selection markers are animated artists redrawn by the blit manager, if one is given.
         """
+        def connect(event_name, callback):
+            cid = fig.canvas.mpl_connect(event_name, callback)
+            self.annotation_mapper_connections.append(cid)
+            return cid
+
+        def add_animated(artist):
+            self.annotation_mapper_artists.append(artist)
+            if blit_manager is not None:
+                blit_manager.add_artist(artist)
+            return artist
+
+        def remove_animated(artist):
+            if blit_manager is not None:
+                blit_manager.remove_artist(artist)
+            elif artist.axes is not None:
+                artist.remove()
+
+        def redraw_animated():
+            # only the tooltips and the selection markers changed, the rest of the figure is restored from the background
+            if blit_manager is not None:
+                blit_manager.update()
+            else:
+                fig.canvas.draw_idle()
+
         TOOLTIP_SIZE = 100.
         zoom = TOOLTIP_SIZE / self.X_train[0].shape[0]
         zoom = zoom if isinstance(zoom, float) else 1
@@ -637,9 +818,23 @@ class DBMPlotterController:
 
         ax.add_artist(annImage)
         ax.add_artist(annLabels)
+        add_animated(annImage)
+        add_animated(annLabels)
         annImage.set_visible(False)
         annLabels.set_visible(False)
 
+        # all the expert labels updates are drawn as a single scatter collection
+        expert_updates_scatter = ax.scatter([], [], s=36, c='b', marker='^')
+        self.annotation_mapper_artists.append(expert_updates_scatter)
+
+        def draw_expert_updates():
+            positions = [tuple(map(int, pos.split(" "))) for pos in self.expert_updates_labels_mapper]
+            # the keys are "row column", the scatter takes (x, y) = (column, row)
+            offsets = np.array([(j, i) for (i, j) in positions]) if len(positions) > 0 else np.empty((0, 2))
+            expert_updates_scatter.set_offsets(offsets)
+
+        draw_expert_updates()
+
         fig_width, fig_height = fig.get_size_inches() * fig.dpi
 
         def display_annotation(event):
@@ -649,6 +844,26 @@ class DBMPlotterController:
 
             j, i = int(event.xdata), int(event.ydata)
 
+            # skip the motion events that stay on the same pixel or come faster than the tooltip can be redrawn
+            (last_pixel, last_time), now = self.last_hover_event, time.monotonic()
+            if last_pixel == (i, j):
+                self.pending_hover_event = None
+                return
+            if now - last_time < HOVER_THROTTLE_INTERVAL:
+                # the last skipped event is shown when the interval ends, so the tooltip does not stay on the pixel where the mouse stopped before
+                schedule_pending_annotation(event)
+                return
+            self.pending_hover_event = None
+
+            x_data, y_data = find_data_point(i, j)
+            if x_data is None and y_data is None and not self.show_tooltip_for_dataset_only and self.dbm_model_lock.locked():
+                # the pixel could not be decoded because a background job uses the inverse projection,
+                # so the pixel is not recorded as shown and the event is retried when the interval ends
+                self.last_hover_event = (None, now)
+                schedule_pending_annotation(event)
+            else:
+                self.last_hover_event = ((i, j), now)
+
             # change the annotation box position relative to mouse.
             ws = (event.x > fig_width/2.)*-1 + (event.x <= fig_width/2.)
             hs = (event.y > fig_height/2.)*-1 + (event.y <= fig_height/2.)
@@ -659,7 +874,6 @@ class DBMPlotterController:
             # place it at the position of the event scatter point
             annImage.xy = (j, i)
 
-            x_data, y_data = find_data_point(i, j)
             if x_data is not None:
                 annImage.set_visible(True)
                 image.set_data(x_data)
@@ -673,12 +887,28 @@ class DBMPlotterController:
             else:
                 annLabels.set_visible(False)
 
-            fig.canvas.draw_idle()
+            redraw_animated()
+
+        def schedule_pending_annotation(event):
+            """Keeps the motion event to be displayed when the throttle interval ends."""
+            self.pending_hover_event = event
+            if self.hover_timer is None:
+                self.hover_timer = fig.canvas.new_timer(interval=int(HOVER_THROTTLE_INTERVAL * 1000))
+                self.hover_timer.single_shot = True
+                self.hover_timer.add_callback(display_pending_annotation)
+                self.hover_timer.start()
+
+        def display_pending_annotation():
+            """Displays the annotation of the last motion event skipped by the throttle, unless a newer event was displayed since."""
+            self.hover_timer = None
+            event, self.pending_hover_event = self.pending_hover_event, None
+            if event is not None:
+                display_annotation(event)
 
         def find_data_point(i, j):
             # search for the data point in the encoded train data
             if self.img[i][j] == TRAIN_DATA_POINT_MARKER:
-                k = self.train_mapper[f"{i} {j}"]
+                k = self.train_pixel_index.first(i, j)
                 if f"{i} {j}" in self.expert_updates_labels_mapper:
                     l = self.expert_updates_labels_mapper[f"{i} {j}"][0]
                     return self.X_train[k], f"Label {self.Y_train[k]} \nClassifier label: {int(self.encoded_train[k][2])} \nExpert label: {l}"
@@ -686,20 +916,14 @@ class DBMPlotterController:
 
             # search for the data point in the encoded test data
             if self.img[i][j] == TEST_DATA_POINT_MARKER:
-                k = self.test_mapper[f"{i} {j}"]
+                k = self.test_pixel_index.first(i, j)
                 return self.X_test[k], f"Classifier label: {int(self.encoded_test[k][2])}"
 
             if self.show_tooltip_for_dataset_only:
                 return None, None
             
             # generate the nD data point on the fly using the inverse projection
-            if self.helper_decoder is not None:
-                point = self.helper_decoder.predict(self.dbm_model.neural_network.decode(
-                    [(i/self.img.shape[0], j/self.img.shape[1])]), verbose=0)[0]
-            else:
-                point = self.dbm_model.neural_network.decode([(i/self.img.shape[0], j/self.img.shape[1])])[0]
-            
-            return point, None
+            return self.decode_pixel(i, j), None
 
         def onclick(event):
             """ Open the data point in a new window when clicked on a pixel in training or testing set based on mouse position."""
@@ -719,15 +943,14 @@ class DBMPlotterController:
 
             # check if clicked on a data point that already was updated, then remove the update
             if f"{i} {j}" in self.expert_updates_labels_mapper:
-                (_, point) = self.expert_updates_labels_mapper[f"{i} {j}"]
-                point.remove()
                 del self.expert_updates_labels_mapper[f"{i} {j}"]
+                draw_expert_updates()
                 fig.canvas.draw_idle()
                 self.updates_logger.log(f"Removed updates for point: ({j}, {i})")
                 return
 
             # if clicked on a data point that was not updated, then add the update
-            self.current_selected_point = ax.plot(j, i, 'bo', markersize=5)[0]
+            self.current_selected_point = add_animated(ax.plot(j, i, 'bo', markersize=5)[0])
 
             # disable annotations on hover
             # if self.motion_event_cid is not None:
@@ -738,9 +961,9 @@ class DBMPlotterController:
                 self.click_event_cid = None
 
             # enable key press events
-            self.key_event_cid = fig.canvas.mpl_connect('key_press_event', onkey)
+            self.key_event_cid = connect('key_press_event', onkey)
 
-            fig.canvas.draw_idle()
+            redraw_animated()
 
         def onkey(event):
             if self.current_selected_point is None:
@@ -753,32 +976,37 @@ class DBMPlotterController:
             (x, y) = self.current_selected_point.get_data()
 
             if event.key == 'escape' or event.key == 'enter':
-                self.current_selected_point.remove()
+                remove_animated(self.current_selected_point)
+                labels_updated = False
 
                 if event.key == 'escape':
                     self.updates_logger.log("Cancelled point move...")
 
                 elif event.key == 'enter':
-                    # showing the fix of the position
-                    self.current_selected_point = ax.plot(x, y, 'b^')[0]
                     if self.current_selected_point_assigned_label is not None:
                         self.updates_logger.log(f"Assigned label: {self.current_selected_point_assigned_label} to point: ({x[0]}, {y[0]})")
-                        self.expert_updates_labels_mapper[f"{y[0]} {x[0]}"] = (self.current_selected_point_assigned_label, self.current_selected_point)
+                        self.expert_updates_labels_mapper[f"{y[0]} {x[0]}"] = (self.current_selected_point_assigned_label, None)
+                        # showing the fix of the position
+                        draw_expert_updates()
+                        labels_updated = True
 
                 self.current_selected_point = None
                 self.current_selected_point_assigned_label = None
 
-                self.motion_event_cid = fig.canvas.mpl_connect('motion_notify_event', display_annotation)
-                self.click_event_cid = fig.canvas.mpl_connect('button_press_event', onclick)
+                # the hover annotations stay connected while a point is selected
+                self.click_event_cid = connect('button_press_event', onclick)
                 fig.canvas.mpl_disconnect(self.key_event_cid)
-                fig.canvas.draw_idle()
+                if labels_updated:
+                    fig.canvas.draw_idle()
+                else:
+                    redraw_animated()
                 return
 
         def onclick_circle_strategy(event):
             self.console.log("Clicked on: " + str(event.xdata) + ", " + str(event.ydata))
             x, y = int(event.xdata), int(event.ydata)
             self.current_selected_point = (x, y)
-            self.release_event_cid = fig.canvas.mpl_connect('button_release_event', onrelease_circle_strategy)
+            self.release_event_cid = connect('button_release_event', onrelease_circle_strategy)
 
         def onrelease_circle_strategy(event):
             if event.inaxes == None:
@@ -790,10 +1018,11 @@ class DBMPlotterController:
             r = sqrt(((x1 - x0)/2)**2 + ((y1 - y0)/2)**2)   # circle radius
             self.update_labels_circle = Circle((cx, cy), r, color='black', fill=False)
             ax.add_artist(self.update_labels_circle)
-            self.key_event_cid = fig.canvas.mpl_connect('key_press_event', onkey_circle_strategy)
+            add_animated(self.update_labels_circle)
+            self.key_event_cid = connect('key_press_event', onkey_circle_strategy)
             if self.release_event_cid is not None:
                 fig.canvas.mpl_disconnect(self.release_event_cid)
-            fig.canvas.draw_idle()
+            redraw_animated()
 
         def onkey_circle_strategy(event):
             if self.update_labels_circle is None:
@@ -805,42 +1034,38 @@ class DBMPlotterController:
 
             (x, y) = self.update_labels_circle.get_center()
             r = self.update_labels_circle.get_radius()
+            labels_updated = False
             if event.key == "enter" and self.current_selected_point_assigned_label is not None:
                 self.updates_logger.log(f"Assigned label: {self.current_selected_point_assigned_label} to circle: center ({x}, {y}), radius ({r})")
                 positions = find_points_in_circle((x, y), r)
                 for pos in positions:
-                    point = ax.plot(pos[0], pos[1], 'b^')[0]
-                    self.expert_updates_labels_mapper[f"{pos[1]} {pos[0]}"] = (self.current_selected_point_assigned_label, point)
+                    self.expert_updates_labels_mapper[f"{pos[1]} {pos[0]}"] = (self.current_selected_point_assigned_label, None)
+                draw_expert_updates()
+                labels_updated = True
 
             if event.key == "backspace":
                 self.updates_logger.log(f"Removing changes in circle: center ({x},{y}), radius ({r})")
                 positions = find_points_in_circle((x, y), r)
                 for pos in positions:
-                    if f"{pos[1]} {pos[0]}" in self.expert_updates_labels_mapper:
-                        self.expert_updates_labels_mapper[f"{pos[1]} {pos[0]}"][1].remove()
-                        del self.expert_updates_labels_mapper[f"{pos[1]} {pos[0]}"]
+                    self.expert_updates_labels_mapper.pop(f"{pos[1]} {pos[0]}", None)
+                draw_expert_updates()
+                labels_updated = True
 
-            self.update_labels_circle.remove()
+            remove_animated(self.update_labels_circle)
             self.update_labels_circle = None
             fig.canvas.mpl_disconnect(self.key_event_cid)
-            fig.canvas.draw_idle()
+            if labels_updated:
+                fig.canvas.draw_idle()
+            else:
+                redraw_animated()
 
         def find_points_in_circle(circle_center, circle_radius):
+            """Returns the (x, y) pixels of the train data points inside the circle, using a radius query on the positions tree."""
             (cx, cy) = circle_center
-            initial_x, initial_y = int(cx - circle_radius), int(cy - circle_radius)
-            final_x, final_y = int(cx + circle_radius) + 1, int(cy + circle_radius) + 1
-            initial_x = 0 if initial_x < 0 else initial_x
-            initial_y = 0 if initial_y < 0 else initial_y
-            final_x = self.img.shape[0] if final_x > self.img.shape[0] else final_x
-            final_y = self.img.shape[0] if final_y > self.img.shape[0] else final_y
-
-            positions = []
-            for x in range(initial_x, final_x):
-                for y in range(initial_y, final_y):
-                    if (self.img[y, x] == TRAIN_DATA_POINT_MARKER) and ((x - cx)**2 + (y - cy)**2 <= circle_radius**2):
-                        positions.append((x, y))
-            return positions
-
-        self.motion_event_cid = fig.canvas.mpl_connect('motion_notify_event', display_annotation)
+            indices = self.train_positions_tree.query_radius([(cy, cx)], r=circle_radius)[0]
+            pixels = np.unique(self.encoded_train[indices, :2].astype(int), axis=0)
+            return [(x, y) for (y, x) in pixels]
+
+        self.motion_event_cid = connect('motion_notify_event', display_annotation)
         if connect_click_event:
-            self.click_event_cid = fig.canvas.mpl_connect('button_press_event', onclick)
+            self.click_event_cid = connect('button_press_event', onclick)
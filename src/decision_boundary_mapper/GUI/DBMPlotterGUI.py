@@ -38,8 +38,11 @@ import matplotlib
 from matplotlib import cm
 
 from .. import Logger, LoggerGUI, FAST_DBM_STRATEGIES
+from ..Logger import LOGGER_GUI_EVENT
 from ..DBM import DBM, SDBM
 from .DBMPlotterController import DBMPlotterController
+from .JobExecutor import JobExecutor, CANCEL_JOB_BUTTON_KEY
+from .BlitManager import BlitManager
 from .DBMPlotterController import EPOCHS_FOR_REFIT, EPOCHS_FOR_REFIT_RANGE, USER_ALLOWED_INTERACTION_ITERATIONS
 from ..utils import TRAIN_DATA_POINT_MARKER, TEST_DATA_POINT_MARKER, BLACK_COLOR, WHITE_COLOR, RED_COLOR, GREEN_COLOR, YELLOW_COLOR, RIGHTS_MESSAGE_1, RIGHTS_MESSAGE_2, APP_PRIMARY_COLOR, APP_FONT
 
@@ -92,6 +95,9 @@ TITLE = "Decision Boundary Map & Errors"
 WINDOW_SIZE = (1650, 1000)
 INFORMATION_CONTROLS_MESSAGE = "To change label(s) of a data point(s) first click on the start usage button.\nThen click on the data point, or select the data point by including them into a circle.\nPress any digit key to indicate the new label. Press 'Enter' to confirm the new label. \nPress 'Esc' to cancel the action. To remove a change just click on the data point.\nPress 'Apply Changes' to update the model."
 DBM_WINDOW_ICON_PATH = os.path.join(os.path.dirname(__file__), "assets", "dbm_plotter_icon_b64.txt")
+INVERSE_PROJECTION_ERRORS_JOB_NAME = "Inverse projection errors computation"
+PROJECTION_ERRORS_JOB_NAME = "Projection errors computation"
+APPLY_CHANGES_JOB_NAME = "Labels changes application"
 
 class DBMPlotterGUI:
     
@@ -189,10 +195,16 @@ class DBMPlotterGUI:
     def initialize_plots(self, connect_click_event = True):
         self.color_img, self.legend = self.controller.build_2D_image(colors_mapper=self.colors_mapper, class_name_mapper=self.class_name_mapper)
         # --------------------- Plotter related ---------------------
-        self.classifier_performance_fig, self.classifier_performance_ax = self._build_plot_()
-        self.fig, self.ax = self._build_plot_()
-        self.controller.build_annotation_mapper(self.fig, self.ax, connect_click_event)
-        self.fig.legend(handles=self.legend, borderaxespad=0.)
+        # the figure is built once, so its canvas is not rebuilt when the state of the plot changes
+        if not hasattr(self, "fig"):
+            self.classifier_performance_fig, self.classifier_performance_ax = self._build_plot_()
+            self.fig, self.ax = self._build_plot_()
+            self.blit_manager = BlitManager(self.fig)
+        else:
+            self.controller.clear_annotation_mapper(self.fig, self.blit_manager)
+            self.fig_legend.remove()
+        self.controller.build_annotation_mapper(self.fig, self.ax, connect_click_event, blit_manager=self.blit_manager)
+        self.fig_legend = self.fig.legend(handles=self.legend, borderaxespad=0.)
 
     def _initialize_gui_(self):
         # --------------------- GUI related ---------------------
@@ -205,7 +217,10 @@ class DBMPlotterGUI:
 
         self.draw_dbm_img()
         # --------------------- GUI related ---------------------
-        self.updates_logger = LoggerGUI(name="Updates logger", output=self.window["-LOGGER-"], update_callback=self.window.refresh)
+        self.updates_logger = LoggerGUI(name="Updates logger", output=self.window["-LOGGER-"], update_callback=self.window.refresh, window=self.window)
+        self.job_executor = JobExecutor(self.window, self.updates_logger)
+        # the latest values of the window, the callbacks of the jobs use them instead of the values at submission time
+        self.last_values = None
         self.controller.set_dbm_model_logger(self.updates_logger)
         self.controller.set_updates_logger(self.updates_logger)
 
@@ -292,6 +307,10 @@ class DBMPlotterGUI:
                                tooltip="Select the number of epochs for which \nthe classifier will be retrained.",
                                key="-DBM RELABELING CLASSIFIER EPOCHS-")
                     ],
+                    [
+                        sg.Checkbox("Fine-tune the current classifier (faster)", default=False, key="-DBM RELABELING WARM START-", enable_events=False, font=APP_FONT, expand_x=True, pad=(0, 0),
+                                    tooltip="Keep the current classifier weights and fine-tune them, \nstopping as soon as the changed labels are learned."),
+                    ],
                     [
                         sg.HSeparator()
                     ],
@@ -344,6 +363,7 @@ class DBMPlotterGUI:
                                 shrink=True, expand_x=True, expand_y=True)],
                         ], pad=(0, 0), expand_x=True),
                     ],
+                    [sg.pin(sg.Button("Cancel the running computation", font=APP_FONT, expand_x=True, key=CANCEL_JOB_BUTTON_KEY, visible=False, button_color=(WHITE_COLOR, APP_PRIMARY_COLOR)), shrink=True, expand_x=True)],
                     [sg.Multiline("", key="-LOGGER-", size=(40, 20),
                                           font=APP_FONT,
                                           background_color=WHITE_COLOR,
@@ -394,6 +414,7 @@ class DBMPlotterGUI:
         self.stop()
 
     def stop(self):
+        self.job_executor.cancel()
         if self.main_gui is not None and hasattr(self.main_gui, "handle_changes_in_dbm_plotter"):
             self.main_gui.handle_changes_in_dbm_plotter()
         self.console.log("Closing the application...")
@@ -403,7 +424,13 @@ class DBMPlotterGUI:
         self.window.close()
 
     def handle_event(self, event, values):
+        if values is not None:
+            self.last_values = values
+        if self.job_executor.handle_event(event, values):
+            return
+
         EVENTS = {
+            LOGGER_GUI_EVENT: self.updates_logger.handle_event,
             "-COMPUTE PROJECTION ERRORS INTERPOLATION-": self.handle_compute_projection_errors_event,
             "-COMPUTE PROJECTION ERRORS INVERSE PROJECTION-": self.handle_compute_projection_errors_event,
             "-COMPUTE INVERSE PROJECTION ERRORS-": self.handle_compute_inverse_projection_errors_event,
@@ -429,8 +456,8 @@ class DBMPlotterGUI:
         self.controller.set_show_tooltip_for_dataset_only(not value["-SHOW TOOLTIP OUTSIDE DATASET-"])
 
     def handle_decoding_strategy_change_event(self, event, values):
-        self.fig_agg = draw_figure_to_canvas(self.canvas, self.fig, self.canvas_controls)
-        self.window.refresh()
+        # the strategy is used by the next labels changes application, the plot does not change
+        self.updates_logger.log(f"Fast decoding strategy: {values['-DBM FAST DECODING STRATEGY-']}")
 
     def _build_plot_(self):
         fig = figure.Figure(figsize=(1, 1))
@@ -466,13 +493,14 @@ class DBMPlotterGUI:
         assert(len(img_confidence.shape) == 2)
         assert(color_img.shape[:2] == img_confidence.shape[:2])
         
-        mixed_img = np.zeros((img_confidence.shape[0], img_confidence.shape[1], 4))
-        mixed_img[:, :, :3] = color_img
-        mixed_img[:, :, 3] = img_confidence
-        self.axes_image = self.ax.imshow(mixed_img)
+        mixed_img = self.controller.mix_image(show_color_map=True, show_confidence=True, show_inverse_projection_errors=False, show_projection_errors=False)
+        # the image artist is created once and then only its data is updated
+        if hasattr(self, "axes_image"):
+            self.axes_image.set_data(mixed_img)
+        else:
+            self.axes_image = self.ax.imshow(mixed_img)
 
-        # draw the figure to the canvas
-        self.fig_agg = draw_figure_to_canvas(self.canvas, self.fig, self.canvas_controls)
+        self.fig.canvas.draw_idle()
        
     def compute_classifier_metrics(self):
         accuracy, loss, kappa_score = self.controller.compute_classifier_metrics()
@@ -488,15 +516,24 @@ class DBMPlotterGUI:
         self.update_classifier_performance_canvas()
 
     def handle_compute_inverse_projection_errors_event(self, event, values):
+        # the errors are computed on a worker thread, the dbm model is shared so only one computation runs at a time
+        submitted = self.job_executor.submit(INVERSE_PROJECTION_ERRORS_JOB_NAME, lambda job: self.controller.compute_inverse_projection_errors(),
+                                             on_done=self.handle_inverse_projection_errors_computed,
+                                             on_error=lambda _: self.window['-COMPUTE INVERSE PROJECTION ERRORS-'].update(disabled=False),
+                                             exclusive=True)
+        if not submitted:
+            return
         self.updates_logger.log("Computing inverse projection errors, please wait...")
 
+        self.window['-COMPUTE INVERSE PROJECTION ERRORS-'].update(disabled=True)
+
+    def handle_inverse_projection_errors_computed(self, inverse_projection_errors):
+        # the errors are assigned on the main thread, so a redraw never sees them half updated
+        self.controller.set_inverse_projection_errors(inverse_projection_errors)
         self.window['-COMPUTE INVERSE PROJECTION ERRORS-'].hide_row()
         self.window['-PROJECTION ERRORS SECTION-'].update(visible=False)
 
-        self.controller.compute_inverse_projection_errors()
-        
-        # redraw the figure to the canvas because the layout has changed, otherwise the axes of the figure will not work properly
-        self.fig_agg = draw_figure_to_canvas(self.canvas, self.fig, self.canvas_controls)
+        self.__redraw_dbm_canvas__()
 
         self.window['-SHOW INVERSE PROJECTION ERRORS-'].update(visible=True)
         if self.controller.projection_errors is None:
@@ -505,19 +542,29 @@ class DBMPlotterGUI:
         self.updates_logger.log("Inverse projection errors computed!")
 
     def handle_compute_projection_errors_event(self, event, values):
+        error_type = "interpolated" if event == "-COMPUTE PROJECTION ERRORS INTERPOLATION-" else "non_interpolated"
+        submitted = self.job_executor.submit(PROJECTION_ERRORS_JOB_NAME, lambda job: self.controller.compute_projection_errors(type=error_type),
+                                             on_done=self.handle_projection_errors_computed,
+                                             on_error=lambda _: self.__enable_projection_errors_buttons__(),
+                                             exclusive=True)
+        if not submitted:
+            return
         self.updates_logger.log("Computing projection errors, please wait...")
 
+        self.window['-COMPUTE PROJECTION ERRORS INTERPOLATION-'].update(disabled=True)
+        self.window['-COMPUTE PROJECTION ERRORS INVERSE PROJECTION-'].update(disabled=True)
+
+    def __enable_projection_errors_buttons__(self):
+        self.window['-COMPUTE PROJECTION ERRORS INTERPOLATION-'].update(disabled=False)
+        self.window['-COMPUTE PROJECTION ERRORS INVERSE PROJECTION-'].update(disabled=False)
+
+    def handle_projection_errors_computed(self, projection_errors):
+        self.controller.set_projection_errors(projection_errors)
         self.window['-COMPUTE PROJECTION ERRORS INTERPOLATION-'].hide_row()
         self.window['-COMPUTE PROJECTION ERRORS INVERSE PROJECTION-'].hide_row()
         self.window['-PROJECTION ERRORS SECTION-'].update(visible=False)
-        
-        if event == "-COMPUTE PROJECTION ERRORS INTERPOLATION-":
-            self.controller.compute_projection_errors(type="interpolated")    
-        elif event == "-COMPUTE PROJECTION ERRORS INVERSE PROJECTION-":
-            self.controller.compute_projection_errors(type="non_interpolated")    
-       
-        # redraw the figure to the canvas because the layout has changed, otherwise the axes of the figure will not work properly
-        self.fig_agg = draw_figure_to_canvas(self.canvas, self.fig, self.canvas_controls)
+
+        self.__redraw_dbm_canvas__()
 
         self.window['-SHOW PROJECTION ERRORS-'].update(visible=True)
         if self.controller.inverse_projection_errors is None:
@@ -528,14 +575,14 @@ class DBMPlotterGUI:
     def handle_checkbox_change_event(self, event, values):
         img = self.controller.mix_image(values["-SHOW DBM COLOR MAP-"], values["-SHOW DBM CONFIDENCE-"], values["-SHOW INVERSE PROJECTION ERRORS-"], values["-SHOW PROJECTION ERRORS-"])
 
-        if hasattr(self, "axes_image"):
-            self.axes_image.remove()
-
-        if hasattr(self, "axes_labels_scatters") and self.axes_labels_scatter is not None:
+        if hasattr(self, "axes_labels_scatter") and self.axes_labels_scatter is not None:
             self.axes_labels_scatter.remove()
             self.axes_labels_scatter = None
 
-        self.axes_image = self.ax.imshow(img)
+        if hasattr(self, "axes_image"):
+            self.axes_image.set_data(img)
+        else:
+            self.axes_image = self.ax.imshow(img)
 
         # allow only one of 2 options either show the data labels or the classifier predictions
         show_data_labels, show_classifier_predictions = values["-SHOW DATA LABELS-"], values["-SHOW CLASSIFIER PREDICTIONS-"]
@@ -566,16 +613,38 @@ class DBMPlotterGUI:
         self.update_labels_by_circle_select = values["-CIRCLE SELECTING LABELS-"]
 
     def handle_apply_changes_event(self, event, values):
-        self.controller.apply_labels_changes(decoding_strategy=FAST_DBM_STRATEGIES(values["-DBM FAST DECODING STRATEGY-"]), epochs=int(values["-DBM RELABELING CLASSIFIER EPOCHS-"]))
+        if self.job_executor.is_running():
+            self.updates_logger.warn("Wait for the running computation to finish before applying the changes")
+            return
+
+        Y_transformed = self.controller.prepare_labels_changes()
+        if Y_transformed is None:
+            return
+
+        # the classifier is refitted and the map regenerated on a worker thread, the current map stays usable meanwhile
+        self.job_executor.submit(APPLY_CHANGES_JOB_NAME, self.controller.refit_classifier_with_labels_changes,
+                                 Y_transformed,
+                                 FAST_DBM_STRATEGIES(values["-DBM FAST DECODING STRATEGY-"]),
+                                 int(values["-DBM RELABELING CLASSIFIER EPOCHS-"]),
+                                 values["-DBM RELABELING WARM START-"],
+                                 on_done=lambda dbm_info: self.handle_labels_changes_applied(dbm_info, Y_transformed, event),
+                                 on_error=lambda _: self.controller.revert_labels_changes(),
+                                 on_cancel=self.controller.revert_labels_changes)
+
+    def handle_labels_changes_applied(self, dbm_info, Y_transformed, event):
+        self.controller.finish_labels_changes(dbm_info, Y_transformed)
         self.initialize_plots()
         self.compute_classifier_metrics()
-        self.handle_checkbox_change_event(event, values)
-        self.fig_agg = draw_figure_to_canvas(self.canvas, self.fig, self.canvas_controls)
+        # the checkboxes may have been toggled while the classifier was refitted
+        self.handle_checkbox_change_event(event, self.last_values)
        
         if self.main_gui is not None and hasattr(self.main_gui, "handle_changes_in_dbm_plotter"):
             self.main_gui.handle_changes_in_dbm_plotter()
 
     def handle_undo_changes_event(self, event, values):
+        if self.job_executor.is_running():
+            self.updates_logger.warn("Wait for the running computation to finish before undoing the changes")
+            return
         self.controller.stop_timer()
         try:
             self.controller.undo_changes()
@@ -588,7 +657,6 @@ class DBMPlotterGUI:
             
         self.initialize_plots()
         self.handle_checkbox_change_event(event, values)
-        self.fig_agg = draw_figure_to_canvas(self.canvas, self.fig, self.canvas_controls)
         # start a timer
         self.controller.start_timer(self.window["-APPLY CHANGES TIMER TEXT-"])
 
@@ -629,7 +697,7 @@ class DBMPlotterGUI:
         # allow user to interact with the dbm plot by clicking
         self.initialize_plots()
         self.handle_checkbox_change_event(event, values)
-        self.fig_agg = draw_figure_to_canvas(self.canvas, self.fig, self.canvas_controls)
+        self.__redraw_dbm_canvas__()
         
         # start a timer
         self.controller.start_timer(self.window["-APPLY CHANGES TIMER TEXT-"])
@@ -651,7 +719,13 @@ class DBMPlotterGUI:
         # disable user to interact with the dbm plot by clicking
         self.initialize_plots(connect_click_event=False)
         self.handle_checkbox_change_event(event, values)
-        self.fig_agg = draw_figure_to_canvas(self.canvas, self.fig, self.canvas_controls)
+        self.__redraw_dbm_canvas__()
+
+    def __redraw_dbm_canvas__(self):
+        # the layout may have changed, the Tk widget of the figure is placed with a relative size so processing the pending
+        # layout events resizes it (and redraws the figure), the widget is never rebuilt so the blit background stays valid
+        self.window.refresh()
+        self.fig.canvas.draw_idle()
 
     def update_classifier_performance_canvas(self):
         times, accuracies, _, _ = self.controller.get_classifier_performance_history()
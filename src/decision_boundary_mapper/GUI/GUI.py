@@ -18,7 +18,8 @@ import PySimpleGUI as sg
 import numpy as np
 from PIL import Image, ImageTk
 
-from ..Logger import Logger, LoggerGUI
+from ..Logger import Logger, LoggerGUI, LOGGER_GUI_EVENT
+from .JobExecutor import JobExecutor, CANCEL_JOB_BUTTON_KEY
 from .GUIController import DBM_TECHNIQUES, PROJECTION_TECHNIQUES, DBM_NNINV_TECHNIQUE, CUSTOM_PROJECTION_TECHNIQUE, GUIController
 from ..utils import BLACK_COLOR, WHITE_COLOR, RIGHTS_MESSAGE_1, RIGHTS_MESSAGE_2, APP_PRIMARY_COLOR, APP_FONT, APP_FONT_BOLD
 from .utils import Collapsible
@@ -27,11 +28,27 @@ sg.theme('DarkBlue1')
 TITLE = "Visualization tool configuration window"
 WINDOW_SIZE = (1200, 750)
 APP_ICON_PATH = os.path.join(os.path.dirname(__file__), "assets", "main_icon_b64.txt")
+DBM_JOB_NAME = "Decision boundary map generation"
+# the events that replace the data, the classifier or the feature extractor used by the decision boundary map generation
+DATA_LOADING_EVENTS = [
+    "-UPLOAD 2D TRAIN DATA BTN-",
+    "-UPLOAD 2D TEST DATA BTN-",
+    "-UPLOAD TRAIN DATA BTN-",
+    "-UPLOAD TEST DATA BTN-",
+    "-UPLOAD MNIST DATA BTN-",
+    "-UPLOAD FASHION MNIST DATA BTN-",
+    "-UPLOAD CIFAR10 DATA BTN-",
+    "-UPLOAD FOLDER DATASET BTN-",
+    "-UPLOAD CLASSIFIER-",
+    "-UPLOAD FEATURE EXTRACTOR ENCODER-",
+    "-UPLOAD FEATURE EXTRACTOR DECODER-",
+]
 class GUI:
     def __init__(self):
         self.window = self.build_window()
-        self.gui_logger = LoggerGUI(name="DBM logger", output=self.window["-LOGGER-"], update_callback=self.window.refresh)
+        self.gui_logger = LoggerGUI(name="DBM logger", output=self.window["-LOGGER-"], update_callback=self.window.refresh, window=self.window)
         self.logger = Logger(name="GUI")
+        self.job_executor = JobExecutor(self.window, self.gui_logger)
         self.controller = GUIController(self.window, self, self.gui_logger)
 
         # --------------- DBM ---------------
@@ -64,6 +81,7 @@ class GUI:
         self.stop()
 
     def stop(self):
+        self.job_executor.cancel()
         self.controller.stop()
         self.logger.log("Closing the application...")
         self.window.close()
@@ -311,6 +329,7 @@ class GUI:
             [
                 sg.pin(sg.Column([
                       [sg.Text("Loading... ", font=APP_FONT, expand_x=True, justification='center')],
+                      [sg.Button("Cancel", font=APP_FONT, button_color=(WHITE_COLOR, APP_PRIMARY_COLOR), expand_x=True, visible=False, key=CANCEL_JOB_BUTTON_KEY)],
                     ], key="-DBM IMAGE LOADING-", visible=False, expand_x=True, expand_y=False), 
                     shrink=True, expand_x=True),
             ],
@@ -347,7 +366,17 @@ class GUI:
         self.window.refresh()
 
     def handle_event(self, event, values):
+        if self.job_executor.handle_event(event, values):
+            return
+
+        # the generation reads the loaded data when it finishes, so it must not be replaced meanwhile
+        if event in DATA_LOADING_EVENTS and self.job_executor.is_running(DBM_JOB_NAME):
+            self.gui_logger.warn("A decision boundary map is being generated, wait for it to finish or cancel it before loading other data")
+            return
+
         EVENTS = {
+            LOGGER_GUI_EVENT: self.gui_logger.handle_event,
+
             "-DATA FOLDER-": self.handle_select_data_folder_event,
             "-DATA 2D FOLDER-": self.handle_select_2d_data_folder_event,
             "-CLASSIFIER FOLDER-": self.handle_select_classifier_folder_event,
@@ -444,7 +473,7 @@ class GUI:
     def handle_changes_in_dbm_plotter(self):
         # ---------------------------------
         # update the dbm image
-        img = Image.fromarray(np.uint8(self.dbm_plotter_gui.color_img*255))
+        img = Image.fromarray(self.dbm_plotter_gui.color_img)
         WINDOW_IMAGE_RESOLUTION = 256
         img.thumbnail((WINDOW_IMAGE_RESOLUTION, WINDOW_IMAGE_RESOLUTION), Image.ANTIALIAS)
         # Convert im to ImageTk.PhotoImage after window finalized
@@ -477,19 +506,41 @@ class GUI:
         plt.show()
 
     def handle_get_decision_boundary_mapping_event(self, event, values):
+        if not self.controller.can_generate_decision_boundary_map():
+            return
+
+        # the map is generated on a worker thread, so the window stays responsive
+        submitted = self.job_executor.submit(DBM_JOB_NAME, self.controller.generate_decision_boundary_map, values,
+                                             on_done=lambda dbm_result: self.handle_dbm_generated(dbm_result, values),
+                                             on_error=lambda e: self.handle_dbm_generation_stopped(),
+                                             on_cancel=self.handle_dbm_generation_stopped)
+        if not submitted:
+            return
+
+        # update loading state
+        self.switch_visibility(["-DBM IMAGE-"], False)
+        self.switch_visibility(["-DBM TEXT-", "-DBM IMAGE LOADING-"], True)
+
+    def handle_dbm_generated(self, dbm_result, values):
         try:
-            self.dbm_plotter_gui = self.controller.handle_get_decision_boundary_mapping_event(event, values)
+            self.dbm_plotter_gui = self.controller.create_dbm_plotter_gui(dbm_result, values)
             self.handle_changes_in_dbm_plotter()
         except Exception as e:
             self.gui_logger.error(e)
-            # update loading state
-            self.switch_visibility(["-DBM TEXT-", "-DBM IMAGE LOADING-","-DBM IMAGE-"], False)
+            self.handle_dbm_generation_stopped()
+
+    def handle_dbm_generation_stopped(self):
+        # update loading state
+        self.switch_visibility(["-DBM TEXT-", "-DBM IMAGE LOADING-","-DBM IMAGE-"], False)
      
     def handle_dbm_image_event(self, event, values):
         self.logger.log("Clicked on the dbm image")
         if self.dbm_plotter_gui is None:
             self.logger.warn("Nothing to show")
             return
+        if self.job_executor.is_running(DBM_JOB_NAME):
+            self.gui_logger.warn("A new decision boundary map is being generated, please wait...")
+            return
         self.dbm_plotter_gui.start()
 
     def set_data_shape(self, data_shape: tuple):
@@ -19,7 +19,7 @@ import tensorflow as tf
 import numpy as np
 
 from .DBMPlotterGUI import DBMPlotterGUI
-from ..DBM import SDBM, DBM, NNArchitecture
+from ..DBM import SDBM, DBM, NNArchitecture, TrainingCancellation
 from ..Logger import Logger
 from ..utils import import_dataset, import_mnist_dataset, import_cifar10_dataset, import_fashion_mnist_dataset, import_folder_dataset, generate_class_name_mapper, TRAIN_2D_FILE_NAME, TEST_2D_FILE_NAME
 
@@ -288,34 +288,47 @@ class GUIController:
                 X_test_2d = np.load(f)
         return X_train_2d, X_test_2d
 
-    def handle_get_decision_boundary_mapping_event(self, event, values):
+    def can_generate_decision_boundary_map(self):
         if self.classifier is None:
             self.gui_logger.error("No classifier provided, impossible to generate the DBM...")
-            return
+            return False
 
         if self.X_train is None or self.Y_train is None or self.X_test is None or self.Y_test is None:
             self.gui_logger.error("Data is incomplete impossible to generate the DBM...")
-            return
+            return False
+
+        return True
+
+    def generate_decision_boundary_map(self, job, values):
+        """Generates the decision boundary map, it runs on a worker thread of the GUI job executor so it must not touch the GUI.
+
+        Args:
+            job (Job): The job running the generation, checked for cancellation between the steps and after every batch of the neural networks.
+            values (dict): The values of the GUI elements.
+
+        Returns:
+            tuple: The DBM model, the DBM info, the save folder and the projection technique.
+        """
+        # the Cancel button interrupts the feature extraction and the neural network training after the current batch
+        cancellation_callbacks = [TrainingCancellation(job.check_cancelled)]
 
         if self.helper_decoder is not None and self.helper_encoder is not None and self.X_train_features is None and self.X_test_features is None:
-            self.gui_logger.log("Extracting the features from the data using the provided feature encoder, please wait...")
-            self.X_train_features = self.helper_encoder.predict(self.X_train, verbose=0)
-            self.X_test_features = self.helper_encoder.predict(self.X_test, verbose=0)
-            self.gui_logger.log("Features extracted successfully using the feature encoder.")
+            job.report_progress("Extracting the features from the data using the provided feature encoder, please wait...")
+            X_train_features = self.helper_encoder.predict(self.X_train, verbose=0, callbacks=cancellation_callbacks)
+            X_test_features = self.helper_encoder.predict(self.X_test, verbose=0, callbacks=cancellation_callbacks)
+            self.X_train_features, self.X_test_features = X_train_features, X_test_features
+            job.report_progress("Features extracted successfully using the feature encoder.")
+            job.check_cancelled()
        
         X_train = self.X_train if self.X_train_features is None else self.X_train_features
         X_test = self.X_test if self.X_test_features is None else self.X_test_features
 
-        # update loading state
-        self.switch_visibility(["-DBM IMAGE-"], False)
-        self.switch_visibility(["-DBM TEXT-", "-DBM IMAGE LOADING-"], True)
-
         dbm = DBM_TECHNIQUES[values["-DBM TECHNIQUE-"]](classifier=self.classifier, logger=self.gui_logger)
 
         projection_technique = values["-PROJECTION TECHNIQUE-"]
         resolution = DEFAULT_DBM_RESOLUTION  # values["-DBM IMAGE RESOLUTION INPUT-"]
 
-        self.gui_logger.log(f"DBM resolution: {resolution}")
+        job.report_progress(f"DBM resolution: {resolution}")
 
         save_folder = os.path.join("tmp", self.dataset_name)
         dbm_technique = values["-DBM TECHNIQUE-"]
@@ -337,7 +350,8 @@ class GUIController:
                 X2d_test=self.X_test_2d,
                 resolution=resolution,
                 load_folder=save_folder,
-                projection=projection_technique
+                projection=projection_technique,
+                nn_extra_callbacks=cancellation_callbacks
             )
         else:
             save_folder = os.path.join(save_folder, SDBM_FOLDER_NAME)
@@ -350,8 +364,22 @@ class GUIController:
                 nn_architecture=NNArchitecture(dbm_technique),
                 resolution=resolution,
                 load_folder=save_folder,
+                nn_extra_callbacks=cancellation_callbacks
             )
 
+        # the map is discarded if the generation was cancelled while it was computed
+        job.check_cancelled()
+        return dbm, dbm_info, save_folder, projection_technique
+
+    def create_dbm_plotter_gui(self, dbm_result, values):
+        """Creates the window of the decision boundary map, it must run on the main thread.
+        The data, the classifier and the feature extractor are read from the controller, the GUI does not load others while the map is generated.
+
+        Args:
+            dbm_result (tuple): The result of generate_decision_boundary_map.
+            values (dict): The values of the GUI elements.
+        """
+        dbm, dbm_info, save_folder, projection_technique = dbm_result
         img, img_confidence, encoded_training_data, encoded_testing_data = dbm_info
         
         show_dbm_history = values["-DBM HISTORY CHECKBOX-"]
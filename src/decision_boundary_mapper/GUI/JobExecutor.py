@@ -0,0 +1,198 @@
+# Copyright 2023 Cristian Grosu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+
+from ..Logger import Logger, LoggerInterface
+
+JOB_DONE_EVENT = "-JOB DONE-"
+JOB_PROGRESS_EVENT = "-JOB PROGRESS-"
+CANCEL_JOB_BUTTON_KEY = "-CANCEL JOB BTN-"
+
+JOB_STATUS_DONE = "done"
+JOB_STATUS_ERROR = "error"
+JOB_STATUS_CANCELLED = "cancelled"
+
+
+class JobCancelledException(Exception):
+    """ Raised inside a job when it notices that it was cancelled. """
+
+
+class Job:
+    """
+    A task running on a worker thread of a JobExecutor.
+    The cancellation is cooperative: the task calls check_cancelled at the points where it can safely stop.
+    """
+
+    def __init__(self, name: str, window):
+        self.name = name
+        self.window = window
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def is_cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        """
+        Raises:
+            JobCancelledException: If the job was cancelled.
+        """
+        if self.is_cancelled():
+            raise JobCancelledException(f"{self.name} cancelled")
+
+    def report_progress(self, message: str):
+        """ Sends a progress message to the GUI event loop. """
+        post_event(self.window, JOB_PROGRESS_EVENT, (self.name, message))
+
+
+def post_event(window, event: str, value):
+    """ Posts an event to the window event loop, it is safe to call from any thread. """
+    try:
+        window.write_event_value(event, value)
+    except Exception:
+        # the window was closed while the job was running
+        pass
+
+
+class JobExecutor:
+    """
+    Runs the heavy tasks of a PySimpleGUI window on worker threads, so the window stays responsive.
+    The tasks report back through the window event queue (window.write_event_value), so the callbacks
+    of a job and the GUI updates always run on the event loop thread.
+
+    The window event loop must forward its events to handle_event.
+
+    Example:
+        >>> executor = JobExecutor(window, logger)
+        >>> executor.submit("Inverse projection errors", lambda job: compute_errors(), on_done=lambda errors: draw(errors))
+        >>> while True:
+        >>>     event, values = window.read()
+        >>>     if executor.handle_event(event, values):
+        >>>         continue
+    """
+
+    def __init__(self, window, logger: LoggerInterface | None = None, cancel_button_key: str | None = CANCEL_JOB_BUTTON_KEY):
+        """
+        Initializes the executor.
+
+        Args:
+            window (sg.Window): The window whose event loop receives the events of the jobs.
+            logger (LoggerInterface, optional): The logger for outputting the progress of the jobs. Defaults to console logging.
+            cancel_button_key (str, optional): The key of the button that cancels the running jobs, it is visible only while a job runs. Defaults to CANCEL_JOB_BUTTON_KEY.
+        """
+        self.window = window
+        self.console = logger if logger is not None else Logger(name="Job executor")
+        self.cancel_button_key = cancel_button_key
+        self.jobs = {}
+
+    def is_running(self, name: str | None = None) -> bool:
+        """ Checks if the job with the given name, or any job if no name is given, is running. """
+        if name is None:
+            return len(self.jobs) > 0
+        return name in self.jobs
+
+    def submit(self, name: str, task, *args,
+               on_done=None, on_error=None, on_cancel=None, exclusive: bool = False) -> bool:
+        """
+        Runs task(job, *args) on a worker thread.
+
+        Args:
+            name (str): The name of the job, a job is not submitted while another job with the same name is running.
+            task (function: (job: Job, *args) -> any): The task to run, it must not touch the GUI.
+            on_done (function: (result) -> None, optional): Called on the event loop thread with the result of the task.
+            on_error (function: (exception) -> None, optional): Called on the event loop thread with the exception if the task fails, the error is logged anyway.
+            on_cancel (function: () -> None, optional): Called on the event loop thread if the task stopped because it was cancelled.
+            exclusive (bool, optional): If True, the job is not submitted while any other job is running. Defaults to False.
+
+        Returns:
+            bool: True if the job was submitted.
+        """
+        if self.is_running(name) or (exclusive and self.is_running()):
+            running = name if self.is_running(name) else ", ".join(self.jobs)
+            self.console.warn(f"Cannot start {name}, wait for {running} to finish or cancel it")
+            return False
+
+        job = Job(name, self.window)
+        self.jobs[name] = (job, on_done, on_error, on_cancel)
+
+        def run():
+            try:
+                status, payload = JOB_STATUS_DONE, task(job, *args)
+            except JobCancelledException:
+                status, payload = JOB_STATUS_CANCELLED, None
+            except Exception as e:
+                status, payload = JOB_STATUS_ERROR, e
+            post_event(self.window, JOB_DONE_EVENT, (name, status, payload))
+
+        threading.Thread(target=run, name=name, daemon=True).start()
+        self.console.log(f"Started {name}...")
+        self.__update_cancel_button__()
+        return True
+
+    def cancel(self, name: str | None = None):
+        """ Asks the job with the given name, or all the jobs if no name is given, to stop. """
+        for job_name, (job, _, _, _) in self.jobs.items():
+            if (name is None or job_name == name) and not job.is_cancelled():
+                job.cancel()
+                self.console.warn(f"Cancelling {job_name}, the current step has to finish first...")
+
+    def handle_event(self, event, values) -> bool:
+        """
+        Handles the events posted by the jobs.
+
+        Returns:
+            bool: True if the event belonged to the executor.
+        """
+        if event == JOB_PROGRESS_EVENT:
+            name, message = values[event]
+            self.console.log(f"[{name}] {message}")
+            return True
+
+        if self.cancel_button_key is not None and event == self.cancel_button_key:
+            self.cancel()
+            return True
+
+        if event != JOB_DONE_EVENT:
+            return False
+
+        name, status, payload = values[event]
+        if name not in self.jobs:
+            return True
+        _, on_done, on_error, on_cancel = self.jobs.pop(name)
+        self.__update_cancel_button__()
+
+        if status == JOB_STATUS_DONE:
+            self.console.log(f"{name} finished")
+            if on_done is not None:
+                on_done(payload)
+        elif status == JOB_STATUS_CANCELLED:
+            self.console.warn(f"{name} cancelled")
+            if on_cancel is not None:
+                on_cancel()
+        else:
+            self.console.error(f"{name} failed: {payload}")
+            if on_error is not None:
+                on_error(payload)
+        return True
+
+    def __update_cancel_button__(self):
+        if self.cancel_button_key is None:
+            return
+        try:
+            self.window[self.cancel_button_key].update(visible=self.is_running())
+        except Exception:
+            pass
@@ -0,0 +1,221 @@
+# Copyright 2023 Cristian Grosu
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import queue
+import threading
+import numpy as np
+
+from ..Logger import Logger, LoggerInterface
+
+SNAPSHOT_STORE_CAPACITY = 5
+# an array that differs from its previous version in at most this fraction of its elements is stored as a delta
+SNAPSHOT_DELTA_MAX_FRACTION = 0.1
+SNAPSHOT_FILE_PREFIX = "snapshot_"
+
+
+class ArrayDelta:
+    """ An array stored as the elements that changed since its previous version. """
+
+    def __init__(self, base, indices: np.ndarray, values: np.ndarray):
+        self.base = base
+        self.indices = indices
+        self.values = values
+
+    def materialize(self) -> np.ndarray:
+        array = materialize(self.base).copy()
+        array.flat[self.indices] = self.values
+        return array
+
+
+def materialize(entry) -> np.ndarray:
+    """ Returns the full array of a stored entry. """
+    return entry.materialize() if isinstance(entry, ArrayDelta) else entry
+
+
+class SnapshotStore:
+    """
+    Keeps the last versions of a set of named arrays (e.g. the classifier weights, the labels and the maps) in memory.
+    An array equal to its previous version is stored once, an array that changed in a few elements is stored as a delta.
+    The snapshots are also persisted to disk by a background thread, so pushing a snapshot never waits for the disk.
+
+    The stored arrays must not be modified in place after they are pushed.
+
+    Example:
+        >>> store = SnapshotStore(capacity=5, folder="tmp/snapshots")
+        >>> store.push({"labels": Y, "weights": classifier.get_weights()})
+        >>> snapshot = store.pop()
+        >>> classifier.set_weights(snapshot["weights"])
+    """
+
+    def __init__(self, capacity: int = SNAPSHOT_STORE_CAPACITY, folder: str | None = None, logger: LoggerInterface | None = None):
+        """
+        Initializes the store.
+
+        Args:
+            capacity (int, optional): The number of snapshots kept, the oldest snapshot is dropped when a new one exceeds it. Defaults to SNAPSHOT_STORE_CAPACITY.
+            folder (str | None, optional): The folder where the snapshots are persisted, if None they are kept in memory only. Defaults to None.
+            logger (LoggerInterface, optional): The logger for outputting info messages. Defaults to console logging.
+        """
+        self.capacity = capacity
+        self.folder = folder
+        self.console = logger if logger is not None else Logger(name="Snapshot store")
+        # (version, {name: entry | list[entry]}), oldest first
+        self.snapshots = []
+        self.version = 0
+
+        self.write_queue = queue.Queue()
+        if self.folder is not None:
+            os.makedirs(self.folder, exist_ok=True)
+            threading.Thread(target=self.__write_snapshots__, name="Snapshot writer", daemon=True).start()
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def push(self, snapshot: dict) -> int:
+        """
+        Stores a new snapshot.
+
+        Args:
+            snapshot (dict): name -> np.ndarray or list of np.ndarray (e.g. the classifier weights)
+
+        Returns:
+            int: The version of the snapshot.
+        """
+        previous = self.snapshots[-1][1] if len(self.snapshots) > 0 else {}
+        stored = {}
+        for name, value in snapshot.items():
+            if isinstance(value, (list, tuple)):
+                previous_entries = previous.get(name, [])
+                previous_entries = previous_entries if isinstance(previous_entries, list) and len(previous_entries) == len(value) else [None] * len(value)
+                stored[name] = [self.__store_array__(array, entry) for array, entry in zip(value, previous_entries)]
+            else:
+                stored[name] = self.__store_array__(value, previous.get(name))
+
+        self.version += 1
+        self.snapshots.append((self.version, stored))
+        if len(self.snapshots) > self.capacity:
+            self.__drop_oldest__()
+
+        if self.folder is not None:
+            self.write_queue.put(("save", self.version, stored))
+        return self.version
+
+    def pop(self) -> dict:
+        """
+        Removes the latest snapshot and returns its arrays.
+
+        Raises:
+            Exception: If the store is empty.
+        """
+        if len(self.snapshots) == 0:
+            raise Exception("No snapshot to restore")
+
+        version, stored = self.snapshots.pop()
+        if self.folder is not None:
+            self.write_queue.put(("delete", version, None))
+        return self.__materialize_snapshot__(stored)
+
+    def peek(self) -> dict:
+        """
+        Returns the arrays of the latest snapshot without removing it.
+
+        Raises:
+            Exception: If the store is empty.
+        """
+        if len(self.snapshots) == 0:
+            raise Exception("No snapshot to restore")
+        return self.__materialize_snapshot__(self.snapshots[-1][1])
+
+    def clear(self):
+        """ Removes all the snapshots, also from the disk. """
+        while len(self.snapshots) > 0:
+            version, _ = self.snapshots.pop()
+            if self.folder is not None:
+                self.write_queue.put(("delete", version, None))
+
+    def flush(self):
+        """ Waits until all the pending disk writes are done. """
+        if self.folder is not None:
+            self.write_queue.join()
+
+    def __store_array__(self, array, previous_entry):
+        array = np.asarray(array)
+        if previous_entry is None:
+            return array.copy()
+
+        previous_array = materialize(previous_entry)
+        if previous_array.shape != array.shape or previous_array.dtype != array.dtype:
+            return array.copy()
+
+        changed = np.flatnonzero(previous_array != array)
+        if len(changed) == 0:
+            # unchanged arrays are stored once, shared by the successive snapshots
+            return previous_entry
+        if len(changed) <= SNAPSHOT_DELTA_MAX_FRACTION * array.size:
+            return ArrayDelta(previous_entry, changed, array.flat[changed].copy())
+        return array.copy()
+
+    def __drop_oldest__(self):
+        version, _ = self.snapshots.pop(0)
+        if self.folder is not None:
+            self.write_queue.put(("delete", version, None))
+
+        # the deltas of the new oldest snapshot are materialized, so the dropped snapshot can be released
+        _, oldest = self.snapshots[0]
+        for entry in oldest.values():
+            for old_entry in (entry if isinstance(entry, list) else [entry]):
+                if isinstance(old_entry, ArrayDelta):
+                    self.__replace_entry__(old_entry, old_entry.materialize())
+
+    def __replace_entry__(self, old_entry, new_entry):
+        # the entry may be shared with the newer snapshots or be the base of their deltas
+        def replace(entry):
+            if entry is old_entry:
+                return new_entry
+            if isinstance(entry, ArrayDelta) and entry.base is old_entry:
+                entry.base = new_entry
+            return entry
+
+        for _, stored in self.snapshots:
+            for name, entry in stored.items():
+                stored[name] = [replace(e) for e in entry] if isinstance(entry, list) else replace(entry)
+
+    def __materialize_snapshot__(self, stored: dict) -> dict:
+        return {name: [materialize(e) for e in entry] if isinstance(entry, list) else materialize(entry)
+                for name, entry in stored.items()}
+
+    def __get_snapshot_path__(self, version: int) -> str:
+        return os.path.join(self.folder, f"{SNAPSHOT_FILE_PREFIX}{version}.npz")  # type: ignore
+
+    def __write_snapshots__(self):
+        while True:
+            action, version, stored = self.write_queue.get()
+            path = self.__get_snapshot_path__(version)
+            try:
+                if action == "save":
+                    os.makedirs(self.folder, exist_ok=True)  # type: ignore
+                    arrays = {}
+                    for name, entry in stored.items():
+                        if isinstance(entry, list):
+                            arrays.update({f"{name}/{i}": materialize(e) for i, e in enumerate(entry)})
+                        else:
+                            arrays[name] = materialize(entry)
+                    np.savez(path, **arrays)
+                elif os.path.exists(path):
+                    os.remove(path)
+            except Exception as e:
+                self.console.error(f"Failed to {action} the snapshot {version}: {e}")
+            finally:
+                self.write_queue.task_done()
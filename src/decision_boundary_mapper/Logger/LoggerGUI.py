@@ -12,17 +12,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import threading
 from datetime import datetime
 from termcolor import colored
 
 from .LoggerInterface import LoggerInterface
 
+LOGGER_GUI_EVENT = "-LOGGER GUI MESSAGE-"
+
 
 class LoggerGUI(LoggerInterface):
     """ Logs the messages to the GUI.
     """
 
-    def __init__(self, name: str = "Logger", active: bool = True, output=None, update_callback=lambda: "", info_color: str = "magenta", show_init: bool = True):
+    def __init__(self, name: str = "Logger", active: bool = True, output=None, update_callback=lambda: "", info_color: str = "magenta", show_init: bool = True, window=None):
         """ Initialize the logger
 
         Args:
@@ -30,12 +33,15 @@ class LoggerGUI(LoggerInterface):
             active (bool, optional): Defaults to True.
             output (any, optional): The GUI reference where the logger should display messages. Defaults to None.
             update_callback (python function, optional): The function that is called to update the GUI. Defaults to lambda x:x.
+            window (sg.Window, optional): The window of the output. If provided, the messages logged from other threads are sent
+                through the window event queue (LOGGER_GUI_EVENT), since the GUI can only be updated from the main thread. Defaults to None.
         """
         super().__init__()
 
         self.active = active
         self.name = name
         self.info_color = info_color
+        self.window = window
 
         if output is not None:
             self.output = output
@@ -53,9 +59,18 @@ class LoggerGUI(LoggerInterface):
             self.print(f"[INFO] [{time}] {sep}", self.info_color)
 
     def print(self, message: str, color: str = 'magenta'):
-        if self.active:
-            self.output.print(message, text_color=color)
-            self.update_callback()
+        if not self.active:
+            return
+        if self.window is not None and threading.current_thread() is not threading.main_thread():
+            self.window.write_event_value(LOGGER_GUI_EVENT, (message, color))
+            return
+        self.output.print(message, text_color=color)
+        self.update_callback()
+
+    def handle_event(self, event, values):
+        """ Prints a message sent from another thread, it must be called by the event loop of the window on LOGGER_GUI_EVENT. """
+        message, color = values[event]
+        self.print(message, color)
 
     def log(self, message: str):
         time = datetime.now().strftime("%H:%M:%S")
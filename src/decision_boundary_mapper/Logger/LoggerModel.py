@@ -12,24 +12,30 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import time
 from datetime import datetime
 from termcolor import colored
 from tensorflow.keras.callbacks import Callback
 
 
 class LoggerModel(Callback):
-    def __init__(self, active: bool = True, name: str = "Neural Network", info_color: str = "magenta", show_init: bool = True, epochs: int = 100, print_fn=None):
+    def __init__(self, active: bool = True, name: str = "Neural Network", info_color: str = "magenta", show_init: bool = True, epochs: int = 100, print_fn=None, samples: int | None = None):
         """ Initialize the logger
 
         Args:
             active (bool, optional): Defaults to True.
             name (str, optional): Defaults to "Logger".
+            samples (int, optional): The number of training samples of an epoch, if given the training throughput (samples/s) is logged. Defaults to None.
         """
         self.active = active
         self.name = name
         self.info_color = info_color
         self.epochs = epochs
         self.print_fn = print_fn
+        self.samples = samples
+        self.epoch_start_time = 0.0
+        self.epoch_train_time = None
+        self.throughputs = []
         if show_init:
             sep = "=" * 30
             time = datetime.now().strftime("%H:%M:%S")
@@ -37,9 +43,33 @@ class LoggerModel(Callback):
             print(colored(f"[INFO] [{time}] [{self.name}] {self.name} initialized", self.info_color))
             print(colored(f"[INFO] [{time}] [{self.name}] {sep}", self.info_color))
 
+    def on_train_begin(self, logs=None):
+        self.throughputs = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.epoch_start_time = time.perf_counter()
+        self.epoch_train_time = None
+
+    def on_test_begin(self, logs=None):
+        # the validation runs at the end of the epoch, so the training throughput does not include it
+        if self.epoch_train_time is None:
+            self.epoch_train_time = time.perf_counter() - self.epoch_start_time
+
     def on_epoch_end(self, epoch, logs={}):
+        if self.samples is not None:
+            train_time = self.epoch_train_time if self.epoch_train_time is not None else time.perf_counter() - self.epoch_start_time
+            self.throughputs.append(self.samples / max(train_time, 1e-9))
         if self.active:
             logs = ", ".join([f"{key}: {value:.4f}" for key, value in logs.items()])
+            if self.samples is not None:
+                logs += f", throughput: {self.throughputs[-1]:.0f} samples/s"
             print(colored(f"[INFO] [{self.name}] [Epoch {epoch}/{self.epochs}] {logs}", self.info_color))
             if self.print_fn is not None:
                 self.print_fn(f"[Epoch {epoch}/{self.epochs}] {logs}")
+
+    def on_train_end(self, logs=None):
+        if self.active and len(self.throughputs) > 0:
+            message = f"Mean training throughput: {sum(self.throughputs) / len(self.throughputs):.0f} samples/s over {len(self.throughputs)} epochs"
+            print(colored(f"[INFO] [{self.name}] {message}", self.info_color))
+            if self.print_fn is not None:
+                self.print_fn(message)
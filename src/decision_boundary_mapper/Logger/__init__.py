@@ -13,6 +13,6 @@
 # limitations under the License.
 
 from .Logger import Logger
-from .LoggerGUI import LoggerGUI
+from .LoggerGUI import LoggerGUI, LOGGER_GUI_EVENT
 from .LoggerInterface import LoggerInterface
 from .LoggerModel import LoggerModel
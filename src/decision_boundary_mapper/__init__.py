@@ -12,7 +12,41 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import sys
+import importlib
+from types import ModuleType
+from typing import TYPE_CHECKING
+
 from .Logger import Logger, LoggerGUI, LoggerInterface
 from .DBM import DBM, SDBM, NNArchitecture, FAST_DBM_STRATEGIES
-from .GUI import GUI, DBMPlotterGUI
-from .examples import DBM_usage_example, SDBM_usage_example, DBM_usage_example_GUI, SDBM_usage_example_GUI, DBM_usage_example_GUI_with_feature_extraction, SDBM_usage_example_GUI_with_feature_extraction
+
+# The GUI (PySimpleGUI) and the examples (opfython) are slow to import and not needed by headless runs,
+# so they are imported only when first accessed.
+_LAZY_IMPORTS = {
+    "GUI": ".GUI",
+    "DBMPlotterGUI": ".GUI",
+    "DBM_usage_example": ".examples",
+    "SDBM_usage_example": ".examples",
+    "DBM_usage_example_GUI": ".examples",
+    "SDBM_usage_example_GUI": ".examples",
+    "DBM_usage_example_GUI_with_feature_extraction": ".examples",
+    "SDBM_usage_example_GUI_with_feature_extraction": ".examples",
+}
+
+if TYPE_CHECKING:
+    from .GUI import GUI, DBMPlotterGUI
+    from .examples import DBM_usage_example, SDBM_usage_example, DBM_usage_example_GUI, SDBM_usage_example_GUI, DBM_usage_example_GUI_with_feature_extraction, SDBM_usage_example_GUI_with_feature_extraction
+
+def __getattr__(name: str):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value
+    # importing a subpackage binds it on this package, which shadows the class of the same name (e.g. GUI)
+    for shadowed_name, module_name in _LAZY_IMPORTS.items():
+        if isinstance(globals().get(shadowed_name), ModuleType) and f"{__name__}{module_name}" in sys.modules:
+            globals()[shadowed_name] = getattr(sys.modules[f"{__name__}{module_name}"], shadowed_name)
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_IMPORTS))
@@ -12,6 +12,30 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .dataReader import import_dataset, import_mnist_dataset, import_cifar10_dataset, import_fashion_mnist_dataset, import_folder_dataset
-from .tools import track_time_wrapper, generate_class_name_mapper, get_latest_created_file_from_folder, run_timer
-from .config import *
\ No newline at end of file
+import importlib
+from typing import TYPE_CHECKING
+
+from .tools import track_time_wrapper, get_array_fingerprint, get_classification_metrics, generate_class_name_mapper, get_latest_created_file_from_folder, run_timer
+from .config import *
+
+# The data readers pull in keras datasets, pandas and PIL, so they are imported only when first accessed.
+_LAZY_IMPORTS = {
+    "import_dataset": ".dataReader",
+    "import_mnist_dataset": ".dataReader",
+    "import_cifar10_dataset": ".dataReader",
+    "import_fashion_mnist_dataset": ".dataReader",
+    "import_folder_dataset": ".dataReader",
+}
+
+if TYPE_CHECKING:
+    from .dataReader import import_dataset, import_mnist_dataset, import_cifar10_dataset, import_fashion_mnist_dataset, import_folder_dataset
+
+def __getattr__(name: str):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_IMPORTS))
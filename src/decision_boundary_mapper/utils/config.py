@@ -18,6 +18,7 @@ TEST_DATA_POINT_MARKER = -2
 
 TRAIN_2D_FILE_NAME = "train_2d.npy"
 TEST_2D_FILE_NAME = "test_2d.npy"
+PROJECTIONS_CACHE_FOLDER = "projections_cache"
 
 INVERSE_PROJECTION_ERRORS_FILE = "inverse_projection_errors.npy"
 PROJECTION_ERRORS_INTERPOLATED_FILE = "projection_errors_interpolated.npy"
@@ -14,6 +14,9 @@
 import os
 import threading
 import time
+import hashlib
+from typing import Callable
+import numpy as np
 #from playsound import playsound
 from .. import LoggerInterface
 
@@ -37,6 +40,53 @@ def track_time_wrapper(logger: LoggerInterface | None = None):
         return wrapper
     return function_wrapper
 
+def get_array_fingerprint(X: np.ndarray) -> str:
+    """ Computes a fingerprint of an array from its shape, data type and content.
+    Equal arrays get the same fingerprint, while any change in the data changes it.
+
+    Args:
+        X (np.ndarray): The array to fingerprint
+
+    Returns:
+        fingerprint (str): The hexadecimal fingerprint of the array
+    """
+    X = np.ascontiguousarray(X)
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(f"{X.shape} {X.dtype.str}".encode())
+    hasher.update(memoryview(X).cast("B"))
+    return hasher.hexdigest()
+
+def get_classification_metrics(probabilities: np.ndarray, Y: np.ndarray, loss_function: Callable[[np.ndarray, np.ndarray], float] | None = None,
+                               epsilon: float = 1e-7) -> tuple[float, float, float]:
+    """ Computes the accuracy, the loss and the Cohen's kappa score of a classifier from its predicted probabilities.
+
+    Args:
+        probabilities (np.ndarray): The predicted class probabilities, one row per sample
+        Y (np.ndarray): The true labels
+        loss_function (Callable | None): Computes the loss from the true labels and the probabilities (e.g. the classifier's own loss).
+            If None, the mean sparse categorical cross-entropy is used. Defaults to None.
+        epsilon (float): The probabilities are clipped to [epsilon, 1 - epsilon] before computing the cross-entropy
+
+    Returns:
+        accuracy (float): The fraction of correctly predicted samples
+        loss (float): The loss of the classifier
+        kappa (float): The Cohen's kappa score
+    """
+    Y = np.asarray(Y).reshape(-1).astype(np.int64)
+    Y_pred = np.argmax(probabilities, axis=1)
+    n_samples, n_classes = len(Y), max(probabilities.shape[1], int(Y.max()) + 1)
+
+    accuracy = float(np.mean(Y_pred == Y))
+    if loss_function is not None:
+        loss = float(loss_function(Y, probabilities))
+    else:
+        loss = float(-np.mean(np.log(np.clip(probabilities[np.arange(n_samples), Y], epsilon, 1 - epsilon))))
+
+    confusion = np.bincount(Y * n_classes + Y_pred, minlength=n_classes * n_classes).reshape((n_classes, n_classes))
+    expected_agreement = np.sum(confusion.sum(axis=0) * confusion.sum(axis=1)) / n_samples**2
+    kappa = float((accuracy - expected_agreement) / (1 - expected_agreement)) if expected_agreement < 1 else 1.0
+    return accuracy, loss, kappa
+
 def generate_class_name_mapper(file: str):
     mapper = {}
     with open(file, "r") as f: